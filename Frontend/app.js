@@ -4,6 +4,13 @@ class ZappyLearn {
         this.selectedSubject = '';
         this.currentWorksheet = null;
         this.apiBaseUrl = 'https://zappylearn.onrender.com'; // Django backend URL
+        this.useStreaming = true; // Render the worksheet progressively as the backend streams it
+        this.streamRendered = false; // Whether the current stream has put anything on screen yet
+        this.difficultyIcons = {
+            easy: '🟢',
+            medium: '🟡',
+            hard: '🔴'
+        };
         this.initEventListeners();
     }
 
@@ -67,6 +74,23 @@ class ZappyLearn {
         this.showLoading();
 
         try {
+            if (this.useStreaming) {
+                this.streamRendered = false;
+                try {
+                    this.currentWorksheet = await this.streamWorksheet(mood, this.selectedSubject);
+                    return;
+                } catch (streamError) {
+                    if (this.streamRendered) {
+                        // Keep what the student can already see rather than replacing it with a different worksheet
+                        console.error('Streaming failed after the worksheet started rendering:', streamError);
+                        alert('Part of your worksheet didn\'t load. Please try again for the rest! 🔄');
+                        return;
+                    }
+                    // Nothing usable arrived; fall back to the plain JSON endpoint
+                    console.warn('Streaming failed, retrying without streaming:', streamError);
+                }
+            }
+
             const response = await this.fetchWorksheet(mood, this.selectedSubject);
             this.currentWorksheet = response;
             this.displayResults(response);
@@ -116,6 +140,146 @@ class ZappyLearn {
         }
     }
 
+    async streamWorksheet(mood, subject) {
+        const apiUrl = `${this.apiBaseUrl}/generate-worksheet/stream/`;
+        const startedAt = performance.now();
+        let firstContentAt = null;
+        let finalWorksheet = null;
+
+        const response = await fetch(apiUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+            },
+            body: JSON.stringify({
+                mood: mood,
+                subject: subject,
+                grade: '5-10',
+                stream_tokens: true
+            })
+        });
+
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // SSE events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const event = this.parseSSEEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                if (!event) continue;
+
+                if (event.type === 'error') {
+                    throw new Error(event.data.message || 'Generation failed');
+                }
+                if (firstContentAt === null && ['motivation', 'question', 'delta'].includes(event.type)) {
+                    firstContentAt = performance.now();
+                    this.streamRendered = true;
+                    this.hideLoading();
+                    this.prepareProgressiveResults();
+                }
+                if (event.type === 'done') {
+                    finalWorksheet = event.data;
+                }
+                this.handleStreamEvent(event);
+            }
+        }
+
+        if (!finalWorksheet) {
+            throw new Error('Stream ended before the worksheet was complete');
+        }
+
+        const totalMs = Math.round(performance.now() - startedAt);
+        console.log('Worksheet timing:', {
+            client_time_to_first_content_ms: firstContentAt === null ? null : Math.round(firstContentAt - startedAt),
+            client_total_ms: totalMs,
+            server: finalWorksheet.timing
+        });
+        return finalWorksheet;
+    }
+
+    parseSSEEvent(raw) {
+        let type = 'message';
+        const dataLines = [];
+        raw.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        if (!dataLines.length) return null;
+        return { type: type, data: JSON.parse(dataLines.join('\n')) };
+    }
+
+    prepareProgressiveResults() {
+        document.getElementById('motivationText').textContent = '';
+        document.getElementById('motivationEmoji').textContent = '';
+        document.getElementById('questionsContainer').innerHTML = '';
+        document.getElementById('results').style.display = 'block';
+    }
+
+    handleStreamEvent(event) {
+        const data = event.data;
+        switch (event.type) {
+            case 'mood':
+                // Log mood analysis for debugging
+                console.log('Mood Analysis:', data.mood_analysis);
+                break;
+            case 'delta':
+                if (data.slot === 'motivation') {
+                    document.getElementById('motivationText').textContent += data.text;
+                } else {
+                    this.getQuestionCard(data.slot).querySelector('.question-text').textContent += data.text;
+                }
+                break;
+            case 'motivation':
+                document.getElementById('motivationText').textContent = data.motivation;
+                document.getElementById('motivationEmoji').textContent = data.motivationEmoji;
+                break;
+            case 'question':
+                this.getQuestionCard(data.difficulty).querySelector('.question-text').textContent = data.question;
+                break;
+            case 'done':
+                document.getElementById('results').scrollIntoView({ behavior: 'smooth' });
+                break;
+        }
+    }
+
+    getQuestionCard(difficulty) {
+        const container = document.getElementById('questionsContainer');
+        let card = container.querySelector(`.question-card.${difficulty}`);
+        if (!card) {
+            card = document.createElement('div');
+            card.className = `question-card ${difficulty}`;
+            card.innerHTML = `
+                <div class="difficulty-badge">
+                    ${this.difficultyIcons[difficulty]} ${difficulty.toUpperCase()}
+                </div>
+                <div class="question-text"></div>
+            `;
+            // Keep easy, medium, hard order whichever question finishes first
+            const order = ['easy', 'medium', 'hard'];
+            const next = Array.from(container.children).find(
+                child => order.indexOf(child.dataset.difficulty) > order.indexOf(difficulty)
+            );
+            card.dataset.difficulty = difficulty;
+            container.insertBefore(card, next || null);
+        }
+        return card;
+    }
+
     showLoading() {
         document.getElementById('loading').style.display = 'block';
         document.getElementById('results').style.display = 'none';
@@ -0,0 +1,29 @@
+# app1/detail_cache.py
+import hashlib
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import quote_etag
+
+# Bump when the detail JSON shape changes so old entries are ignored
+DETAIL_CACHE_VERSION = 1
+
+def worksheet_detail_cache():
+    return caches[getattr(settings, 'WORKSHEET_DETAIL_CACHE_ALIAS', 'default')]
+
+def worksheet_detail_key(worksheet_id) -> str:
+    return f"worksheet-detail:v{DETAIL_CACHE_VERSION}:{worksheet_id}"
+
+def make_entry(body: bytes) -> Tuple[str, bytes]:
+    """(ETag, body) pair as stored in the cache; the ETag is a hash of the body"""
+    return quote_etag(hashlib.blake2b(body, digest_size=16).hexdigest()), body
+
+def get_worksheet_detail(worksheet_id) -> Optional[Tuple[str, bytes]]:
+    return worksheet_detail_cache().get(worksheet_detail_key(worksheet_id))
+
+def set_worksheet_detail(worksheet_id, entry: Tuple[str, bytes]) -> None:
+    worksheet_detail_cache().set(worksheet_detail_key(worksheet_id), entry)
+
+def invalidate_worksheet_detail(worksheet_id) -> None:
+    worksheet_detail_cache().delete(worksheet_detail_key(worksheet_id))
@@ -0,0 +1,242 @@
+# app1/health.py
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from services.ai_services import emotion_model_registry, get_mood_cache, get_worksheet_cache
+from services.metrics_services import metrics, percentile
+from services.rate_limit_services import get_groq_rate_limiter
+from services.resilience_services import OPEN, get_groq_circuit_breaker
+from .detail_cache import worksheet_detail_cache
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Check outcomes, worst last. Only 'fail' takes the worker out of rotation;
+# 'degraded' means requests are still served (from fallbacks) but something needs a look.
+OK, DEGRADED, FAIL = 'ok', 'degraded', 'fail'
+
+def _worst(statuses) -> str:
+    statuses = set(statuses)
+    return FAIL if FAIL in statuses else DEGRADED if DEGRADED in statuses else OK
+
+class HealthMonitor:
+    """
+    Readiness snapshot for this worker, refreshed by a background thread every
+    `interval` seconds so the readiness endpoint only ever returns a dict.
+    Covers the emotion model, the database, recent Groq error rate and latency,
+    the cache backends and the job queue depth. With interval 0 every snapshot()
+    call checks inline instead (used in tests).
+    """
+
+    def __init__(self, interval: Optional[float] = None, groq_window: Optional[float] = None):
+        self.interval = interval if interval is not None else getattr(settings, 'HEALTH_REFRESH_INTERVAL', 5.0)
+        self.groq_window = groq_window if groq_window is not None else getattr(settings, 'HEALTH_GROQ_WINDOW', 300.0)
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._warmup_thread = None
+        # (monotonic time, calls, errors) per refresh, for the rolling Groq error rate
+        self._groq_history = deque()
+
+    def snapshot(self) -> Dict:
+        if not self.interval:
+            return self.refresh()
+        self._ensure_thread()
+        snapshot = self._snapshot
+        if snapshot is None:
+            # First request after startup: check inline rather than report nothing
+            snapshot = self.refresh()
+        return snapshot
+
+    def refresh(self) -> Dict:
+        checks = {
+            'emotion_model': self._check_emotion_model(),
+            'database': self._check_database(),
+            'groq': self._check_groq(),
+            'caches': self._check_caches(),
+            'queue': self._check_queue(),
+        }
+        status = _worst(check['status'] for check in checks.values())
+        snapshot = {
+            'status': {OK: 'ready', DEGRADED: 'degraded', FAIL: 'not_ready'}[status],
+            'ready': status != FAIL,
+            'checked_at': datetime.now().isoformat(),
+            'checks': checks,
+        }
+        self._snapshot = snapshot
+        metrics.set_gauge('readiness_ready', 1 if snapshot['ready'] else 0)
+        return snapshot
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Readiness refresh failed: {e}")
+            finally:
+                # This thread keeps its own DB connection; drop it if it has gone bad or old
+                close_old_connections()
+            time.sleep(self.interval)
+
+    def _check_emotion_model(self) -> Dict:
+        stats = emotion_model_registry.stats()
+        if stats['lite_mode']:
+            return {'status': OK, 'state': 'disabled'}
+        if emotion_model_registry.is_loaded and stats['warmed']:
+            return {'status': OK, 'state': 'ready', 'load_seconds': stats['load_seconds']}
+
+        if stats['load_attempts'] and stats['load_failures'] >= stats['load_attempts']:
+            # Mood analysis falls back to keywords, so keep serving
+            return {'status': DEGRADED, 'state': 'failed', 'load_failures': stats['load_failures']}
+
+        self._start_warmup()
+        return {'status': FAIL, 'state': 'loading'}
+
+    def _start_warmup(self):
+        """Load and warm a lazily loaded model in the background so the worker becomes ready on its own"""
+        with self._lock:
+            if self._warmup_thread is None or not self._warmup_thread.is_alive():
+                self._warmup_thread = threading.Thread(
+                    target=emotion_model_registry.warm_up, name='emotion-model-warmup', daemon=True
+                )
+                self._warmup_thread.start()
+
+    def _check_database(self) -> Dict:
+        start = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Exception as e:
+            connection.close()
+            return {'status': FAIL, 'error': str(e)}
+        return {'status': OK, 'latency_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    def _check_groq(self) -> Dict:
+        calls = metrics.counter_sum('groq_calls_total')
+        errors = metrics.counter_sum('groq_calls_total', outcome='error')
+        now = time.monotonic()
+        self._groq_history.append((now, calls, errors))
+        while len(self._groq_history) > 1 and self._groq_history[0][0] < now - self.groq_window:
+            self._groq_history.popleft()
+        _, calls_then, errors_then = self._groq_history[0]
+
+        window_calls = calls - calls_then
+        error_rate = (errors - errors_then) / window_calls if window_calls else None
+        p95 = percentile(metrics.recent_samples('groq_call_seconds'), 95)
+        result = {
+            'configured': bool(settings.GROQ_API_KEY),
+            'window_seconds': self.groq_window,
+            'calls': int(window_calls),
+            'error_rate': error_rate,
+            'p95_seconds': p95,
+        }
+
+        if not settings.GROQ_API_KEY:
+            # Every worksheet would be the fallback one
+            result['status'] = FAIL if getattr(settings, 'HEALTH_REQUIRE_GROQ', True) else DEGRADED
+            return result
+
+        limiter = get_groq_rate_limiter()
+        try:
+            result['daily_budget_exhausted'] = limiter is not None and limiter.budget_exhausted()
+        except Exception as e:
+            logger.warning(f"Readiness could not read the Groq token budget: {e}")
+
+        breaker = get_groq_circuit_breaker()
+        if breaker is not None:
+            result['circuit'] = breaker.stats()
+
+        # Groq is shared by every worker, so a bad spell degrades rather than fails readiness;
+        # failing all workers at once would turn fallback worksheets into an outage
+        max_error_rate = getattr(settings, 'HEALTH_GROQ_MAX_ERROR_RATE', 0.5)
+        max_p95 = getattr(settings, 'HEALTH_GROQ_MAX_P95_SECONDS', getattr(settings, 'GROQ_CALL_TIMEOUT', 8.0))
+        unhealthy = (
+            (error_rate is not None and window_calls >= 5 and error_rate > max_error_rate)
+            or (p95 is not None and p95 > max_p95)
+            or result.get('daily_budget_exhausted')
+            or result.get('circuit', {}).get('state') == OPEN
+        )
+        result['status'] = DEGRADED if unhealthy else OK
+        return result
+
+    def _check_caches(self) -> Dict:
+        backends = {}
+        worksheet_cache = get_worksheet_cache()
+        if worksheet_cache is not None:
+            backends['worksheet'] = worksheet_cache.backend
+        mood_cache = get_mood_cache()
+        if mood_cache is not None:
+            backends['mood'] = mood_cache.backend
+        limiter = get_groq_rate_limiter()
+        if limiter is not None:
+            backends['rate_limit'] = limiter.backend
+
+        result = {}
+        for name, backend in backends.items():
+            try:
+                ok = backend.ping()
+            except Exception:
+                ok = False
+            result[name] = {'backend': backend.name, 'ok': ok}
+
+        try:
+            detail_cache = worksheet_detail_cache()
+            detail_cache.set('health:probe', 1, 10)
+            result['worksheet_detail'] = {
+                'backend': type(detail_cache).__name__, 'ok': detail_cache.get('health:probe') == 1
+            }
+        except Exception:
+            result['worksheet_detail'] = {'backend': 'unknown', 'ok': False}
+
+        # Caches only save work; a broken one means slower, not wrong, responses
+        return {'status': OK if all(entry['ok'] for entry in result.values()) else DEGRADED, 'backends': result}
+
+    def _check_queue(self) -> Dict:
+        try:
+            counts = dict(
+                Job.objects.filter(status__in=['queued', 'running']).order_by()
+                .values_list('status').annotate(count=Count('id'))
+            )
+            oldest = Job.objects.filter(status='queued', run_after__lte=timezone.now()).aggregate(
+                oldest=Min('created_at')
+            )['oldest']
+        except Exception as e:
+            return {'status': DEGRADED, 'error': str(e)}
+
+        oldest_age = (timezone.now() - oldest).total_seconds() if oldest else 0.0
+        metrics.set_gauge('job_queue_depth', counts.get('queued', 0))
+        max_age = getattr(settings, 'HEALTH_QUEUE_MAX_AGE', 300.0)
+        return {
+            'status': DEGRADED if oldest_age > max_age else OK,
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'oldest_runnable_age_seconds': round(oldest_age, 1),
+        }
+
+_health_monitor = None
+_health_monitor_lock = threading.Lock()
+
+def get_health_monitor() -> HealthMonitor:
+    global _health_monitor
+    if _health_monitor is None:
+        with _health_monitor_lock:
+            if _health_monitor is None:
+                _health_monitor = HealthMonitor()
+    return _health_monitor
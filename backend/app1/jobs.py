@@ -0,0 +1,207 @@
+# app1/jobs.py
+import os
+import time
+import random
+import socket
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F
+from django.utils import timezone
+
+from services.metrics_services import metrics
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+class JobType:
+    """A registered kind of job: its handler plus default priority, attempts and concurrency"""
+
+    def __init__(self, name: str, handler: Callable[[Dict], Optional[Dict]], priority: int = 0,
+                 max_attempts: int = 3, concurrency: Optional[int] = None,
+                 on_failure: Optional[Callable[[Dict, str], None]] = None):
+        self.name = name
+        self.handler = handler
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        # Called once a job has used up its attempts, e.g. to mark the object it was building
+        self.on_failure = on_failure
+
+    @property
+    def concurrency_limit(self) -> Optional[int]:
+        """Max jobs of this type running at once across all workers (None for no limit)"""
+        return getattr(settings, 'JOB_CONCURRENCY', {}).get(self.name, self.concurrency)
+
+JOB_TYPES: Dict[str, JobType] = {}
+
+def register_job(name: str, priority: int = 0, max_attempts: int = 3, concurrency: Optional[int] = None,
+                 on_failure: Optional[Callable[[Dict, str], None]] = None):
+    """
+    Decorator registering handler(payload) -> result as the job type `name`.
+    The result must be JSON-serializable; raising marks the attempt as failed.
+    """
+    def decorator(handler):
+        JOB_TYPES[name] = JobType(name, handler, priority, max_attempts, concurrency, on_failure)
+        return handler
+    return decorator
+
+def enqueue(job_type: str, payload: Dict, priority: Optional[int] = None,
+            max_attempts: Optional[int] = None, delay: float = 0) -> Job:
+    """Queue a job for `manage.py run_jobs`; priority and attempts default to the job type's"""
+    registered = JOB_TYPES.get(job_type)
+    if registered is None:
+        raise ValueError(f"Unknown job type '{job_type}'")
+
+    job = Job.objects.create(
+        job_type=job_type,
+        payload=payload,
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts if max_attempts is None else max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    metrics.inc('jobs_enqueued_total', job_type=job_type)
+    return job
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: roughly base * 2^(attempts-1), capped"""
+    base = getattr(settings, 'JOB_RETRY_BASE_DELAY', 5)
+    cap = getattr(settings, 'JOB_RETRY_MAX_DELAY', 300)
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+# Serializes claims from worker threads in one process so they respect the
+# per-type concurrency limits; across processes the limits are best effort.
+_claim_lock = threading.Lock()
+
+class JobWorker:
+    """Claims queued jobs from the database and runs their handlers"""
+
+    def __init__(self, worker_id: Optional[str] = None, job_types: Optional[Iterable[str]] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.job_types = set(job_types) if job_types else None
+        self.lock_timeout = getattr(settings, 'JOB_LOCK_TIMEOUT', 600)
+
+    def claim(self) -> Optional[Job]:
+        """Atomically move the most urgent runnable job to 'running' and return it"""
+        with _claim_lock:
+            now = timezone.now()
+            runnable = [
+                name for name in (self.job_types or JOB_TYPES.keys())
+                if name in JOB_TYPES and name not in self._saturated_types()
+            ]
+            if not runnable:
+                return None
+
+            candidates = (
+                Job.objects
+                .filter(status='queued', run_after__lte=now, job_type__in=runnable)
+                .order_by('-priority', 'created_at')
+                .values_list('id', flat=True)[:10]
+            )
+            for job_id in candidates:
+                # Conditional update: only one worker can flip a given job out of 'queued'
+                claimed = Job.objects.filter(pk=job_id, status='queued').update(
+                    status='running', locked_by=self.worker_id, locked_at=now, attempts=F('attempts') + 1
+                )
+                if claimed:
+                    return Job.objects.get(pk=job_id)
+        return None
+
+    def _saturated_types(self):
+        running = dict(
+            Job.objects.filter(status='running')
+            .values_list('job_type')
+            .annotate(total=Count('id'))
+        )
+        saturated = set()
+        for name, job_type in JOB_TYPES.items():
+            limit = job_type.concurrency_limit
+            if limit is not None and running.get(name, 0) >= limit:
+                saturated.add(name)
+        return saturated
+
+    def run(self, job: Job) -> None:
+        job_type = JOB_TYPES.get(job.job_type)
+        start = time.perf_counter()
+        try:
+            if job_type is None:
+                raise ValueError(f"No handler registered for job type '{job.job_type}'")
+            result = job_type.handler(job.payload)
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.job_type}) failed on attempt {job.attempts}: {e}")
+            self._record_failure(job, job_type, str(e))
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status='done', result=result, error='', completed_at=timezone.now()
+            )
+            metrics.inc('jobs_completed_total', job_type=job.job_type, status='done')
+        metrics.observe('job_run_seconds', time.perf_counter() - start, job_type=job.job_type)
+
+    def _record_failure(self, job: Job, job_type: Optional[JobType], error: str) -> None:
+        if job_type is not None and job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            Job.objects.filter(pk=job.pk).update(
+                status='queued', error=error, locked_by='', locked_at=None,
+                run_after=timezone.now() + timedelta(seconds=delay)
+            )
+            metrics.inc('jobs_retried_total', job_type=job.job_type)
+            return
+
+        Job.objects.filter(pk=job.pk).update(status='failed', error=error, completed_at=timezone.now())
+        metrics.inc('jobs_completed_total', job_type=job.job_type, status='failed')
+        if job_type is not None and job_type.on_failure is not None:
+            try:
+                job_type.on_failure(job.payload, error)
+            except Exception as e:
+                logger.error(f"on_failure hook for job {job.id} failed: {e}")
+
+    def requeue_stale(self) -> int:
+        """
+        Treat jobs whose worker died mid-run (locked longer than JOB_LOCK_TIMEOUT)
+        as failed attempts: retried after the usual backoff, or failed through the
+        job type's on_failure hook once out of attempts. Returns how many were requeued.
+        """
+        now = timezone.now()
+        requeued = 0
+        for job in Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=self.lock_timeout)):
+            # Take the job over first so two workers sweeping at once don't both handle it
+            taken = Job.objects.filter(pk=job.pk, status='running', locked_at=job.locked_at).update(
+                locked_by=self.worker_id, locked_at=now
+            )
+            if not taken:
+                continue
+            job_type = JOB_TYPES.get(job.job_type)
+            logger.warning(f"Job {job.id} ({job.job_type}) stopped responding on attempt {job.attempts}")
+            self._record_failure(job, job_type, 'Worker stopped responding')
+            if job_type is not None and job.attempts < job.max_attempts:
+                requeued += 1
+        return requeued
+
+    def run_once(self) -> bool:
+        """Run one job if any is runnable; returns whether a job was run"""
+        try:
+            self.requeue_stale()
+            job = self.claim()
+            if job is None:
+                return False
+            self.run(job)
+            return True
+        finally:
+            # Worker threads live outside Django's request cycle
+            close_old_connections()
+
+    def run_forever(self, stop_event: threading.Event, poll_interval: Optional[float] = None) -> None:
+        poll_interval = poll_interval or getattr(settings, 'JOB_POLL_INTERVAL', 1.0)
+        while not stop_event.is_set():
+            try:
+                ran = self.run_once()
+            except Exception as e:
+                logger.error(f"Job worker {self.worker_id} error: {e}")
+                ran = False
+            if not ran:
+                stop_event.wait(poll_interval)
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.metrics_services import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent worksheet requests at the WSGI and ASGI endpoints and compare throughput. "
+        "Start the servers first, e.g. `gunicorn backend.wsgi -w 1 --threads 4 -b :8000` and "
+        "`uvicorn backend.asgi:application --workers 1 --port 8001`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000',
+                            help="Base URL of the WSGI server (empty to skip)")
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001',
+                            help="Base URL of the ASGI server (empty to skip)")
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--mood', default='tired')
+        parser.add_argument('--subject', default='math')
+        parser.add_argument('--timeout', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError("loadtest requires the 'httpx' package")
+
+        targets = {}
+        if options['wsgi_url']:
+            targets['wsgi'] = options['wsgi_url'].rstrip('/') + '/generate-worksheet/'
+        if options['asgi_url']:
+            targets['asgi'] = options['asgi_url'].rstrip('/') + '/async/generate-worksheet/'
+        if not targets:
+            raise CommandError("Nothing to test: give --wsgi-url and/or --asgi-url")
+
+        payload = {'mood': options['mood'], 'subject': options['subject'], 'grade': '5-10'}
+        report = {
+            name: asyncio.run(self.run(httpx, url, payload, options))
+            for name, url in targets.items()
+        }
+        if 'wsgi' in report and 'asgi' in report and report['wsgi']['throughput_per_second']:
+            report['asgi_speedup'] = round(
+                report['asgi']['throughput_per_second'] / report['wsgi']['throughput_per_second'], 2
+            )
+
+        self.stdout.write(json.dumps(report, indent=2))
+
+    @staticmethod
+    async def run(httpx, url, payload, options):
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        latencies = []
+        errors = 0
+
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        async with httpx.AsyncClient(timeout=options['timeout'], limits=limits) as client:
+            async def one():
+                nonlocal errors
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post(url, json=payload)
+                        response.raise_for_status()
+                    except httpx.HTTPError:
+                        errors += 1
+                        return
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(options['requests'])))
+            elapsed = time.perf_counter() - start
+
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            'url': url,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'errors': errors,
+            'throughput_per_second': round(len(latencies) / elapsed, 2),
+            'latency_p50_ms': ms(percentile(latencies, 50)),
+            'latency_p95_ms': ms(percentile(latencies, 95)),
+            'latency_p99_ms': ms(percentile(latencies, 99)),
+        }
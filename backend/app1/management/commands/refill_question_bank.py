@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.ai_services import GroqQuestionGenerator, LEARNING_MOODS
+from app1.question_bank import QuestionBank
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep every (subject, mood, grade) question bank bucket above its low-water mark "
+        "by generating worksheets with Groq off the request path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--low-water', type=int, default=getattr(settings, 'QUESTION_BANK_LOW_WATER', 3),
+                            help="Refill a bucket once it can serve fewer worksheets than this")
+        parser.add_argument('--high-water', type=int, default=getattr(settings, 'QUESTION_BANK_HIGH_WATER', 10),
+                            help="Refill a bucket up to this many worksheets")
+        parser.add_argument('--subjects', nargs='+', default=['math', 'science'])
+        parser.add_argument('--moods', nargs='+', default=LEARNING_MOODS)
+        parser.add_argument('--grades', nargs='+', default=getattr(settings, 'QUESTION_BANK_GRADES', ['5-10']))
+        parser.add_argument('--mode', choices=['batched', 'parallel'], default='batched',
+                            help="Generation mode; batched costs one Groq call per worksheet")
+        parser.add_argument('--calls-per-minute', type=float,
+                            default=getattr(settings, 'QUESTION_BANK_CALLS_PER_MINUTE', 20),
+                            help="Upper bound on worksheet generations per minute")
+        parser.add_argument('--interval', type=float, default=60,
+                            help="Seconds between scans of all buckets")
+        parser.add_argument('--once', action='store_true', help="Scan and refill once, then exit")
+
+    def handle(self, *args, **options):
+        if options['high_water'] < options['low_water']:
+            raise CommandError("--high-water must be at least --low-water")
+
+        generator = GroqQuestionGenerator()
+        if not generator.client:
+            raise CommandError("GROQ_API_KEY is not configured; nothing to refill with")
+        generator.generation_mode = options['mode']
+
+        self.min_gap = 60.0 / options['calls_per_minute'] if options['calls_per_minute'] > 0 else 0
+        self.last_call_at = 0.0
+
+        while True:
+            added = self.refill_all(generator, options)
+            self.stdout.write(f"Question bank scan complete: {added} questions added")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+    def refill_all(self, generator, options) -> int:
+        bank = QuestionBank()
+        added = 0
+        for subject in options['subjects']:
+            for grade_level in options['grades']:
+                for mood in options['moods']:
+                    depth = bank.depth(mood, subject, grade_level)
+                    if depth >= options['low_water']:
+                        continue
+
+                    for _ in range(options['high_water'] - depth):
+                        self.throttle()
+                        # Respect the rate limit, token budget and circuit breaker like requests do;
+                        # the next scan tries again
+                        blocked = generator.blocked_reason()
+                        if blocked:
+                            self.stderr.write(f"Groq unavailable ({blocked}), stopping this scan early")
+                            return added
+                        worksheet, fallback_slots = generator.generate_live(mood, subject, grade_level)
+                        added += bank.deposit(mood, subject, grade_level, worksheet, skip_slots=fallback_slots)
+        return added
+
+    def throttle(self):
+        wait = self.last_call_at + self.min_gap - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self.last_call_at = time.monotonic()
@@ -0,0 +1,60 @@
+import os
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app1.jobs import JOB_TYPES, JobWorker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs (worksheet generation, PDF rendering, worksheet packs) from the "
+        "jobs table. Start as many of these as needed; they coordinate through the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help="Jobs this process runs at once")
+        parser.add_argument('--types', nargs='+', help="Only run these job types (default: all)")
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'JOB_POLL_INTERVAL', 1.0),
+                            help="Seconds to wait when no job is runnable")
+        parser.add_argument('--once', action='store_true', help="Run until no job is runnable, then exit")
+
+    def handle(self, *args, **options):
+        unknown = set(options['types'] or []) - set(JOB_TYPES)
+        if unknown:
+            raise CommandError(f"Unknown job types: {', '.join(sorted(unknown))}")
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        workers = [
+            JobWorker(worker_id=f"{prefix}:{index}", job_types=options['types'])
+            for index in range(options['threads'])
+        ]
+
+        if options['once']:
+            ran = 0
+            while workers[0].run_once():
+                ran += 1
+            self.stdout.write(f"Ran {ran} jobs")
+            return
+
+        stop_event = threading.Event()
+        threads = [
+            threading.Thread(target=worker.run_forever, args=(stop_event, options['poll_interval']),
+                             name=f"job-worker-{index}", daemon=True)
+            for index, worker in enumerate(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Running jobs with {len(threads)} threads; Ctrl-C to stop")
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the current jobs finish...")
+            stop_event.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,50 @@
+# app1/middleware.py
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+from services.metrics_services import start_request_spans, stop_request_spans
+
+
+def _server_timing(spans, total):
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries)
+
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    """
+    Add a Server-Timing header listing the spans (json_parse, analyze_mood, groq_call,
+    db_save, pdf_render, ...) recorded while handling the request, so browser dev tools
+    show where the time went. Enabled with settings.SERVER_TIMING.
+    Streaming responses only include the spans finished before the first byte.
+    """
+    if not getattr(settings, 'SERVER_TIMING', False):
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            spans = start_request_spans()
+            try:
+                response = await get_response(request)
+            finally:
+                stop_request_spans()
+            response['Server-Timing'] = _server_timing(spans, time.perf_counter() - start)
+            return response
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            spans = start_request_spans()
+            try:
+                response = get_response(request)
+            finally:
+                stop_request_spans()
+            response['Server-Timing'] = _server_timing(spans, time.perf_counter() - start)
+            return response
+
+    return middleware
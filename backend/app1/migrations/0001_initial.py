@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:11
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=100, unique=True)),
+                ('mood_analysis', models.JSONField(blank=True, null=True)),
+                ('preferences', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Worksheet',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('user_mood', models.CharField(max_length=100)),
+                ('subject', models.CharField(choices=[('math', 'Mathematics'), ('science', 'Science'), ('english', 'English'), ('history', 'History'), ('geography', 'Geography')], max_length=20)),
+                ('grade_level', models.CharField(default='5-10', max_length=10)),
+                ('motivation_message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pdf_file', models.FileField(blank=True, null=True, upload_to='worksheets/')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], max_length=10)),
+                ('question_text', models.TextField()),
+                ('answer', models.TextField(blank=True, null=True)),
+                ('hints', models.TextField(blank=True, null=True)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('worksheet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='app1.worksheet')),
+            ],
+            options={
+                'ordering': ['order', 'difficulty'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionBankEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(choices=[('math', 'Mathematics'), ('science', 'Science'), ('english', 'English'), ('history', 'History'), ('geography', 'Geography')], max_length=20)),
+                ('difficulty', models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], max_length=10)),
+                ('mood', models.CharField(max_length=30)),
+                ('grade_level', models.CharField(default='5-10', max_length=10)),
+                ('question_text', models.TextField()),
+                ('answer', models.TextField(blank=True, null=True)),
+                ('hints', models.TextField(blank=True, null=True)),
+                ('motivation_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['subject', 'difficulty', 'mood', 'grade_level', 'created_at'], name='question_bank_bucket_idx')],
+            },
+        ),
+    ]
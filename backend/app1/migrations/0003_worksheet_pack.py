@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:24
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0002_question_bank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorksheetPack',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('entries', models.JSONField()),
+                ('worksheets', models.JSONField(blank=True, null=True)),
+                ('unique_generations', models.PositiveIntegerField(default=0)),
+                ('pdf_file', models.FileField(blank=True, null=True, upload_to='packs/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
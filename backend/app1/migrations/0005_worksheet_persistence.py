@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0004_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worksheet',
+            name='mood_analysis',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['worksheet', 'order'], name='question_worksheet_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worksheet',
+            index=models.Index(fields=['subject', '-created_at'], name='worksheet_subject_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worksheet',
+            index=models.Index(fields=['-created_at'], name='worksheet_created_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 # worksheet_generator/models.py
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
 
 class Worksheet(models.Model):
@@ -23,11 +24,16 @@ class Worksheet(models.Model):
     subject = models.CharField(max_length=20, choices=SUBJECT_CHOICES)
     grade_level = models.CharField(max_length=10, default='5-10')
     motivation_message = models.TextField()
+    mood_analysis = models.JSONField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     pdf_file = models.FileField(upload_to='worksheets/', blank=True, null=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['subject', '-created_at'], name='worksheet_subject_created_idx'),
+            models.Index(fields=['-created_at'], name='worksheet_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.subject} worksheet for {self.user_mood} mood"
@@ -42,10 +48,96 @@ class Question(models.Model):
     
     class Meta:
         ordering = ['order', 'difficulty']
+        indexes = [
+            models.Index(fields=['worksheet', 'order'], name='question_worksheet_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.difficulty} - {self.question_text[:50]}..."
 
+class QuestionBankEntry(models.Model):
+    """Pre-generated question served straight from the database, refilled off the request path"""
+    subject = models.CharField(max_length=20, choices=Worksheet.SUBJECT_CHOICES)
+    difficulty = models.CharField(max_length=10, choices=Worksheet.DIFFICULTY_CHOICES)
+    mood = models.CharField(max_length=30)
+    grade_level = models.CharField(max_length=10, default='5-10')
+    question_text = models.TextField()
+    answer = models.TextField(blank=True, null=True)
+    hints = models.TextField(blank=True, null=True)
+    motivation_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['subject', 'difficulty', 'mood', 'grade_level', 'created_at'],
+                name='question_bank_bucket_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject}/{self.difficulty}/{self.mood} - {self.question_text[:50]}..."
+
+class WorksheetPack(models.Model):
+    """A class set: one worksheet per student, generated together and rendered into a single PDF"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    entries = models.JSONField()
+    worksheets = models.JSONField(blank=True, null=True)
+    unique_generations = models.PositiveIntegerField(default=0)
+    pdf_file = models.FileField(upload_to='packs/', blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Worksheet pack of {len(self.entries)} ({self.status})"
+
+class Job(models.Model):
+    """Unit of background work (LLM generation, PDF rendering) run by `manage.py run_jobs`"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    priority = models.IntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-priority', 'created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after', 'priority'], name='job_claim_idx'),
+            models.Index(fields=['job_type', 'status'], name='job_type_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.job_type} job {self.id} ({self.status})"
+
 class UserSession(models.Model):
     session_id = models.CharField(max_length=100, unique=True)
     mood_analysis = models.JSONField(blank=True, null=True)
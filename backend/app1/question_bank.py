@@ -0,0 +1,107 @@
+# app1/question_bank.py
+import logging
+from typing import Dict, Optional
+
+from django.db import transaction
+from django.db.models import Count
+
+from services.ai_services import DIFFICULTY_LEVELS
+from services.metrics_services import metrics
+from .models import QuestionBankEntry
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionBank:
+    """Serves worksheets from pre-generated QuestionBankEntry rows"""
+
+    # Oldest rows tried per query when claiming; more than one so a few concurrent takers don't collide
+    CLAIM_CANDIDATES = 5
+
+    def take(self, mood: str, subject: str, grade_level: str) -> Optional[Dict]:
+        """
+        Pop the oldest banked question for each difficulty in the bucket.
+        Returns None (and claims nothing) if any difficulty is empty.
+        """
+        try:
+            with transaction.atomic():
+                entries = {}
+                for difficulty in DIFFICULTY_LEVELS:
+                    entry = self._claim(subject=subject, difficulty=difficulty, mood=mood, grade_level=grade_level)
+                    if entry is None:
+                        # Put back the difficulties already claimed
+                        transaction.set_rollback(True)
+                        metrics.inc('question_bank_misses_total')
+                        return None
+                    entries[difficulty] = entry
+        except Exception as e:
+            logger.warning(f"Question bank lookup failed: {e}")
+            metrics.inc('question_bank_errors_total')
+            return None
+
+        metrics.inc('question_bank_hits_total')
+        return {
+            'motivation': entries['easy'].motivation_message,
+            'questions': {d: e.question_text for d, e in entries.items()},
+            'answers': {d: e.answer or '' for d, e in entries.items()},
+            'hints': {d: e.hints or '' for d, e in entries.items()},
+        }
+
+    def _claim(self, **bucket) -> Optional[QuestionBankEntry]:
+        """
+        Delete and return the oldest entry in the bucket, or None once it is empty.
+        The conditional delete is the claim: of two requests that read the same row,
+        only one deletes it, and the other moves on to the next row. This needs no
+        row locks, which SQLite doesn't have.
+        """
+        while True:
+            candidates = list(
+                QuestionBankEntry.objects.filter(**bucket).order_by('created_at', 'pk')[:self.CLAIM_CANDIDATES]
+            )
+            if not candidates:
+                return None
+            for entry in candidates:
+                deleted, _ = QuestionBankEntry.objects.filter(pk=entry.pk).delete()
+                if deleted:
+                    return entry
+                metrics.inc('question_bank_claim_conflicts_total')
+
+    @staticmethod
+    def depth(mood: str, subject: str, grade_level: str) -> int:
+        """Number of complete worksheets the bucket can serve (its shallowest difficulty)"""
+        counts = dict(
+            QuestionBankEntry.objects
+            .filter(subject=subject, mood=mood, grade_level=grade_level)
+            .values_list('difficulty')
+            .annotate(total=Count('id'))
+        )
+        return min(counts.get(difficulty, 0) for difficulty in DIFFICULTY_LEVELS)
+
+    @staticmethod
+    def deposit(mood: str, subject: str, grade_level: str, worksheet: Dict, skip_slots=()) -> int:
+        """
+        Bank a generated worksheet; questions that came from the fallback are skipped.
+        Every row carries the worksheet's motivation, so nothing is banked when the
+        motivation itself is the fallback one.
+        """
+        if 'motivation' in skip_slots:
+            metrics.inc('question_bank_skipped_deposits_total')
+            return 0
+        answers = worksheet.get('answers') or {}
+        hints = worksheet.get('hints') or {}
+        entries = [
+            QuestionBankEntry(
+                subject=subject,
+                difficulty=difficulty,
+                mood=mood,
+                grade_level=grade_level,
+                question_text=worksheet['questions'][difficulty],
+                answer=answers.get(difficulty) or None,
+                hints=hints.get(difficulty) or None,
+                motivation_message=worksheet['motivation'],
+            )
+            for difficulty in DIFFICULTY_LEVELS
+            if difficulty not in skip_slots
+        ]
+        QuestionBankEntry.objects.bulk_create(entries)
+        return len(entries)
@@ -0,0 +1,14 @@
+# app1/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .detail_cache import invalidate_worksheet_detail
+from .models import Question, Worksheet
+
+@receiver([post_save, post_delete], sender=Worksheet)
+def worksheet_changed(sender, instance, **kwargs):
+    invalidate_worksheet_detail(instance.pk)
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    invalidate_worksheet_detail(instance.worksheet_id)
@@ -0,0 +1,34 @@
+# app1/tasks.py
+# Job handlers for app1.jobs, registered when the app is ready (see App1Config)
+from services.pdf_services import PDFGenerator, PDFFileCache
+from .jobs import register_job
+from .worksheet_packs import build_pack, fail_pack
+
+@register_job('worksheet', priority=10, max_attempts=3)
+def generate_worksheet(payload):
+    from .views import _build_ai_service, _save_worksheet, _worksheet_response_data
+
+    ai_service = _build_ai_service()
+    worksheet_data = ai_service.create_personalized_worksheet(
+        mood_input=payload['mood'],
+        subject=payload['subject'],
+        grade_level=payload['grade']
+    )
+    _save_worksheet(payload['worksheet_id'], payload['mood'], payload['subject'], payload['grade'], worksheet_data)
+    return _worksheet_response_data(payload['worksheet_id'], worksheet_data, payload['subject'], payload['grade'])
+
+@register_job('pdf', priority=5, max_attempts=2)
+def render_pdf(payload):
+    from .views import _pdf_filename
+
+    pdf_cache = PDFFileCache()
+    path = pdf_cache.get_or_render(
+        pdf_cache.content_hash(payload), payload, lambda data: PDFGenerator().generate_worksheet_pdf(data)
+    )
+    return {'path': str(path), 'filename': _pdf_filename(payload)}
+
+@register_job('worksheet_pack', priority=0, max_attempts=2,
+              on_failure=lambda payload, error: fail_pack(payload['pack_id'], error))
+def generate_worksheet_pack(payload):
+    build_pack(payload['pack_id'])
+    return {'pack_id': payload['pack_id']}
@@ -1,3 +1,557 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from services.ai_services import AIWorksheetService
+from services.metrics_services import metrics
+
+from . import worksheet_packs
+from .detail_cache import worksheet_detail_cache
+from .health import HealthMonitor
+from .jobs import JOB_TYPES, JobWorker, enqueue, register_job
+from .models import Job, Question, QuestionBankEntry, Worksheet
+from .question_bank import QuestionBank
+from .views import _save_worksheet, _stored_pdf_worksheet_data
+
+
+class JobQueueTests(TestCase):
+    """The jobs table and worker, run against the test database"""
+
+    def setUp(self):
+        self.calls = []
+        self.failures = []
+
+        @register_job('test_echo', priority=1)
+        def echo(payload):
+            self.calls.append(payload)
+            return {'echo': payload}
+
+        @register_job('test_flaky', max_attempts=2,
+                      on_failure=lambda payload, error: self.failures.append(error))
+        def flaky(payload):
+            raise RuntimeError('groq timed out')
+
+        self.addCleanup(JOB_TYPES.pop, 'test_echo')
+        self.addCleanup(JOB_TYPES.pop, 'test_flaky')
+        self.worker = JobWorker(worker_id='test-worker', job_types=['test_echo', 'test_flaky'])
+
+    def test_runs_jobs_by_priority_then_age(self):
+        low = enqueue('test_echo', {'n': 1})
+        high = enqueue('test_echo', {'n': 2}, priority=10)
+
+        self.assertTrue(self.worker.run_once())
+        self.assertTrue(self.worker.run_once())
+        self.assertFalse(self.worker.run_once())
+
+        self.assertEqual(self.calls, [{'n': 2}, {'n': 1}])
+        for job in (low, high):
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'done')
+            self.assertEqual(job.attempts, 1)
+        self.assertEqual(high.result, {'echo': {'n': 2}})
+
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        job = enqueue('test_flaky', {})
+
+        self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.error, 'groq timed out')
+        self.assertGreater(job.run_after, timezone.now())
+        # Not runnable again until the backoff has passed
+        self.assertFalse(self.worker.run_once())
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(self.failures, ['groq timed out'])
+
+    @override_settings(JOB_CONCURRENCY={'test_echo': 1})
+    def test_concurrency_limit_per_job_type(self):
+        enqueue('test_echo', {'n': 1})
+        enqueue('test_echo', {'n': 2})
+
+        first = self.worker.claim()
+        self.assertIsNotNone(first)
+        self.assertIsNone(self.worker.claim())
+
+        self.worker.run(first)
+        self.assertIsNotNone(self.worker.claim())
+
+    def test_stale_running_job_is_requeued(self):
+        job = enqueue('test_echo', {})
+        claimed = self.worker.claim()
+        Job.objects.filter(pk=claimed.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(self.worker.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        # Backed off like any failed attempt, so a job that kills its worker isn't retried in a tight loop
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertFalse(self.worker.run_once())
+
+    def test_stale_job_out_of_attempts_runs_the_failure_hook(self):
+        job = enqueue('test_flaky', {}, max_attempts=1)
+        self.worker.claim()
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(self.worker.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(self.failures, ['Worker stopped responding'])
+
+    def test_unknown_job_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue('no_such_job', {})
+
+
+class AsyncPDFJobTests(TestCase):
+
+    def test_async_pdf_request_returns_202_and_job_url(self):
+        worksheet = {
+            'async': True,
+            'worksheet_id': '3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f',
+            'mood': 'tired',
+            'subject': 'math',
+            'motivation': 'One step at a time!',
+            'questions': {'easy': 'What is 2 + 2?', 'medium': 'What is 12 x 3?', 'hard': 'Solve 3x = 12.'},
+        }
+        with override_settings(PDF_CACHE_DIR=tempfile.mkdtemp()):
+            response = self.client.post('/generate-pdf/', json.dumps(worksheet), content_type='application/json')
+            self.assertEqual(response.status_code, 202)
+            status_url = response.json()['status_url']
+            self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+
+            self.assertTrue(JobWorker(job_types=['pdf']).run_once())
+
+            status = self.client.get(status_url).json()
+            self.assertEqual(status['status'], 'done')
+            self.assertNotIn('path', status['result'])
+
+            download = self.client.get(status['result']['download_url'])
+            self.assertEqual(download.status_code, 200)
+            self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+
+class StreamWorksheetTests(TestCase):
+    """The Server-Sent Events endpoint, read back through streaming_content"""
+
+    mood_analysis = {'detected_emotion': 'neutral', 'learning_mood': 'calm', 'confidence': 0.8}
+
+    def service(self, client=None):
+        with mock.patch('services.ai_services.MoodAnalyzer'):
+            service = AIWorksheetService()
+        service.mood_analyzer.analyze_mood.return_value = dict(self.mood_analysis)
+        generator = service.question_generator
+        generator.cache = generator.rate_limiter = generator.breaker = generator.hedge = None
+        generator.client = client
+        return service
+
+    def stream(self, service):
+        with mock.patch('app1.views._build_ai_service', return_value=service):
+            response = self.client.post('/generate-worksheet/stream/', json.dumps({'mood': 'calm', 'subject': 'math'}),
+                                        content_type='application/json')
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(body.endswith('\n\n'))
+        events = []
+        for raw in body[:-2].split('\n\n'):
+            event_line, data_line = raw.split('\n')
+            self.assertTrue(event_line.startswith('event: ') and data_line.startswith('data: '))
+            events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+        return events
+
+    def first_content_samples(self):
+        return len(metrics.recent_samples('worksheet_stream_first_content_seconds'))
+
+    def test_fallback_worksheet_streams_in_order_and_finishes(self):
+        samples_before = self.first_content_samples()
+
+        events = self.stream(self.service(client=None))
+
+        self.assertEqual(
+            [(name, data.get('difficulty')) for name, data in events],
+            [('mood', None), ('motivation', None), ('question', 'easy'), ('question', 'medium'),
+             ('question', 'hard'), ('done', None)]
+        )
+        self.assertEqual(events[0][1]['mood_analysis']['learning_mood'], 'calm')
+        done = events[-1][1]
+        self.assertEqual(done['motivation'], events[1][1]['motivation'])
+        self.assertEqual(done['questions'], {data['difficulty']: data['question'] for name, data in events[2:5]})
+        self.assertLessEqual(done['timing']['time_to_first_content_ms'], done['timing']['total_ms'])
+        self.assertEqual(self.first_content_samples() - samples_before, 1)
+        self.assertTrue(Worksheet.objects.filter(id=done['worksheet_id']).exists())
+
+    def test_failed_slot_falls_back_and_the_stream_still_finishes(self):
+        def create(messages, **kwargs):
+            if 'ONE medium level' in messages[0]['content']:
+                raise RuntimeError('Groq returned 500')
+            return mock.Mock(choices=[mock.Mock(message=mock.Mock(content='From Groq'))], usage=None)
+
+        client = mock.Mock()
+        client.chat.completions.create.side_effect = create
+        service = self.service(client=client)
+        fallback = service.question_generator._fallback_question_generation('calm', 'math', '5-10')
+
+        events = self.stream(service)
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'mood')
+        self.assertEqual(names[-1], 'done')
+        self.assertEqual(sorted(names[1:-1]), ['motivation', 'question', 'question', 'question'])
+        done = events[-1][1]
+        self.assertEqual(done['motivation'], 'From Groq')
+        self.assertEqual(done['questions'], {'easy': 'From Groq', 'medium': fallback['questions']['medium'],
+                                             'hard': 'From Groq'})
+
+
+class AsyncViewParityTests(TestCase):
+    """The /async/ endpoints answer exactly like their sync counterparts"""
+
+    worksheet_data = {
+        'motivation': 'You can do this!',
+        'motivationEmoji': '🎯',
+        'questions': {'easy': 'What is 2 + 2?', 'medium': 'What is 12 x 3?', 'hard': 'Solve 3x = 12.'},
+        'mood_analysis': {'learning_mood': 'focused', 'confidence': 0.9},
+    }
+
+    def post(self, path, body, **headers):
+        service = mock.Mock()
+        service.create_personalized_worksheet.return_value = dict(self.worksheet_data)
+        service.acreate_personalized_worksheet = mock.AsyncMock(return_value=dict(self.worksheet_data))
+        with mock.patch('app1.views._build_ai_service', return_value=service):
+            return self.client.post(path, json.dumps(body), content_type='application/json', **headers)
+
+    def comparable(self, response):
+        data = response.json()
+        for field in ('worksheet_id', 'timestamp', 'job_id', 'status_url'):
+            data.pop(field, None)
+        return response.status_code, data
+
+    def test_worksheet_endpoints_agree(self):
+        for body, headers in [
+            ({'mood': 'focused', 'subject': 'math'}, {}),
+            ({'mood': '', 'subject': 'math'}, {}),
+            ({'mood': 'focused', 'subject': 'history'}, {}),
+            ({'mood': 'focused', 'subject': 'math', 'async': True}, {}),
+            ({'mood': 'focused', 'subject': 'math'}, {'HTTP_PREFER': 'respond-async'}),
+        ]:
+            with self.subTest(body=body, headers=headers):
+                sync = self.post('/generate-worksheet/', body, **headers)
+                async_ = self.post('/async/generate-worksheet/', body, **headers)
+                self.assertEqual(self.comparable(async_), self.comparable(sync))
+
+        self.assertEqual(Worksheet.objects.count(), 2)
+        self.assertEqual(Job.objects.filter(job_type='worksheet').count(), 4)
+
+    def test_pdf_endpoints_agree(self):
+        worksheet = {
+            'worksheet_id': '3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f', 'mood': 'focused', 'subject': 'math',
+            'motivation': 'You can do this!', 'questions': self.worksheet_data['questions'],
+        }
+        sync = self.client.post('/generate-pdf/', json.dumps(worksheet), content_type='application/json')
+        async_ = self.client.post('/async/generate-pdf/', json.dumps(worksheet), content_type='application/json')
+        self.assertEqual(async_.status_code, sync.status_code)
+        self.assertEqual(async_['Content-Type'], 'application/pdf')
+        self.assertEqual(async_['Content-Disposition'], sync['Content-Disposition'])
+
+        for body in [{'mood': 'focused'}, {**worksheet, 'async': True}]:
+            with self.subTest(body=body):
+                sync = self.client.post('/generate-pdf/', json.dumps(body), content_type='application/json')
+                async_ = self.client.post('/async/generate-pdf/', json.dumps(body), content_type='application/json')
+                self.assertEqual(self.comparable(async_), self.comparable(sync))
+
+
+class WorksheetPersistenceTests(TestCase):
+    worksheet_data = {
+        'motivation': 'You can do this!',
+        'questions': {'easy': 'What is 2 + 2?', 'medium': 'What is 12 x 3?', 'hard': 'Solve 3x = 12.'},
+        'answers': {'easy': '4', 'medium': '36', 'hard': 'x = 4'},
+        'hints': {'easy': 'Count up', 'medium': '', 'hard': 'Divide both sides by 3'},
+        'mood_analysis': {'learning_mood': 'calm', 'confidence': 0.8},
+    }
+
+    def setUp(self):
+        worksheet_detail_cache().clear()
+
+    def test_save_writes_worksheet_and_questions_in_two_inserts(self):
+        worksheet_id = '3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f'
+        # Savepoint and release around the INSERT for the worksheet and one bulk INSERT for its questions
+        with self.assertNumQueries(4):
+            worksheet = _save_worksheet(worksheet_id, 'a bit tired', 'math', '5-10', self.worksheet_data)
+
+        self.assertEqual(str(worksheet.id), worksheet_id)
+        self.assertEqual(worksheet.motivation_message, 'You can do this!')
+        self.assertEqual(
+            list(Question.objects.filter(worksheet=worksheet).values_list('difficulty', 'answer', 'order')),
+            [('easy', '4', 0), ('medium', '36', 1), ('hard', 'x = 4', 2)]
+        )
+
+    def test_failed_question_insert_rolls_back_the_worksheet(self):
+        with mock.patch.object(Question.objects, 'bulk_create', side_effect=DatabaseError('disk full')):
+            saved = _save_worksheet('3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f', 'tired', 'math', '5-10',
+                                    self.worksheet_data)
+
+        self.assertIsNone(saved)
+        self.assertFalse(Worksheet.objects.exists())
+
+    def test_detail_loads_in_two_queries_then_from_cache(self):
+        worksheet = _save_worksheet('3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f', 'a bit tired', 'math', '5-10',
+                                    self.worksheet_data)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/worksheet/{worksheet.id}/')
+        with self.assertNumQueries(0):
+            cached = self.client.get(f'/worksheet/{worksheet.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['mood_input'], 'a bit tired')
+        self.assertEqual(data['questions'], self.worksheet_data['questions'])
+        self.assertEqual(data['mood_analysis']['learning_mood'], 'calm')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_detail_revalidates_with_etag(self):
+        worksheet = _save_worksheet('3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f', 'tired', 'math', '5-10',
+                                    self.worksheet_data)
+        etag = self.client.get(f'/worksheet/{worksheet.id}/')['ETag']
+
+        response = self.client.get(f'/worksheet/{worksheet.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_updating_a_worksheet_invalidates_its_cached_detail(self):
+        worksheet = _save_worksheet('3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f', 'tired', 'math', '5-10',
+                                    self.worksheet_data)
+        before = self.client.get(f'/worksheet/{worksheet.id}/')
+
+        worksheet.motivation_message = 'Keep going!'
+        worksheet.save()
+        after = self.client.get(f'/worksheet/{worksheet.id}/')
+
+        self.assertEqual(after.json()['motivation'], 'Keep going!')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+
+    def test_stored_pdf_data_keeps_the_mood_emoji(self):
+        worksheet = _save_worksheet('3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f', 'a bit tired', 'math', '5-10',
+                                    self.worksheet_data)
+
+        data = _stored_pdf_worksheet_data(Worksheet.objects.prefetch_related('questions').get(id=worksheet.id))
+
+        # Picked from the detected learning mood ('calm'), as when the worksheet was generated
+        self.assertEqual(data['motivationEmoji'], '🧘‍♀️')
+
+    def test_detail_of_unknown_worksheet_is_404(self):
+        response = self.client.get('/worksheet/3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f/')
+        self.assertEqual(response.status_code, 404)
+
+
+class WorksheetPackTests(TestCase):
+
+    @override_settings(WORKSHEET_PACK_RUN_IN_PROCESS=True)
+    def test_pack_runs_in_process_without_a_worker(self):
+        def run_inline(target, **kwargs):
+            return mock.Mock(start=target)
+
+        body = {'subject': 'math', 'students': [{'student': 'Ana', 'mood': 'happy'}]}
+        with mock.patch('app1.worksheet_packs.threading.Thread', side_effect=run_inline), \
+                mock.patch('app1.tasks.build_pack') as build_pack:
+            response = self.client.post('/worksheet-packs/', json.dumps(body), content_type='application/json')
+
+        self.assertEqual(response.status_code, 202)
+        build_pack.assert_called_once_with(response.json()['pack_id'])
+        self.assertEqual(Job.objects.get(id=response.json()['job_id']).status, 'done')
+
+    @override_settings(WORKSHEET_PACK_RUN_IN_PROCESS=True)
+    def test_only_one_in_process_runner_at_a_time(self):
+        self.addCleanup(setattr, worksheet_packs, '_pack_runner', None)
+        body = {'subject': 'math', 'students': [{'student': 'Ana', 'mood': 'happy'}]}
+        with mock.patch('app1.worksheet_packs.threading.Thread') as thread:
+            for _ in range(3):
+                self.client.post('/worksheet-packs/', json.dumps(body), content_type='application/json')
+
+        # The runner still busy with the first pack picks up the later ones
+        thread.assert_called_once()
+        self.assertTrue(worksheet_packs._pack_runner_wanted.is_set())
+
+    @override_settings(WORKSHEET_PACK_RUN_IN_PROCESS=False)
+    def test_packs_are_left_to_run_jobs_when_the_runner_is_off(self):
+        body = {'subject': 'math', 'students': [{'student': 'Ana', 'mood': 'happy'}]}
+        with mock.patch('app1.worksheet_packs.threading.Thread') as thread:
+            response = self.client.post('/worksheet-packs/', json.dumps(body), content_type='application/json')
+
+        thread.assert_not_called()
+        self.assertEqual(Job.objects.get(id=response.json()['job_id']).status, 'queued')
+
+
+class QuestionBankTests(TestCase):
+
+    worksheet = {
+        'motivation': 'You can do this!',
+        'questions': {'easy': 'What is 2 + 2?', 'medium': 'What is 12 x 3?', 'hard': 'Solve 3x + 1 = 10.'},
+    }
+
+    def test_fallback_questions_are_not_banked(self):
+        self.assertEqual(QuestionBank.deposit('tired', 'math', '5-10', self.worksheet, skip_slots=['hard']), 2)
+        self.assertEqual(
+            set(QuestionBankEntry.objects.values_list('difficulty', flat=True)), {'easy', 'medium'}
+        )
+
+        # Every row would carry a canned motivation, so nothing is banked
+        self.assertEqual(QuestionBank.deposit('tired', 'math', '5-10', self.worksheet, skip_slots=['motivation']), 0)
+        self.assertEqual(QuestionBankEntry.objects.count(), 2)
+
+    def bank(self, n):
+        worksheet = {
+            'motivation': f'Motivation {n}',
+            'questions': {d: f'{d} question {n}' for d in ('easy', 'medium', 'hard')},
+        }
+        QuestionBank.deposit('tired', 'math', '5-10', worksheet)
+
+    def test_take_pops_the_oldest_complete_worksheet(self):
+        self.bank(1)
+        self.bank(2)
+
+        worksheet = QuestionBank().take('tired', 'math', '5-10')
+
+        self.assertEqual(worksheet['questions'], {'easy': 'easy question 1', 'medium': 'medium question 1',
+                                                  'hard': 'hard question 1'})
+        self.assertEqual(QuestionBank.depth('tired', 'math', '5-10'), 1)
+
+    def test_incomplete_bucket_claims_nothing(self):
+        self.bank(1)
+        QuestionBankEntry.objects.filter(difficulty='hard').delete()
+
+        self.assertIsNone(QuestionBank().take('tired', 'math', '5-10'))
+        self.assertEqual(QuestionBankEntry.objects.count(), 2)
+
+    def test_row_claimed_by_a_concurrent_request_is_skipped(self):
+        self.bank(1)
+        self.bank(2)
+        real_filter = QuestionBankEntry.objects.filter
+        stolen = []
+
+        def racing_filter(**kwargs):
+            if 'pk' in kwargs and not stolen:
+                # Another request deletes the oldest easy question between our read and our delete
+                stolen.append(kwargs['pk'])
+                real_filter(pk=kwargs['pk']).delete()
+            return real_filter(**kwargs)
+
+        with mock.patch.object(QuestionBankEntry.objects, 'filter', side_effect=racing_filter):
+            worksheet = QuestionBank().take('tired', 'math', '5-10')
+
+        self.assertEqual(worksheet['questions']['easy'], 'easy question 2')
+        self.assertEqual(worksheet['questions']['medium'], 'medium question 1')
+        self.assertFalse(QuestionBankEntry.objects.filter(difficulty='easy').exists())
+
+    def test_refill_stops_while_groq_is_unavailable(self):
+        with mock.patch('app1.management.commands.refill_question_bank.GroqQuestionGenerator') as generator_class:
+            generator = generator_class.return_value
+            generator.blocked_reason.return_value = 'circuit_open'
+            call_command('refill_question_bank', '--once', '--moods', 'tired', '--subjects', 'math',
+                         stdout=mock.Mock(), stderr=mock.Mock())
+
+        generator.generate_live.assert_not_called()
+        self.assertEqual(QuestionBankEntry.objects.count(), 0)
+
+
+class MetricsEndpointTests(TestCase):
+    pdf_request = {
+        'worksheet_id': '3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f',
+        'mood': 'tired',
+        'subject': 'math',
+        'motivation': 'One step at a time!',
+        'questions': {'easy': 'What is 2 + 2?', 'medium': 'What is 12 x 3?', 'hard': 'Solve 3x = 12.'},
+    }
+
+    def test_metrics_are_served_as_prometheus_text_or_json(self):
+        self.client.post('/generate-pdf/', json.dumps(self.pdf_request), content_type='application/json')
+
+        response = self.client.get('/metrics/')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE pdf_render_seconds histogram', response.content.decode())
+
+        snapshot = self.client.get('/metrics/?format=json').json()
+        self.assertIn('pdf_render_seconds{kind=worksheet}', snapshot['timings'])
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header_lists_request_spans(self):
+        response = self.client.post('/generate-pdf/', json.dumps(self.pdf_request), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        stages = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+        self.assertEqual(stages, ['json_parse', 'pdf_render', 'total'])
+
+    def test_server_timing_is_off_by_default(self):
+        response = self.client.get('/metrics/')
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(GROQ_API_KEY='test-key')
+class ReadinessTests(TestCase):
+
+    def setUp(self):
+        self.registry = mock.Mock(is_loaded=True)
+        self.registry.stats.return_value = {
+            'lite_mode': False, 'warmed': True, 'load_seconds': 1.5, 'load_attempts': 1, 'load_failures': 0
+        }
+        patcher = mock.patch('app1.health.emotion_model_registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.monitor = HealthMonitor(interval=0)
+        patcher = mock.patch('app1.views.get_health_monitor', return_value=self.monitor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ready_worker_reports_every_check(self):
+        enqueue('pdf', {'worksheet_id': '3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f'})
+
+        response = self.client.get('/health/ready/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'ready')
+        self.assertEqual(data['checks']['emotion_model']['state'], 'ready')
+        self.assertEqual(data['checks']['database']['status'], 'ok')
+        self.assertEqual(data['checks']['queue']['queued'], 1)
+        self.assertTrue(all(entry['ok'] for entry in data['checks']['caches']['backends'].values()))
+        self.assertEqual(response['Cache-Control'], 'no-store')
+
+    def test_worker_loading_the_model_is_not_ready(self):
+        self.registry.is_loaded = False
+        self.registry.stats.return_value.update(warmed=False, load_attempts=0)
+
+        with mock.patch.object(HealthMonitor, '_start_warmup') as start_warmup:
+            response = self.client.get('/health/ready/')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['emotion_model']['state'], 'loading')
+        start_warmup.assert_called_once()
+        self.assertEqual(self.client.get('/health/live/').status_code, 200)
+
+    def test_recent_groq_errors_degrade_but_keep_serving(self):
+        from services.metrics_services import metrics
+
+        self.monitor.refresh()
+        for _ in range(6):
+            metrics.inc('groq_calls_total', mode='parallel', outcome='error')
+        metrics.inc('groq_calls_total', mode='batched', outcome='success')
+
+        groq = self.monitor.refresh()['checks']['groq']
+
+        self.assertEqual(groq['status'], 'degraded')
+        self.assertEqual(groq['calls'], 7)
+        self.assertAlmostEqual(groq['error_rate'], 6 / 7)
+        self.assertEqual(self.client.get('/health/ready/').status_code, 200)
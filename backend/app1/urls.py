@@ -2,14 +2,37 @@
 from django.urls import path
 from .views import (
     GenerateWorksheetView,
+    AsyncGenerateWorksheetView,
+    StreamWorksheetView,
     GeneratePDFView,
+    AsyncGeneratePDFView,
     WorksheetDetailView,
-    HealthCheckView
+    WorksheetPDFView,
+    WorksheetPackView,
+    WorksheetPackDetailView,
+    WorksheetPackPDFView,
+    JobStatusView,
+    JobFileView,
+    MetricsView,
+    HealthCheckView,
+    ReadinessView
 )
 
 urlpatterns = [
     path('generate-worksheet/', GenerateWorksheetView.as_view(), name='generate_worksheet'),
     path('generate-pdf/', GeneratePDFView.as_view(), name='generate_pdf'),
+    path('generate-worksheet/stream/', StreamWorksheetView.as_view(), name='stream_worksheet'),
+    path('async/generate-worksheet/', AsyncGenerateWorksheetView.as_view(), name='async_generate_worksheet'),
+    path('async/generate-pdf/', AsyncGeneratePDFView.as_view(), name='async_generate_pdf'),
     path('worksheet/<uuid:worksheet_id>/', WorksheetDetailView.as_view(), name='worksheet_detail'),
+    path('worksheet/<uuid:worksheet_id>/pdf/', WorksheetPDFView.as_view(), name='worksheet_pdf'),
+    path('worksheet-packs/', WorksheetPackView.as_view(), name='worksheet_packs'),
+    path('worksheet-packs/<uuid:pack_id>/', WorksheetPackDetailView.as_view(), name='worksheet_pack_detail'),
+    path('worksheet-packs/<uuid:pack_id>/pdf/', WorksheetPackPDFView.as_view(), name='worksheet_pack_pdf'),
+    path('jobs/<uuid:job_id>/', JobStatusView.as_view(), name='job_status'),
+    path('jobs/<uuid:job_id>/file/', JobFileView.as_view(), name='job_file'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('health/', HealthCheckView.as_view(), name='health_check'),
+    path('health/live/', HealthCheckView.as_view(), name='health_live'),
+    path('health/ready/', ReadinessView.as_view(), name='health_ready'),
 ]
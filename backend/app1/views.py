@@ -1,19 +1,153 @@
 # app1/views.py
 import json
+import time
 import uuid
+import asyncio
+import contextvars
 import logging
 from datetime import datetime
-from django.http import JsonResponse, HttpResponse
+from asgiref.sync import sync_to_async
+from pathlib import Path
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from django.urls import reverse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.utils import timezone
 from django.conf import settings
-from services.ai_services import AIWorksheetService
-from .models import Worksheet
-from services.pdf_services import PDFGenerator
+from django.db import transaction
+from services.ai_services import AIWorksheetService, GroqQuestionGenerator, DIFFICULTY_LEVELS
+from services.metrics_services import metrics
+from .health import get_health_monitor
+from .detail_cache import get_worksheet_detail, make_entry, set_worksheet_detail
+from .jobs import enqueue
+from .models import Job, Question, Worksheet, WorksheetPack
+from .worksheet_packs import parse_pack_entries, submit_pack
+from .question_bank import QuestionBank
+from services.pdf_services import PDFGenerator, PDFFileCache, get_pdf_executor
 
 logger = logging.getLogger(__name__)
 
+VALID_SUBJECTS = ['math', 'science']
+
+def _worksheet_request_error(mood, subject):
+    """Validation error response for a worksheet request, or None if it is valid"""
+    if not mood:
+        return JsonResponse({
+            'error': 'Mood is required',
+            'message': 'Please tell us how you\'re feeling today!'
+        }, status=400)
+    
+    if not subject:
+        return JsonResponse({
+            'error': 'Subject is required',
+            'message': 'Please choose a subject to get started!'
+        }, status=400)
+    
+    # Validate subject
+    if subject not in VALID_SUBJECTS:
+        return JsonResponse({
+            'error': 'Invalid subject',
+            'message': f'Subject must be one of: {", ".join(VALID_SUBJECTS)}'
+        }, status=400)
+    
+    return None
+
+def _parse_json(request):
+    """Decode the JSON request body (raises json.JSONDecodeError), timed as the json_parse stage"""
+    with metrics.span('json_parse'):
+        return json.loads(request.body)
+
+def _build_ai_service():
+    question_bank = QuestionBank() if getattr(settings, 'QUESTION_BANK_ENABLED', True) else None
+    return AIWorksheetService(question_bank=question_bank)
+
+def _save_worksheet(worksheet_id, mood, subject, grade, worksheet_data):
+    """Persist the worksheet and its questions in one transaction; failures are logged, not raised"""
+    try:
+        answers = worksheet_data.get('answers') or {}
+        hints = worksheet_data.get('hints') or {}
+        questions = worksheet_data.get('questions') or {}
+        with metrics.span('db_save'), transaction.atomic():
+            worksheet = Worksheet.objects.create(
+                id=worksheet_id,
+                user_mood=mood[:Worksheet._meta.get_field('user_mood').max_length],
+                subject=subject,
+                grade_level=grade,
+                motivation_message=worksheet_data.get('motivation') or '',
+                mood_analysis=worksheet_data.get('mood_analysis')
+            )
+            Question.objects.bulk_create([
+                Question(
+                    worksheet=worksheet,
+                    difficulty=difficulty,
+                    question_text=questions[difficulty],
+                    answer=answers.get(difficulty) or None,
+                    hints=hints.get(difficulty) or None,
+                    order=order
+                )
+                for order, difficulty in enumerate(DIFFICULTY_LEVELS)
+                if questions.get(difficulty)
+            ])
+        return worksheet
+    except Exception as db_error:
+        logger.warning(f"Failed to save worksheet to database: {db_error}")
+        # Continue without database save
+        return None
+
+def _worksheet_response_data(worksheet_id, worksheet_data, subject, grade):
+    return {
+        'worksheet_id': worksheet_id,
+        'motivation': worksheet_data.get('motivation'),
+        'motivationEmoji': worksheet_data.get('motivationEmoji'),
+        'questions': worksheet_data.get('questions'),
+        'mood_analysis': worksheet_data.get('mood_analysis'),
+        'subject': subject,
+        'grade_level': grade,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def _pdf_worksheet_data(data):
+    """Extract the worksheet fields PDFGenerator needs, or None if any are missing"""
+    worksheet_data = {
+        'worksheet_id': data.get('worksheet_id'),
+        'mood': data.get('mood'),
+        'subject': data.get('subject'),
+        'motivation': data.get('motivation'),
+        'motivationEmoji': data.get('motivationEmoji'),
+        'questions': data.get('questions'),
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    required = ['worksheet_id', 'mood', 'subject', 'motivation', 'questions']
+    if not all(worksheet_data[field] for field in required):
+        return None
+    return worksheet_data
+
+def _stored_pdf_worksheet_data(worksheet):
+    """PDFGenerator input for a stored worksheet, built only from stored fields so its hash is stable"""
+    # The emoji was picked from the detected learning mood; older rows only have the raw input
+    learning_mood = (worksheet.mood_analysis or {}).get('learning_mood') or worksheet.user_mood
+    return {
+        'worksheet_id': str(worksheet.id),
+        'mood': worksheet.user_mood,
+        'subject': worksheet.subject,
+        'grade_level': worksheet.grade_level,
+        'motivation': worksheet.motivation_message,
+        'motivationEmoji': GroqQuestionGenerator.mood_emoji(learning_mood),
+        'questions': {question.difficulty: question.question_text for question in worksheet.questions.all()},
+        'timestamp': worksheet.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+def _pdf_filename(worksheet_data):
+    return f"ZappyLearn_{worksheet_data['subject']}_{worksheet_data['worksheet_id'][:8]}.pdf"
+
+def _pdf_response(pdf_buffer, worksheet_data):
+    response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{_pdf_filename(worksheet_data)}"'
+    response['Content-Length'] = len(pdf_buffer.getvalue())
+    return response
+
 @method_decorator(csrf_exempt, name='dispatch')
 class GenerateWorksheetView(View):
     """Generate personalized worksheet based on mood and subject"""
@@ -21,34 +155,23 @@ class GenerateWorksheetView(View):
     def post(self, request):
         try:
             # Parse request data
-            data = json.loads(request.body)
+            data = _parse_json(request)
             mood = data.get('mood', '').strip()
             subject = data.get('subject', '').strip()
             grade = data.get('grade', '5-10')
             
             # Validate input
-            if not mood:
-                return JsonResponse({
-                    'error': 'Mood is required',
-                    'message': 'Please tell us how you\'re feeling today!'
-                }, status=400)
+            error_response = _worksheet_request_error(mood, subject)
+            if error_response:
+                return error_response
             
-            if not subject:
-                return JsonResponse({
-                    'error': 'Subject is required',
-                    'message': 'Please choose a subject to get started!'
-                }, status=400)
-            
-            # Validate subject
-            valid_subjects = ['math', 'science']
-            if subject not in valid_subjects:
-                return JsonResponse({
-                    'error': 'Invalid subject',
-                    'message': f'Subject must be one of: {", ".join(valid_subjects)}'
-                }, status=400)
+            if _wants_async(request, data):
+                worksheet_id = str(uuid.uuid4())
+                job = enqueue('worksheet', {'worksheet_id': worksheet_id, 'mood': mood, 'subject': subject, 'grade': grade})
+                return _job_accepted_response(job, worksheet_id=worksheet_id)
             
             # Generate worksheet using AI service
-            ai_service = AIWorksheetService()
+            ai_service = _build_ai_service()
             worksheet_data = ai_service.create_personalized_worksheet(
                 mood_input=mood,
                 subject=subject,
@@ -57,36 +180,62 @@ class GenerateWorksheetView(View):
             
             # Create unique worksheet ID
             worksheet_id = str(uuid.uuid4())
+            _save_worksheet(worksheet_id, mood, subject, grade, worksheet_data)
             
-            # Save worksheet to database (optional)
-            try:
-                worksheet = Worksheet.objects.create(
-                    worksheet_id=worksheet_id,
-                    mood_input=mood,
-                    subject=subject,
-                    grade_level=grade,
-                    motivation=worksheet_data.get('motivation'),
-                    questions=worksheet_data.get('questions'),
-                    mood_analysis=worksheet_data.get('mood_analysis')
+            logger.info(f"Worksheet generated successfully: {worksheet_id}")
+            return JsonResponse(_worksheet_response_data(worksheet_id, worksheet_data, subject, grade))
+            
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'error': 'Invalid JSON',
+                'message': 'Please check your request format'
+            }, status=400)
+        
+        except Exception as e:
+            logger.error(f"Error generating worksheet: {str(e)}")
+            return JsonResponse({
+                'error': 'Generation failed',
+                'message': 'Something went wrong while creating your worksheet. Please try again!'
+            }, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncGenerateWorksheetView(View):
+    """
+    ASGI version of GenerateWorksheetView: the Groq calls are awaited, so one
+    worker serves many in-flight worksheets instead of one per thread
+    """
+    
+    async def post(self, request):
+        try:
+            data = _parse_json(request)
+            mood = data.get('mood', '').strip()
+            subject = data.get('subject', '').strip()
+            grade = data.get('grade', '5-10')
+            
+            error_response = _worksheet_request_error(mood, subject)
+            if error_response:
+                return error_response
+            
+            if _wants_async(request, data):
+                worksheet_id = str(uuid.uuid4())
+                job = await sync_to_async(enqueue)(
+                    'worksheet', {'worksheet_id': worksheet_id, 'mood': mood, 'subject': subject, 'grade': grade}
                 )
-            except Exception as db_error:
-                logger.warning(f"Failed to save worksheet to database: {db_error}")
-                # Continue without database save
-            
-            # Prepare response
-            response_data = {
-                'worksheet_id': worksheet_id,
-                'motivation': worksheet_data.get('motivation'),
-                'motivationEmoji': worksheet_data.get('motivationEmoji'),
-                'questions': worksheet_data.get('questions'),
-                'mood_analysis': worksheet_data.get('mood_analysis'),
-                'subject': subject,
-                'grade_level': grade,
-                'timestamp': datetime.now().isoformat()
-            }
+                return _job_accepted_response(job, worksheet_id=worksheet_id)
+            
+            # Building the service may load the emotion model, so keep it off the event loop
+            ai_service = await sync_to_async(_build_ai_service, thread_sensitive=False)()
+            worksheet_data = await ai_service.acreate_personalized_worksheet(
+                mood_input=mood,
+                subject=subject,
+                grade_level=grade
+            )
+            
+            worksheet_id = str(uuid.uuid4())
+            await sync_to_async(_save_worksheet)(worksheet_id, mood, subject, grade, worksheet_data)
             
             logger.info(f"Worksheet generated successfully: {worksheet_id}")
-            return JsonResponse(response_data)
+            return JsonResponse(_worksheet_response_data(worksheet_id, worksheet_data, subject, grade))
             
         except json.JSONDecodeError:
             return JsonResponse({
@@ -101,48 +250,150 @@ class GenerateWorksheetView(View):
                 'message': 'Something went wrong while creating your worksheet. Please try again!'
             }, status=500)
 
+def _wants_async(request, data):
+    """Clients opt into background processing with "async": true or `Prefer: respond-async`"""
+    return data.get('async') is True or 'respond-async' in request.headers.get('Prefer', '')
+
+def _job_accepted_response(job, **extra):
+    return JsonResponse({
+        'job_id': str(job.id),
+        'job_type': job.job_type,
+        'status': job.status,
+        'status_url': reverse('job_status', args=[job.id]),
+        **extra
+    }, status=202)
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@method_decorator(csrf_exempt, name='dispatch')
+class StreamWorksheetView(View):
+    """
+    Generate a worksheet as a Server-Sent Events stream: 'mood', then 'motivation'
+    and one 'question' per difficulty as each is ready, then 'done' with the full
+    worksheet and timings. Send "stream_tokens": true to also get 'delta' token events.
+    """
+    
+    def post(self, request):
+        try:
+            data = _parse_json(request)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'error': 'Invalid JSON',
+                'message': 'Please check your request format'
+            }, status=400)
+        
+        mood = data.get('mood', '').strip()
+        subject = data.get('subject', '').strip()
+        grade = data.get('grade', '5-10')
+        error_response = _worksheet_request_error(mood, subject)
+        if error_response:
+            return error_response
+        
+        events = self._events(mood, subject, grade, bool(data.get('stream_tokens', False)))
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+        return response
+    
+    def _events(self, mood, subject, grade, stream_tokens):
+        start = time.perf_counter()
+        first_content_at = None
+        try:
+            ai_service = _build_ai_service()
+            worksheet_data = None
+            for event, payload in ai_service.stream_personalized_worksheet(
+                mood, subject, grade, stream_tokens=stream_tokens
+            ):
+                if event == 'worksheet':
+                    worksheet_data = payload
+                    continue
+                if first_content_at is None and event in ('motivation', 'question', 'delta'):
+                    first_content_at = time.perf_counter()
+                yield _sse_event(event, payload)
+            
+            worksheet_id = str(uuid.uuid4())
+            _save_worksheet(worksheet_id, mood, subject, grade, worksheet_data)
+            
+            total = time.perf_counter() - start
+            time_to_first_content = (first_content_at or time.perf_counter()) - start
+            metrics.observe('worksheet_stream_first_content_seconds', time_to_first_content)
+            metrics.observe('worksheet_stream_total_seconds', total)
+            
+            done = _worksheet_response_data(worksheet_id, worksheet_data, subject, grade)
+            done['timing'] = {
+                'time_to_first_content_ms': round(time_to_first_content * 1000, 1),
+                'total_ms': round(total * 1000, 1)
+            }
+            logger.info(f"Worksheet streamed successfully: {worksheet_id}")
+            yield _sse_event('done', done)
+            
+        except Exception as e:
+            logger.error(f"Error streaming worksheet: {str(e)}")
+            yield _sse_event('error', {
+                'error': 'Generation failed',
+                'message': 'Something went wrong while creating your worksheet. Please try again!'
+            })
+
 @method_decorator(csrf_exempt, name='dispatch')
 class GeneratePDFView(View):
     """Generate PDF from worksheet data"""
     
     def post(self, request):
         try:
-            data = json.loads(request.body)
+            data = _parse_json(request)
             
             # Extract required data
-            worksheet_id = data.get('worksheet_id')
-            mood = data.get('mood')
-            subject = data.get('subject')
-            motivation = data.get('motivation')
-            motivation_emoji = data.get('motivationEmoji')
-            questions = data.get('questions')
-            
-            if not all([worksheet_id, mood, subject, motivation, questions]):
+            worksheet_data = _pdf_worksheet_data(data)
+            if worksheet_data is None:
                 return JsonResponse({
                     'error': 'Missing required data',
                     'message': 'Incomplete worksheet data for PDF generation'
                 }, status=400)
             
+            if _wants_async(request, data):
+                return _job_accepted_response(enqueue('pdf', worksheet_data))
+            
             # Generate PDF
             pdf_generator = PDFGenerator()
-            pdf_buffer = pdf_generator.generate_worksheet_pdf({
-                'worksheet_id': worksheet_id,
-                'mood': mood,
-                'subject': subject,
-                'motivation': motivation,
-                'motivationEmoji': motivation_emoji,
-                'questions': questions,
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
+            pdf_buffer = pdf_generator.generate_worksheet_pdf(worksheet_data)
             
-            # Create response
-            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-            filename = f"ZappyLearn_{subject}_{worksheet_id[:8]}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            response['Content-Length'] = len(pdf_buffer.getvalue())
+            logger.info(f"PDF generated successfully for worksheet: {worksheet_data['worksheet_id']}")
+            return _pdf_response(pdf_buffer, worksheet_data)
             
-            logger.info(f"PDF generated successfully for worksheet: {worksheet_id}")
-            return response
+        except Exception as e:
+            logger.error(f"Error generating PDF: {str(e)}")
+            return JsonResponse({
+                'error': 'PDF generation failed',
+                'message': 'Failed to generate PDF. Please try again!'
+            }, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncGeneratePDFView(View):
+    """ASGI version of GeneratePDFView; rendering runs on the bounded PDF executor"""
+    
+    async def post(self, request):
+        try:
+            data = _parse_json(request)
+            
+            worksheet_data = _pdf_worksheet_data(data)
+            if worksheet_data is None:
+                return JsonResponse({
+                    'error': 'Missing required data',
+                    'message': 'Incomplete worksheet data for PDF generation'
+                }, status=400)
+            
+            if _wants_async(request, data):
+                return _job_accepted_response(await sync_to_async(enqueue)('pdf', worksheet_data))
+            
+            loop = asyncio.get_running_loop()
+            # Run in a copy of the request context so the render span reaches Server-Timing
+            pdf_buffer = await loop.run_in_executor(
+                get_pdf_executor(), contextvars.copy_context().run, PDFGenerator().generate_worksheet_pdf, worksheet_data
+            )
+            
+            logger.info(f"PDF generated successfully for worksheet: {worksheet_data['worksheet_id']}")
+            return _pdf_response(pdf_buffer, worksheet_data)
             
         except Exception as e:
             logger.error(f"Error generating PDF: {str(e)}")
@@ -152,22 +403,51 @@ class GeneratePDFView(View):
             }, status=500)
 
 class WorksheetDetailView(View):
-    """Get worksheet details by ID"""
+    """
+    Get worksheet details by ID. Worksheets are write-once, so the serialized
+    JSON is cached (read-through, invalidated by app1.signals) and served with
+    an ETag and Cache-Control so browsers and CDNs can reuse it.
+    """
     
     def get(self, request, worksheet_id):
+        start = time.perf_counter()
         try:
-            worksheet = Worksheet.objects.get(worksheet_id=worksheet_id)
+            entry = get_worksheet_detail(worksheet_id)
+            cache_result = 'hit' if entry is not None else 'miss'
+            metrics.inc('worksheet_detail_cache_hits_total' if entry is not None
+                        else 'worksheet_detail_cache_misses_total')
             
-            return JsonResponse({
-                'worksheet_id': str(worksheet.worksheet_id),
-                'mood_input': worksheet.mood_input,
-                'subject': worksheet.subject,
-                'grade_level': worksheet.grade_level,
-                'motivation': worksheet.motivation,
-                'questions': worksheet.questions,
-                'mood_analysis': worksheet.mood_analysis,
-                'created_at': worksheet.created_at.isoformat()
-            })
+            if entry is None:
+                # One query for the worksheet, one for all of its questions
+                worksheet = Worksheet.objects.prefetch_related('questions').get(id=worksheet_id)
+                questions = list(worksheet.questions.all())
+                entry = make_entry(json.dumps({
+                    'worksheet_id': str(worksheet.id),
+                    'mood_input': worksheet.user_mood,
+                    'subject': worksheet.subject,
+                    'grade_level': worksheet.grade_level,
+                    'motivation': worksheet.motivation_message,
+                    'questions': {question.difficulty: question.question_text for question in questions},
+                    'answers': {question.difficulty: question.answer or '' for question in questions},
+                    'hints': {question.difficulty: question.hints or '' for question in questions},
+                    'mood_analysis': worksheet.mood_analysis,
+                    'created_at': worksheet.created_at.isoformat()
+                }).encode('utf-8'))
+                set_worksheet_detail(worksheet_id, entry)
+            
+            etag, body = entry
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+            else:
+                response = HttpResponse(body, content_type='application/json')
+            response['ETag'] = etag
+            response['Cache-Control'] = f"public, max-age={getattr(settings, 'WORKSHEET_DETAIL_MAX_AGE', 3600)}"
+            
+            metrics.observe('worksheet_detail_seconds', time.perf_counter() - start, cache=cache_result)
+            hit_ratio = metrics.ratio('worksheet_detail_cache_hits_total',
+                                      ['worksheet_detail_cache_hits_total', 'worksheet_detail_cache_misses_total'])
+            metrics.set_gauge('worksheet_detail_cache_hit_ratio', hit_ratio)
+            return response
             
         except Worksheet.DoesNotExist:
             return JsonResponse({
@@ -182,8 +462,224 @@ class WorksheetDetailView(View):
                 'message': 'Failed to retrieve worksheet'
             }, status=500)
 
+class WorksheetPDFView(View):
+    """
+    Download the PDF of a stored worksheet. PDFs are cached on disk under a
+    hash of their content, and that hash doubles as the ETag, so repeat
+    downloads are a file read (or a 304) rather than a ReportLab render.
+    """
+    
+    def get(self, request, worksheet_id):
+        try:
+            worksheet = Worksheet.objects.prefetch_related('questions').get(id=worksheet_id)
+            worksheet_data = _stored_pdf_worksheet_data(worksheet)
+            
+            pdf_cache = PDFFileCache()
+            key = pdf_cache.content_hash(worksheet_data)
+            etag = quote_etag(key)
+            if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+            if etag in if_none_match or '*' in if_none_match:
+                metrics.inc('pdf_not_modified_total')
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+            
+            path = pdf_cache.get_or_render(key, worksheet_data, lambda data: PDFGenerator().generate_worksheet_pdf(data))
+            
+            # Record the cached file on the worksheet the first time it is rendered
+            try:
+                pdf_name = path.relative_to(Path(settings.MEDIA_ROOT)).as_posix()
+            except ValueError:
+                pdf_name = None
+            if pdf_name and worksheet.pdf_file.name != pdf_name:
+                Worksheet.objects.filter(pk=worksheet.pk).update(pdf_file=pdf_name)
+            
+            response = FileResponse(
+                open(path, 'rb'),
+                as_attachment=True,
+                filename=_pdf_filename(worksheet_data),
+                content_type='application/pdf'
+            )
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, max-age=3600'
+            return response
+            
+        except Worksheet.DoesNotExist:
+            return JsonResponse({
+                'error': 'Worksheet not found',
+                'message': 'The requested worksheet could not be found'
+            }, status=404)
+        
+        except Exception as e:
+            logger.error(f"Error serving worksheet PDF: {str(e)}")
+            return JsonResponse({
+                'error': 'PDF generation failed',
+                'message': 'Could not create PDF. Please try again!'
+            }, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class WorksheetPackView(View):
+    """
+    Queue a class set: one worksheet per student, each with their own mood.
+    Identical (learning mood, subject, grade) work is generated once and the
+    whole set is rendered into a single PDF. Poll the returned status URL.
+    """
+    
+    def post(self, request):
+        try:
+            data = _parse_json(request)
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'error': 'Invalid JSON',
+                'message': 'Please check your request format'
+            }, status=400)
+        
+        entries, error = parse_pack_entries(data, VALID_SUBJECTS)
+        if error:
+            return JsonResponse({
+                'error': 'Invalid pack',
+                'message': error
+            }, status=400)
+        
+        try:
+            pack = WorksheetPack.objects.create(entries=entries)
+            job = submit_pack(pack)
+        except Exception as e:
+            logger.error(f"Error queueing worksheet pack: {str(e)}")
+            return JsonResponse({
+                'error': 'Pack creation failed',
+                'message': 'Something went wrong while queueing your worksheets. Please try again!'
+            }, status=500)
+        
+        logger.info(f"Worksheet pack queued: {pack.id} ({len(entries)} students)")
+        return JsonResponse({
+            'pack_id': str(pack.id),
+            'status': pack.status,
+            'students': len(entries),
+            'status_url': reverse('worksheet_pack_detail', args=[pack.id]),
+            'job_id': str(job.id),
+            'job_url': reverse('job_status', args=[job.id])
+        }, status=202)
+
+class WorksheetPackDetailView(View):
+    """Status of a worksheet pack, with its worksheets and PDF link once done"""
+    
+    def get(self, request, pack_id):
+        try:
+            pack = WorksheetPack.objects.get(id=pack_id)
+        except WorksheetPack.DoesNotExist:
+            return JsonResponse({
+                'error': 'Pack not found',
+                'message': 'The requested worksheet pack could not be found'
+            }, status=404)
+        
+        response_data = {
+            'pack_id': str(pack.id),
+            'status': pack.status,
+            'students': len(pack.entries),
+            'created_at': pack.created_at.isoformat(),
+            'completed_at': pack.completed_at.isoformat() if pack.completed_at else None
+        }
+        if pack.status == 'done':
+            response_data['unique_generations'] = pack.unique_generations
+            response_data['worksheets'] = pack.worksheets
+            response_data['pdf_url'] = reverse('worksheet_pack_pdf', args=[pack.id])
+        elif pack.status == 'failed':
+            response_data['error'] = pack.error
+        return JsonResponse(response_data)
+
+class WorksheetPackPDFView(View):
+    """Download the combined PDF of a finished worksheet pack"""
+    
+    def get(self, request, pack_id):
+        try:
+            pack = WorksheetPack.objects.get(id=pack_id)
+        except WorksheetPack.DoesNotExist:
+            return JsonResponse({
+                'error': 'Pack not found',
+                'message': 'The requested worksheet pack could not be found'
+            }, status=404)
+        
+        if pack.status != 'done' or not pack.pdf_file:
+            return JsonResponse({
+                'error': 'Pack not ready',
+                'message': 'The worksheets are still being prepared',
+                'status': pack.status
+            }, status=409)
+        
+        return FileResponse(
+            pack.pdf_file.open('rb'),
+            as_attachment=True,
+            filename=f"ZappyLearn_class_set_{str(pack.id)[:8]}.pdf",
+            content_type='application/pdf'
+        )
+
+class JobStatusView(View):
+    """Status of a background job, with its result once done"""
+    
+    def get(self, request, job_id):
+        try:
+            job = Job.objects.get(id=job_id)
+        except Job.DoesNotExist:
+            return JsonResponse({
+                'error': 'Job not found',
+                'message': 'The requested job could not be found'
+            }, status=404)
+        
+        response_data = {
+            'job_id': str(job.id),
+            'job_type': job.job_type,
+            'status': job.status,
+            'priority': job.priority,
+            'attempts': job.attempts,
+            'max_attempts': job.max_attempts,
+            'created_at': job.created_at.isoformat(),
+            'completed_at': job.completed_at.isoformat() if job.completed_at else None
+        }
+        if job.status == 'done':
+            result = dict(job.result or {})
+            # File results are served by JobFileView; never expose server paths
+            if result.pop('path', None):
+                result['download_url'] = reverse('job_file', args=[job.id])
+            response_data['result'] = result
+        elif job.error:
+            response_data['error'] = job.error
+        if job.status == 'queued' and job.run_after > timezone.now():
+            response_data['retry_at'] = job.run_after.isoformat()
+        return JsonResponse(response_data)
+
+class JobFileView(View):
+    """Download the file (e.g. a PDF) a finished job produced"""
+    
+    def get(self, request, job_id):
+        job = Job.objects.filter(id=job_id, status='done').first()
+        path = (job.result or {}).get('path') if job else None
+        if not path or not Path(path).is_file():
+            return JsonResponse({
+                'error': 'File not found',
+                'message': 'This job has no file to download yet'
+            }, status=404)
+        
+        return FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=job.result.get('filename') or Path(path).name,
+            content_type='application/pdf'
+        )
+
+class MetricsView(View):
+    """
+    In-process counters, gauges and timings for this worker in the Prometheus
+    text format, or as JSON (with timing percentiles) with ?format=json
+    """
+    
+    def get(self, request):
+        if request.GET.get('format') == 'json':
+            return JsonResponse(metrics.snapshot())
+        return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 class HealthCheckView(View):
-    """Health check endpoint"""
+    """Liveness: the process is up and serving requests. Dependencies are checked by ReadinessView"""
     
     def get(self, request):
         try:
@@ -198,4 +694,18 @@ class HealthCheckView(View):
                 'status': 'unhealthy',
                 'error': str(e),
                 'timestamp': datetime.now().isoformat()
-            }, status=500)
\ No newline at end of file
+            }, status=500)
+
+class ReadinessView(View):
+    """
+    Readiness for load balancers: 200 while this worker should get traffic
+    (status 'ready' or 'degraded'), 503 while it shouldn't ('not_ready', e.g.
+    the emotion model is still loading). Served from a snapshot refreshed in
+    the background, so it is cheap to poll every second.
+    """
+    
+    def get(self, request):
+        snapshot = get_health_monitor().snapshot()
+        response = JsonResponse(snapshot, status=200 if snapshot['ready'] else 503)
+        response['Cache-Control'] = 'no-store'
+        return response
@@ -0,0 +1,143 @@
+# app1/worksheet_packs.py
+import os
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from services.ai_services import AIWorksheetService
+from services.metrics_services import metrics
+from services.pdf_services import PDFGenerator
+from .jobs import JobWorker, enqueue
+from .models import WorksheetPack
+from .question_bank import QuestionBank
+
+logger = logging.getLogger(__name__)
+
+def parse_pack_entries(data: Dict, valid_subjects) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    """
+    Validate a pack request body: {"students": [{"student", "mood", "subject"?, "grade"?}],
+    "subject"?, "grade"?}. Returns (entries, None) or (None, error message).
+    """
+    students = data.get('students')
+    max_students = getattr(settings, 'WORKSHEET_PACK_MAX_STUDENTS', 60)
+    if not isinstance(students, list) or not students:
+        return None, 'Please provide a non-empty list of students'
+    if len(students) > max_students:
+        return None, f'A pack can hold at most {max_students} students'
+
+    entries = []
+    for index, student in enumerate(students, start=1):
+        if not isinstance(student, dict):
+            return None, f'Student {index} must be an object'
+        entry = {
+            'student': str(student.get('student') or f'Student {index}').strip(),
+            'mood': str(student.get('mood', '')).strip(),
+            'subject': str(student.get('subject') or data.get('subject', '')).strip(),
+            'grade_level': str(student.get('grade') or data.get('grade') or '5-10'),
+        }
+        if not entry['mood']:
+            return None, f'Mood is required for {entry["student"]}'
+        if entry['subject'] not in valid_subjects:
+            return None, f'Subject for {entry["student"]} must be one of: {", ".join(valid_subjects)}'
+        entries.append(entry)
+    return entries, None
+
+def submit_pack(pack: WorksheetPack):
+    """
+    Queue the pack for a `run_jobs` worker; returns the Job. With
+    WORKSHEET_PACK_RUN_IN_PROCESS on (a development switch), one background
+    thread in this process also works through the queued packs.
+    """
+    job = enqueue('worksheet_pack', {'pack_id': str(pack.id)})
+    if getattr(settings, 'WORKSHEET_PACK_RUN_IN_PROCESS', False):
+        _start_pack_runner()
+    return job
+
+_pack_runner = None
+_pack_runner_lock = threading.Lock()
+# Set on every submission so a runner about to go idle looks at the queue once more
+_pack_runner_wanted = threading.Event()
+
+def _start_pack_runner() -> None:
+    global _pack_runner
+    with _pack_runner_lock:
+        _pack_runner_wanted.set()
+        if _pack_runner is not None:
+            return
+        _pack_runner = threading.Thread(target=_run_queued_packs, name='worksheet-pack-runner', daemon=True)
+    _pack_runner.start()
+
+def _run_queued_packs() -> None:
+    global _pack_runner
+    worker = JobWorker(worker_id=f"in-process:{os.getpid()}", job_types=['worksheet_pack'])
+    try:
+        while True:
+            _pack_runner_wanted.clear()
+            while worker.run_once():
+                pass
+            with _pack_runner_lock:
+                if not _pack_runner_wanted.is_set():
+                    _pack_runner = None
+                    return
+    except Exception as e:
+        logger.error(f"In-process worksheet pack runner failed: {e}")
+        with _pack_runner_lock:
+            _pack_runner = None
+
+def build_pack(pack_id) -> None:
+    """Generate every worksheet in the pack and render them into one PDF"""
+    pack = WorksheetPack.objects.get(id=pack_id)
+    pack.status = 'running'
+    pack.save(update_fields=['status'])
+
+    question_bank = QuestionBank() if getattr(settings, 'QUESTION_BANK_ENABLED', True) else None
+    ai_service = AIWorksheetService(question_bank=question_bank)
+    worksheets = ai_service.create_worksheet_set(
+        pack.entries, max_workers=getattr(settings, 'WORKSHEET_PACK_CONCURRENCY', 4)
+    )
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    pdf_worksheets = [
+        {
+            'worksheet_id': str(pack.id),
+            'student': entry['student'],
+            'subject': entry['subject'],
+            'motivation': worksheet.get('motivation'),
+            'motivationEmoji': worksheet.get('motivationEmoji'),
+            'questions': worksheet.get('questions'),
+            'timestamp': timestamp,
+        }
+        for entry, worksheet in zip(pack.entries, worksheets)
+    ]
+    pdf_buffer = PDFGenerator().generate_pack_pdf(pdf_worksheets)
+
+    pack.worksheets = [
+        {
+            'student': entry['student'],
+            'learning_mood': worksheet['mood_analysis']['learning_mood'],
+            'subject': entry['subject'],
+            'grade_level': entry['grade_level'],
+            'motivation': worksheet.get('motivation'),
+            'motivationEmoji': worksheet.get('motivationEmoji'),
+            'questions': worksheet.get('questions'),
+        }
+        for entry, worksheet in zip(pack.entries, worksheets)
+    ]
+    pack.unique_generations = len({
+        (w['learning_mood'], w['subject'], w['grade_level']) for w in pack.worksheets
+    })
+    pack.pdf_file.save(f"{pack.id}.pdf", ContentFile(pdf_buffer.getvalue()), save=False)
+    pack.status = 'done'
+    pack.error = ''
+    pack.completed_at = timezone.now()
+    pack.save()
+    metrics.inc('worksheet_packs_total', status='done')
+
+def fail_pack(pack_id, error: str) -> None:
+    """Mark a pack failed once its job has run out of retries"""
+    WorksheetPack.objects.filter(id=pack_id).update(status='failed', error=error, completed_at=timezone.now())
+    metrics.inc('worksheet_packs_total', status='failed')
@@ -46,11 +46,13 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework',
     'app1',
+    'services',
     'django_extensions',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'app1.middleware.server_timing_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,6 +62,9 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
 ]
 
+# Per-request Server-Timing headers (json_parse, analyze_mood, groq_call, db_save, pdf_render spans)
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "false").lower() == "true"
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -90,6 +95,166 @@ DATABASES = {
 # API Keys - Add these to your environment variables
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 
+# Emotion model - loaded once per worker process by services.ai_services.EmotionModelRegistry
+EMOTION_MODEL_NAME = os.environ.get("EMOTION_MODEL_NAME", "j-hartmann/emotion-english-distilroberta-base")
+EMOTION_MODEL_EAGER_LOAD = os.environ.get("EMOTION_MODEL_EAGER_LOAD", "false").lower() == "true"
+# "pytorch" or "onnx"; the ONNX artifact is produced by `manage.py export_emotion_onnx`
+EMOTION_MODEL_BACKEND = os.environ.get("EMOTION_MODEL_BACKEND", "pytorch")
+EMOTION_ONNX_MODEL_DIR = os.environ.get("EMOTION_ONNX_MODEL_DIR", str(BASE_DIR / 'models' / 'emotion-onnx-int8'))
+EMOTION_ONNX_THREADS = int(os.environ.get("EMOTION_ONNX_THREADS", "0"))
+
+# Lite mode: keyword-only mood analysis, the emotion model (and torch) is never loaded
+SERVICES_LITE_MODE = os.environ.get("SERVICES_LITE_MODE", "false").lower() == "true"
+
+# Keyword fast path: keyword results at or above this confidence skip the transformer
+# (one strong unambiguous keyword scores 0.95). Set above 1 to always use the model.
+MOOD_KEYWORD_THRESHOLD = float(os.environ.get("MOOD_KEYWORD_THRESHOLD", "0.9"))
+
+# Micro-batched mood inference: concurrent requests share one forward pass of up to
+# MOOD_BATCH_MAX_SIZE texts, waiting at most MOOD_BATCH_MAX_WAIT_MS for a batch to fill
+MOOD_BATCHING_ENABLED = os.environ.get("MOOD_BATCHING_ENABLED", "false").lower() == "true"
+MOOD_BATCH_MAX_SIZE = int(os.environ.get("MOOD_BATCH_MAX_SIZE", "16"))
+MOOD_BATCH_MAX_WAIT_MS = float(os.environ.get("MOOD_BATCH_MAX_WAIT_MS", "10"))
+MOOD_BATCH_TIMEOUT = float(os.environ.get("MOOD_BATCH_TIMEOUT", "5"))
+
+# Memoized mood analyses keyed by normalized text; same backends as WORKSHEET_CACHE.
+# Use "sqlite" or "redis" to share results between workers.
+MOOD_CACHE = {
+    'BACKEND': os.environ.get("MOOD_CACHE_BACKEND", "memory"),
+    'LOCATION': os.environ.get("MOOD_CACHE_LOCATION", str(BASE_DIR / 'mood_cache.sqlite3')),
+    'TTL': int(os.environ.get("MOOD_CACHE_TTL", str(24 * 60 * 60))),
+    'MAX_ENTRIES': int(os.environ.get("MOOD_CACHE_MAX_ENTRIES", "5000")),
+}
+
+# Groq fan-out: max concurrent calls per worker, per-call timeout and whole-request deadline (seconds)
+GROQ_MAX_CONCURRENCY = int(os.environ.get("GROQ_MAX_CONCURRENCY", "8"))
+GROQ_CALL_TIMEOUT = float(os.environ.get("GROQ_CALL_TIMEOUT", "8"))
+GROQ_REQUEST_DEADLINE = float(os.environ.get("GROQ_REQUEST_DEADLINE", "12"))
+
+# Shared Groq HTTP client: API base URL (e.g. a local fake server), keep-alive pool and retries
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL")
+GROQ_MAX_CONNECTIONS = int(os.environ.get("GROQ_MAX_CONNECTIONS", "20"))
+GROQ_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GROQ_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GROQ_KEEPALIVE_EXPIRY = float(os.environ.get("GROQ_KEEPALIVE_EXPIRY", "30"))
+GROQ_MAX_RETRIES = int(os.environ.get("GROQ_MAX_RETRIES", "2"))
+GROQ_RETRY_BASE_DELAY = float(os.environ.get("GROQ_RETRY_BASE_DELAY", "0.5"))
+GROQ_RETRY_MAX_DELAY = float(os.environ.get("GROQ_RETRY_MAX_DELAY", "8"))
+
+# Client-side Groq limits (services.rate_limit_services.GroqRateLimiter); 0 disables a limit.
+# BACKEND: "none" (off), "sqlite" (per host, LOCATION = file path), "redis" (LOCATION = redis:// URL)
+# or "memory". Limits are per backend, not per account: with "memory" every worker gets the full
+# REQUESTS_PER_MINUTE / TOKENS_PER_MINUTE to itself, so N workers can spend N times the account quota.
+# Use "sqlite" or "redis" with the account's real limits to protect a shared quota.
+# Each parallel worksheet reserves roughly 1300 tokens (prompt length / 4 + max_tokens per call).
+# Calls wait up to MAX_WAIT seconds for room; beyond that, or once DAILY_TOKEN_BUDGET is spent,
+# worksheets are served from any cached variant or the fallback questions.
+GROQ_RATE_LIMIT = {
+    'BACKEND': os.environ.get("GROQ_RATE_LIMIT_BACKEND", "none"),
+    'LOCATION': os.environ.get("GROQ_RATE_LIMIT_LOCATION", str(BASE_DIR / 'groq_rate_limit.sqlite3')),
+    'REQUESTS_PER_MINUTE': int(os.environ.get("GROQ_REQUESTS_PER_MINUTE", "30")),
+    'TOKENS_PER_MINUTE': int(os.environ.get("GROQ_TOKENS_PER_MINUTE", "6000")),
+    'DAILY_TOKEN_BUDGET': int(os.environ.get("GROQ_DAILY_TOKEN_BUDGET", "0")),
+    'MAX_WAIT': float(os.environ.get("GROQ_RATE_LIMIT_MAX_WAIT", "2")),
+}
+
+# Per-worker circuit breaker around Groq (services.resilience_services.CircuitBreaker).
+# Opens when, over the last WINDOW seconds and at least MIN_CALLS calls, the error rate or the share of
+# calls slower than SLOW_CALL_SECONDS reaches its threshold. While open, worksheets come from the cache
+# or the fallback questions without calling Groq; after OPEN_SECONDS one probe request is let through.
+GROQ_CIRCUIT_BREAKER = {
+    'ENABLED': os.environ.get("GROQ_CIRCUIT_BREAKER_ENABLED", "true").lower() == "true",
+    'WINDOW': float(os.environ.get("GROQ_CIRCUIT_BREAKER_WINDOW", "60")),
+    'MIN_CALLS': int(os.environ.get("GROQ_CIRCUIT_BREAKER_MIN_CALLS", "10")),
+    'ERROR_THRESHOLD': float(os.environ.get("GROQ_CIRCUIT_BREAKER_ERROR_THRESHOLD", "0.5")),
+    'SLOW_CALL_SECONDS': float(os.environ.get("GROQ_CIRCUIT_BREAKER_SLOW_CALL_SECONDS", "5")),
+    'SLOW_CALL_THRESHOLD': float(os.environ.get("GROQ_CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD", "0.5")),
+    'OPEN_SECONDS': float(os.environ.get("GROQ_CIRCUIT_BREAKER_OPEN_SECONDS", "30")),
+}
+
+# Hedged Groq calls: a call still running after DELAY seconds (unset: the recent PERCENTILE latency for
+# its mode, once MIN_SAMPLES calls are recorded) gets a duplicate and the first answer wins.
+# MAX_RATIO caps hedges as a share of all Groq calls. Streamed calls are never hedged.
+GROQ_HEDGE = {
+    'ENABLED': os.environ.get("GROQ_HEDGE_ENABLED", "true").lower() == "true",
+    'DELAY': float(os.environ["GROQ_HEDGE_DELAY"]) if os.environ.get("GROQ_HEDGE_DELAY") else None,
+    'PERCENTILE': float(os.environ.get("GROQ_HEDGE_PERCENTILE", "95")),
+    'MIN_SAMPLES': int(os.environ.get("GROQ_HEDGE_MIN_SAMPLES", "20")),
+    'MIN_DELAY': float(os.environ.get("GROQ_HEDGE_MIN_DELAY", "0.1")),
+    'MAX_RATIO': float(os.environ.get("GROQ_HEDGE_MAX_RATIO", "0.1")),
+}
+
+# Async (ASGI) views: bounded executors for CPU-bound mood inference and PDF rendering
+INFERENCE_MAX_WORKERS = int(os.environ.get("INFERENCE_MAX_WORKERS", "2"))
+PDF_MAX_WORKERS = int(os.environ.get("PDF_MAX_WORKERS", "2"))
+
+# "parallel" (one call per question) or "batched" (one JSON call for the whole worksheet)
+GROQ_GENERATION_MODE = os.environ.get("GROQ_GENERATION_MODE", "parallel")
+
+# Generated-worksheet cache (services.ai_services.WorksheetCache).
+# BACKEND: "memory", "sqlite" (LOCATION = file path), "redis" (LOCATION = redis:// URL) or "none".
+# A (mood, subject, grade) key is served from cache once VARIANTS generations are pooled.
+WORKSHEET_CACHE = {
+    'BACKEND': os.environ.get("WORKSHEET_CACHE_BACKEND", "memory"),
+    'LOCATION': os.environ.get("WORKSHEET_CACHE_LOCATION", str(BASE_DIR / 'worksheet_cache.sqlite3')),
+    'VARIANTS': int(os.environ.get("WORKSHEET_CACHE_VARIANTS", "5")),
+    'TTL': int(os.environ.get("WORKSHEET_CACHE_TTL", str(6 * 60 * 60))),
+    'MAX_ENTRIES': int(os.environ.get("WORKSHEET_CACHE_MAX_ENTRIES", "1000")),
+}
+
+# Coalescing of identical in-flight worksheet generations (services.singleflight_services).
+# Threads in a worker always share one generation per (mood, subject, grade); BACKEND "sqlite"
+# or "redis" (same LOCATION rules as WORKSHEET_CACHE) extends that across workers, "none" doesn't.
+# Only fully generated worksheets (no fallback slots) are handed to other workers, and only for
+# RESULT_TTL seconds, long enough for the workers already waiting to read them.
+# VARY re-draws each follower's slots from the worksheet cache pool so students don't all match.
+WORKSHEET_SINGLE_FLIGHT = {
+    'ENABLED': os.environ.get("WORKSHEET_SINGLE_FLIGHT_ENABLED", "true").lower() == "true",
+    'BACKEND': os.environ.get("WORKSHEET_SINGLE_FLIGHT_BACKEND", "none"),
+    'LOCATION': os.environ.get("WORKSHEET_SINGLE_FLIGHT_LOCATION", str(BASE_DIR / 'single_flight.sqlite3')),
+    'TIMEOUT': float(os.environ.get("WORKSHEET_SINGLE_FLIGHT_TIMEOUT", "15")),
+    'LOCK_TTL': float(os.environ.get("WORKSHEET_SINGLE_FLIGHT_LOCK_TTL", "30")),
+    'RESULT_TTL': float(os.environ.get("WORKSHEET_SINGLE_FLIGHT_RESULT_TTL", "1")),
+    'VARY': os.environ.get("WORKSHEET_SINGLE_FLIGHT_VARY", "true").lower() == "true",
+}
+
+# Pre-generated question bank (app1.QuestionBankEntry), refilled by `manage.py refill_question_bank`.
+# A lookup in an empty bank costs one indexed query before generating as usual.
+QUESTION_BANK_ENABLED = os.environ.get("QUESTION_BANK_ENABLED", "true").lower() == "true"
+QUESTION_BANK_LOW_WATER = int(os.environ.get("QUESTION_BANK_LOW_WATER", "3"))
+QUESTION_BANK_HIGH_WATER = int(os.environ.get("QUESTION_BANK_HIGH_WATER", "10"))
+QUESTION_BANK_CALLS_PER_MINUTE = float(os.environ.get("QUESTION_BANK_CALLS_PER_MINUTE", "20"))
+QUESTION_BANK_GRADES = os.environ.get("QUESTION_BANK_GRADES", "5-10").split(",")
+
+# Class-set worksheet packs: concurrent generations per pack, max students per pack
+WORKSHEET_PACK_CONCURRENCY = int(os.environ.get("WORKSHEET_PACK_CONCURRENCY", "4"))
+WORKSHEET_PACK_MAX_STUDENTS = int(os.environ.get("WORKSHEET_PACK_MAX_STUDENTS", "60"))
+# Development only: also run queued packs on one thread in the web process, so packs complete
+# without a `run_jobs` worker. Production should run `manage.py run_jobs` and leave this off.
+WORKSHEET_PACK_RUN_IN_PROCESS = os.environ.get("WORKSHEET_PACK_RUN_IN_PROCESS", "false").lower() == "true"
+
+# Background jobs (app1.Job), run by `manage.py run_jobs`
+# Max jobs of each type running at once across all workers
+JOB_CONCURRENCY = {
+    'worksheet': int(os.environ.get("JOB_WORKSHEET_CONCURRENCY", "4")),
+    'pdf': int(os.environ.get("JOB_PDF_CONCURRENCY", "2")),
+    'worksheet_pack': int(os.environ.get("JOB_WORKSHEET_PACK_CONCURRENCY", "1")),
+}
+# Retry backoff (seconds), how long a running job may stay locked, and worker poll interval
+JOB_RETRY_BASE_DELAY = float(os.environ.get("JOB_RETRY_BASE_DELAY", "5"))
+JOB_RETRY_MAX_DELAY = float(os.environ.get("JOB_RETRY_MAX_DELAY", "300"))
+JOB_LOCK_TIMEOUT = float(os.environ.get("JOB_LOCK_TIMEOUT", "600"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "1"))
+
+# Readiness (health/ready/): snapshot refresh interval, rolling window for the Groq error rate,
+# and the thresholds past which a check reports "degraded". Without a GROQ_API_KEY the worker
+# is not ready unless HEALTH_REQUIRE_GROQ is false.
+HEALTH_REFRESH_INTERVAL = float(os.environ.get("HEALTH_REFRESH_INTERVAL", "5"))
+HEALTH_GROQ_WINDOW = float(os.environ.get("HEALTH_GROQ_WINDOW", "300"))
+HEALTH_GROQ_MAX_ERROR_RATE = float(os.environ.get("HEALTH_GROQ_MAX_ERROR_RATE", "0.5"))
+HEALTH_GROQ_MAX_P95_SECONDS = float(os.environ.get("HEALTH_GROQ_MAX_P95_SECONDS", "8"))
+HEALTH_QUEUE_MAX_AGE = float(os.environ.get("HEALTH_QUEUE_MAX_AGE", "300"))
+HEALTH_REQUIRE_GROQ = os.environ.get("HEALTH_REQUIRE_GROQ", "true").lower() == "true"
+
 # CORS settings for frontend
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -148,6 +313,34 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Django cache framework. The 'worksheets' alias holds serialized worksheet detail
+# responses; point it at Redis or Memcached to share it between workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'worksheets': {
+        'BACKEND': os.environ.get("WORKSHEET_DETAIL_CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("WORKSHEET_DETAIL_CACHE_LOCATION", 'worksheet-detail'),
+        'TIMEOUT': int(os.environ.get("WORKSHEET_DETAIL_CACHE_TIMEOUT", "86400")),
+    },
+}
+WORKSHEET_DETAIL_CACHE_ALIAS = 'worksheets'
+# Cache-Control max-age (seconds) on worksheet detail responses
+WORKSHEET_DETAIL_MAX_AGE = int(os.environ.get("WORKSHEET_DETAIL_MAX_AGE", "3600"))
+
+# Rendered worksheet PDFs, keyed by a hash of their content
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", MEDIA_ROOT / 'worksheets')
+# Cached PDFs unused for longer than MAX_AGE seconds are deleted, then the least recently
+# used until the directory fits in MAX_BYTES (0 disables either limit); swept after each render
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+PDF_CACHE_MAX_AGE = int(os.environ.get("PDF_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+# TrueType font with monochrome emoji glyphs (e.g. NotoEmoji-Regular.ttf). Unset, an installed Noto Emoji or
+# Symbola font is used if one is found (see services.pdf_services.EMOJI_FONT_CANDIDATES); "none", or no font
+# at all, leaves emoji out of PDFs, since ReportLab's base fonts have no glyphs for them
+PDF_EMOJI_FONT = os.environ.get("PDF_EMOJI_FONT")
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
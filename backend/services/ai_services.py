@@ -1,40 +1,491 @@
 # worksheet_generator/services/ai_services.py
 import os
+import copy
+import contextvars
+import functools
+import re
 import json
+import asyncio
+import time
+import hashlib
 import logging
-from typing import Dict, List, Tuple
-import requests
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-from groq import Groq
+import queue
+import random
+import threading
+from concurrent.futures import CancelledError, Future, InvalidStateError, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from .cache_services import BaseCacheBackend, build_cache_backend
+from .metrics_services import metrics, current_rss_bytes
+from .rate_limit_services import GroqRateLimiter, estimate_tokens, get_groq_rate_limiter
+from .resilience_services import CLOSED, CircuitBreaker, HedgePolicy, get_groq_circuit_breaker, get_groq_hedge_policy
+from .singleflight_services import SingleFlightTimeout, get_worksheet_single_flight
 
 logger = logging.getLogger(__name__)
 
-class MoodAnalyzer:
-    """Analyzes user mood using HuggingFace transformers"""
+# transformers (and torch behind it) and groq are imported on first use, not here,
+# so manage.py commands and health-check-only workers start without them.
+
+DEFAULT_EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+DIFFICULTY_LEVELS = ['easy', 'medium', 'hard']
+# Every learning_mood MoodAnalyzer can produce
+LEARNING_MOODS = [
+    'excited', 'happy', 'calm', 'focused', 'tired', 'confused', 'curious',
+    'confident', 'motivated', 'anxious', 'frustrated', 'shy', 'sad', 'neutral'
+]
+
+class EmotionModelRegistry:
+    """Loads the emotion classifier once per process and shares it between threads"""
     
-    def __init__(self):
+    def __init__(self, model_name: Optional[str] = None, backend: Optional[str] = None,
+                 retry_interval: float = 60.0):
+        self.model_name = model_name or getattr(settings, 'EMOTION_MODEL_NAME', DEFAULT_EMOTION_MODEL)
+        # 'pytorch' (transformers pipeline) or 'onnx' (int8 ONNX Runtime export)
+        self.backend = backend or getattr(settings, 'EMOTION_MODEL_BACKEND', 'pytorch')
+        self.retry_interval = retry_interval
+        # Lite mode never loads the model, so torch is never imported; MoodAnalyzer
+        # answers with keyword matching only
+        self.lite_mode = getattr(settings, 'SERVICES_LITE_MODE', False)
+        self._load_lock = threading.Lock()
+        self._classifier = None
+        self._last_failure_at = None
+        self._stats = {
+            'loaded': False,
+            'warmed': False,
+            'load_seconds': None,
+            'warmup_seconds': None,
+            'rss_delta_bytes': None,
+            'load_attempts': 0,
+            'load_failures': 0,
+        }
+    
+    def get_classifier(self):
+        """
+        Return the shared pipeline, loading it on first use.
+        A failed load is retried at most once per retry_interval so a broken
+        model doesn't cost every request a multi-second attempt.
+        """
+        if self._classifier is not None or self.lite_mode:
+            return self._classifier
+        
+        with self._load_lock:
+            if self._classifier is None and self._should_attempt_load():
+                self._load()
+        return self._classifier
+    
+    def warm_up(self, sample_text: str = "I feel ready to learn today") -> bool:
+        """Load the model and run one inference so the first request isn't slow"""
+        classifier = self.get_classifier()
+        if classifier is None:
+            return False
+        
+        start = time.perf_counter()
         try:
-            # Use a pre-trained emotion classification model
-            self.emotion_classifier = pipeline(
-                "text-classification",
-                model="j-hartmann/emotion-english-distilroberta-base",
-                device=-1  # Use CPU
-            )
+            classifier(sample_text)
+        except Exception as e:
+            logger.error(f"Emotion classifier warm-up failed: {e}")
+            return False
+        
+        elapsed = time.perf_counter() - start
+        self._stats.update(warmed=True, warmup_seconds=elapsed)
+        metrics.set_gauge('emotion_model_warmup_seconds', elapsed)
+        return True
+    
+    def use_classifier(self, classifier):
+        """Serve an already-built classifier (e.g. a benchmark stub) instead of loading the model"""
+        with self._load_lock:
+            self._classifier = classifier
+            self._stats.update(loaded=True, warmed=True)
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._classifier is not None
+    
+    def stats(self) -> Dict:
+        # Read without the load lock so health checks never wait on a slow load
+        return {'model': self.model_name, 'backend': self.backend, 'lite_mode': self.lite_mode, **self._stats}
+    
+    def _should_attempt_load(self) -> bool:
+        if self._last_failure_at is None:
+            return True
+        return time.monotonic() - self._last_failure_at >= self.retry_interval
+    
+    def _load(self):
+        self._stats['load_attempts'] += 1
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            classifier = self.build_classifier(self.backend, self.model_name)
         except Exception as e:
             logger.error(f"Failed to initialize emotion classifier: {e}")
-            self.emotion_classifier = None
+            self._last_failure_at = time.monotonic()
+            self._stats['load_failures'] += 1
+            metrics.inc('emotion_model_load_failures_total')
+            return
+        
+        elapsed = time.perf_counter() - start
+        rss_after = current_rss_bytes()
+        rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        
+        self._classifier = classifier
+        self._last_failure_at = None
+        self._stats.update(loaded=True, load_seconds=elapsed, rss_delta_bytes=rss_delta)
+        
+        metrics.set_gauge('emotion_model_loaded', 1)
+        metrics.set_gauge('emotion_model_load_seconds', elapsed)
+        if rss_delta is not None:
+            metrics.set_gauge('emotion_model_rss_delta_bytes', rss_delta)
+        logger.info(f"Emotion classifier {self.model_name} ({self.backend}) loaded in {elapsed:.2f}s")
+    
+    @staticmethod
+    def build_classifier(backend: str, model_name: str):
+        """Construct a classifier for the given backend without caching it"""
+        if backend == 'onnx':
+            from .onnx_services import OnnxEmotionClassifier
+            return OnnxEmotionClassifier(
+                getattr(settings, 'EMOTION_ONNX_MODEL_DIR'),
+                intra_op_threads=getattr(settings, 'EMOTION_ONNX_THREADS', 0)
+            )
+        
+        from transformers import pipeline
+        
+        # Use a pre-trained emotion classification model
+        return pipeline(
+            "text-classification",
+            model=model_name,
+            device=-1  # Use CPU
+        )
+
+# One registry per worker process; every MoodAnalyzer shares its pipeline
+emotion_model_registry = EmotionModelRegistry()
+
+class MoodInferenceBatcher:
+    """
+    Micro-batching front end for the emotion classifier.
+    Callers queue their text and block on a future; a single worker thread collects
+    up to max_batch_size texts or waits max_wait_ms, whichever comes first, then runs
+    one batched pipeline call. The pipeline pads each batch to its longest input.
+    """
+    
+    def __init__(self, registry: Optional[EmotionModelRegistry] = None,
+                 max_batch_size: int = 16, max_wait_ms: float = 10.0):
+        self.registry = registry or emotion_model_registry
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+    
+    def classify(self, text: str, timeout: Optional[float] = None) -> List[Dict]:
+        """Classify one text; returns the same shape as calling the pipeline directly"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result(timeout=timeout)
+    
+    def stop(self):
+        """Let the worker thread exit once it has drained the queue"""
+        with self._worker_lock:
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker.join()
+                self._worker = None
+    
+    def _ensure_worker(self):
+        # Started lazily so forked web workers each get their own thread
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='mood-batcher', daemon=True)
+                    self._worker.start()
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            
+            self._process(batch)
+    
+    def _process(self, batch: List[Tuple[str, Future]]):
+        texts = [text for text, _ in batch]
+        start = time.perf_counter()
+        try:
+            classifier = self.registry.get_classifier()
+            if classifier is None:
+                raise RuntimeError("Emotion classifier is not available")
+            outputs = classifier(texts, batch_size=len(texts), truncation=True)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        metrics.observe('mood_batch_size', len(batch))
+        metrics.observe('mood_batch_seconds', time.perf_counter() - start)
+        for (_, future), output in zip(batch, outputs):
+            # A single-text pipeline call returns [top_result]; keep that shape per caller
+            future.set_result(output if isinstance(output, list) else [output])
+
+_mood_batcher = None
+_mood_batcher_lock = threading.Lock()
+
+def get_mood_batcher() -> MoodInferenceBatcher:
+    global _mood_batcher
+    if _mood_batcher is None:
+        with _mood_batcher_lock:
+            if _mood_batcher is None:
+                _mood_batcher = MoodInferenceBatcher(
+                    max_batch_size=getattr(settings, 'MOOD_BATCH_MAX_SIZE', 16),
+                    max_wait_ms=getattr(settings, 'MOOD_BATCH_MAX_WAIT_MS', 10.0)
+                )
+    return _mood_batcher
+
+_CONTRACTIONS = [
+    (re.compile(r"\bcan't\b"), "cannot"),
+    (re.compile(r"\bwon't\b"), "will not"),
+    (re.compile(r"\bi'?m\b"), "i am"),
+    (re.compile(r"n't\b"), " not"),
+    (re.compile(r"'re\b"), " are"),
+    (re.compile(r"'ve\b"), " have"),
+    (re.compile(r"'ll\b"), " will"),
+    (re.compile(r"'d\b"), " would"),
+    (re.compile(r"\b(i|he|she|it|that|what)'s\b"), r"\1 is"),
+]
+_NON_WORD = re.compile(r"[^a-z0-9\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_mood_text(mood_text: str) -> str:
+    """Fold case, curly quotes, simple contractions, punctuation and whitespace"""
+    text = mood_text.lower().replace('\u2019', "'").replace('\u2018', "'")
+    for pattern, replacement in _CONTRACTIONS:
+        text = pattern.sub(replacement, text)
+    text = _NON_WORD.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+class MoodResultCache:
+    """
+    Memoizes model-based mood analyses under their normalized text.
+    Entries are stored as compact lists so a large cache stays small in memory
+    and cheap to ship to a shared (SQLite/Redis) backend.
+    """
+    
+    def __init__(self, backend: BaseCacheBackend, ttl: Optional[float] = 24 * 60 * 60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(mood_text: str) -> str:
+        digest = hashlib.blake2b(normalize_mood_text(mood_text).encode('utf-8'), digest_size=16)
+        return f"mood:v1:{digest.hexdigest()}"
+    
+    def get(self, mood_text: str) -> Optional[Dict]:
+        try:
+            packed = self.backend.get(self.make_key(mood_text))
+        except Exception as e:
+            logger.warning(f"Mood cache read failed: {e}")
+            return None
+        
+        if packed is None:
+            self.misses += 1
+            metrics.inc('mood_cache_misses_total', backend=self.backend.name)
+            return None
+        
+        self.hits += 1
+        metrics.inc('mood_cache_hits_total', backend=self.backend.name)
+        emotion, learning_mood, confidence, raw = packed
+        return {
+            'detected_emotion': emotion,
+            'learning_mood': learning_mood,
+            'confidence': confidence,
+            'raw_results': [{'label': label, 'score': score} for label, score in raw]
+        }
+    
+    def set(self, mood_text: str, analysis: Dict):
+        packed = [
+            analysis['detected_emotion'],
+            analysis['learning_mood'],
+            round(analysis['confidence'], 4),
+            [[r['label'], round(r['score'], 4)] for r in analysis.get('raw_results', [])]
+        ]
+        try:
+            self.backend.set(self.make_key(mood_text), packed, self.ttl)
+        except Exception as e:
+            logger.warning(f"Mood cache write failed: {e}")
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None
+        }
+
+_mood_cache = None
+_mood_cache_lock = threading.Lock()
+
+def get_mood_cache() -> Optional[MoodResultCache]:
+    """Process-wide MoodResultCache built from settings.MOOD_CACHE (None when disabled)"""
+    global _mood_cache
+    if _mood_cache is None:
+        with _mood_cache_lock:
+            if _mood_cache is None:
+                config = getattr(settings, 'MOOD_CACHE', {})
+                backend = build_cache_backend(config)
+                _mood_cache = MoodResultCache(
+                    backend, ttl=config.get('TTL', 24 * 60 * 60)
+                ) if backend is not None else False
+    return _mood_cache or None
+
+class KeywordMoodClassifier:
+    """
+    Single-pass keyword classifier used as the first stage in front of the model.
+    All keywords are compiled into one word-bounded regex; a negator right before a
+    keyword ("not happy", or with one degree word, "not really happy") sends its
+    weight to the opposite mood. Words further away don't count, so "never been
+    more excited" stays excited.
+    """
+    
+    MOOD_KEYWORDS = {
+        'excited': {'excited': 1.0, 'enthusiastic': 1.0, 'thrilled': 1.0, 'energetic': 0.8, 'pumped': 0.8, 'hyped': 0.8},
+        'happy': {'happy': 1.0, 'cheerful': 1.0, 'joyful': 1.0, 'glad': 0.8, 'wonderful': 0.8, 'great': 0.7, 'good': 0.6},
+        'calm': {'calm': 1.0, 'peaceful': 1.0, 'relaxed': 1.0, 'serene': 1.0, 'zen': 0.8, 'chill': 0.7},
+        'focused': {'focused': 1.0, 'determined': 0.9, 'concentrated': 0.8, 'focus': 0.8, 'ready': 0.6},
+        'tired': {'tired': 1.0, 'exhausted': 1.0, 'sleepy': 1.0, 'weary': 1.0, 'drained': 1.0, 'bored': 0.7},
+        'confused': {'confused': 1.0, 'puzzled': 1.0, 'uncertain': 0.8, 'lost': 0.7, 'stuck': 0.7},
+        'curious': {'curious': 1.0, 'inquisitive': 1.0, 'interested': 0.9, 'wondering': 0.8},
+        'confident': {'confident': 1.0, 'capable': 0.8, 'proud': 0.8, 'sure': 0.6, 'certain': 0.6},
+        'anxious': {'anxious': 1.0, 'nervous': 1.0, 'worried': 1.0, 'scared': 0.9, 'stressed': 0.9},
+        'frustrated': {'frustrated': 1.0, 'annoyed': 1.0, 'irritated': 1.0, 'angry': 1.0, 'mad': 0.8},
+        'sad': {'sad': 1.0, 'unhappy': 1.0, 'lonely': 0.9, 'upset': 0.8, 'down': 0.5},
+    }
+    # Where a negated keyword's weight goes ("not sure" -> confused)
+    NEGATED_MOODS = {
+        'excited': 'tired', 'happy': 'sad', 'calm': 'anxious', 'focused': 'confused',
+        'tired': 'calm', 'confused': 'confident', 'curious': 'tired', 'confident': 'confused',
+        'anxious': 'calm', 'frustrated': 'calm', 'sad': 'happy',
+    }
+    NEGATORS = ['not', 'cannot', 'hardly', 'barely']
+    # The only words allowed between a negator and its keyword
+    DEGREE_WORDS = ['really', 'very', 'so', 'that', 'too']
+    NEGATED_WEIGHT = 0.8
+    
+    def __init__(self):
+        self.keyword_index = {
+            keyword: (mood, weight)
+            for mood, keywords in self.MOOD_KEYWORDS.items()
+            for keyword, weight in keywords.items()
+        }
+        # Longest alternatives first so the regex never stops at a shorter prefix
+        keywords = sorted(self.keyword_index, key=len, reverse=True)
+        self.pattern = re.compile(
+            r"(?:\b(?P<negator>" + '|'.join(self.NEGATORS) + r")\s+(?:(?:" + '|'.join(self.DEGREE_WORDS) + r")\s+)?)?"
+            r"\b(?P<keyword>" + '|'.join(map(re.escape, keywords)) + r")\b"
+        )
+    
+    def classify(self, mood_text: str) -> Dict:
+        scores = {}
+        for match in self.pattern.finditer(normalize_mood_text(mood_text)):
+            mood, weight = self.keyword_index[match.group('keyword')]
+            if match.group('negator'):
+                mood, weight = self.NEGATED_MOODS[mood], weight * self.NEGATED_WEIGHT
+            scores[mood] = scores.get(mood, 0.0) + weight
+        
+        if not scores:
+            return {
+                'detected_emotion': 'neutral',
+                'learning_mood': 'calm',
+                'confidence': 0.5,
+                'method': 'default'
+            }
+        
+        mood = max(scores, key=scores.get)
+        top_score = scores[mood]
+        # One strong, uncontested keyword scores 0.95; weak or conflicting matches score lower
+        confidence = 0.5 + 0.45 * (top_score / sum(scores.values())) * min(1.0, top_score)
+        return {
+            'detected_emotion': mood,
+            'learning_mood': mood,
+            'confidence': round(confidence, 4),
+            'method': 'keyword_matching'
+        }
+
+keyword_mood_classifier = KeywordMoodClassifier()
+
+MOOD_STAGES = ['keyword', 'cache', 'model', 'fallback']
+
+def mood_stage_fractions() -> Dict[str, float]:
+    """Share of analyze_mood calls answered by each cascade stage in this process"""
+    counts = {stage: metrics.counter_value('mood_stage_total', stage=stage) for stage in MOOD_STAGES}
+    total = sum(counts.values())
+    return {stage: (count / total if total else 0.0) for stage, count in counts.items()}
+
+class MoodAnalyzer:
+    """
+    Analyzes user mood with a cascade: confident keyword matches are answered
+    directly, everything else goes to the HuggingFace transformers model
+    """
+    
+    def __init__(self, registry: Optional[EmotionModelRegistry] = None,
+                 batcher: Optional[MoodInferenceBatcher] = None,
+                 cache: Optional[MoodResultCache] = None):
+        self.registry = registry or emotion_model_registry
+        self.emotion_classifier = self.registry.get_classifier()
+        if batcher is None and getattr(settings, 'MOOD_BATCHING_ENABLED', False):
+            batcher = get_mood_batcher()
+        self.batcher = batcher
+        self.cache = cache if cache is not None else get_mood_cache()
+        self.keyword_classifier = keyword_mood_classifier
+        # Keyword results at or above this confidence skip the model; > 1 disables the fast path
+        self.keyword_threshold = getattr(settings, 'MOOD_KEYWORD_THRESHOLD', 0.9)
     
     def analyze_mood(self, mood_text: str) -> Dict:
         """
         Analyze mood from text input
         Returns emotion classification with confidence scores
         """
+        with metrics.span('analyze_mood'):
+            return self._analyze_mood(mood_text)
+    
+    def _analyze_mood(self, mood_text: str) -> Dict:
+        keyword_analysis = self.keyword_classifier.classify(mood_text)
+        if keyword_analysis['confidence'] >= self.keyword_threshold:
+            metrics.inc('mood_stage_total', stage='keyword')
+            return keyword_analysis
+        
         if not self.emotion_classifier:
-            return self._fallback_mood_analysis(mood_text)
+            metrics.inc('mood_stage_total', stage='fallback')
+            return keyword_analysis
+        
+        if self.cache is not None:
+            cached = self.cache.get(mood_text)
+            if cached is not None:
+                metrics.inc('mood_stage_total', stage='cache')
+                return cached
         
         try:
-            results = self.emotion_classifier(mood_text)
+            if self.batcher is not None:
+                results = self.batcher.classify(mood_text, timeout=getattr(settings, 'MOOD_BATCH_TIMEOUT', 5.0))
+            else:
+                results = self.emotion_classifier(mood_text)
             
             # Map emotions to learning states
             emotion_mapping = {
@@ -65,82 +516,651 @@ class MoodAnalyzer:
             
             learning_mood = emotion_mapping.get(primary_emotion, 'neutral')
             
-            return {
+            analysis = {
                 'detected_emotion': primary_emotion,
                 'learning_mood': learning_mood,
                 'confidence': confidence,
                 'raw_results': results
             }
+            if self.cache is not None:
+                self.cache.set(mood_text, analysis)
+            metrics.inc('mood_stage_total', stage='model')
+            return analysis
             
         except Exception as e:
             logger.error(f"Error in mood analysis: {e}")
-            return self._fallback_mood_analysis(mood_text)
+            metrics.inc('mood_stage_total', stage='fallback')
+            return keyword_analysis
     
     def _fallback_mood_analysis(self, mood_text: str) -> Dict:
         """Fallback mood analysis using keyword matching"""
-        mood_keywords = {
-            'excited': ['excited', 'energetic', 'enthusiastic', 'thrilled'],
-            'happy': ['happy', 'good', 'great', 'wonderful', 'cheerful'],
-            'calm': ['calm', 'peaceful', 'relaxed', 'zen', 'serene'],
-            'focused': ['focused', 'concentrated', 'determined', 'ready'],
-            'tired': ['tired', 'exhausted', 'sleepy', 'weary', 'drained'],
-            'confused': ['confused', 'lost', 'uncertain', 'puzzled'],
-            'curious': ['curious', 'interested', 'wondering', 'inquisitive'],
-            'confident': ['confident', 'sure', 'certain', 'capable']
-        }
+        return self.keyword_classifier.classify(mood_text)
+
+_llm_executor = None
+_llm_executor_lock = threading.Lock()
+
+def get_llm_executor() -> ThreadPoolExecutor:
+    """Process-wide pool that bounds how many Groq calls this worker has in flight"""
+    global _llm_executor
+    if _llm_executor is None:
+        with _llm_executor_lock:
+            if _llm_executor is None:
+                _llm_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'GROQ_MAX_CONCURRENCY', 8),
+                    thread_name_prefix='groq'
+                )
+    return _llm_executor
+
+def _first_success(futures: List[Future], mode: str) -> Future:
+    """
+    A future for the first of `futures` (an LLM call and its hedges) to succeed,
+    or for the last error if none do. The others are cancelled once it settles;
+    ones already running finish in the background.
+    """
+    if len(futures) == 1:
+        return futures[0]
+    
+    combined = Future()
+    pending = set(futures)
+    lock = threading.Lock()
+    
+    def settle(future):
+        with lock:
+            pending.discard(future)
+            error = CancelledError() if future.cancelled() else future.exception()
+            try:
+                if error is None:
+                    combined.set_result(future.result())
+                    if future is not futures[0]:
+                        metrics.inc('groq_hedge_wins_total', mode=mode)
+                elif not pending:
+                    combined.set_exception(error)
+                else:
+                    return
+            except InvalidStateError:
+                # Already settled, or cancelled by a caller that gave up waiting
+                pass
+        for other in futures:
+            other.cancel()
+    
+    def cancel_attempts(future):
+        if future.cancelled():
+            for attempt in futures:
+                attempt.cancel()
+    
+    combined.add_done_callback(cancel_attempts)
+    for future in futures:
+        future.add_done_callback(settle)
+    return combined
+
+class WorksheetCache:
+    """
+    Pools of generated worksheet parts keyed by (learning_mood, subject, grade, slot),
+    where slot is the motivation or a difficulty level.
+    A key is only served once its pool holds `variants` entries; each slot is then
+    drawn independently, so students still get varied worksheets from the cache.
+    """
+    
+    SLOTS = ['motivation'] + DIFFICULTY_LEVELS
+    
+    def __init__(self, backend: BaseCacheBackend, variants: int = 5, ttl: Optional[float] = 6 * 60 * 60):
+        self.backend = backend
+        self.variants = variants
+        self.ttl = ttl
+    
+    @staticmethod
+    def make_key(mood: str, subject: str, grade_level: str, slot: str) -> str:
+        return f"worksheet:v1:{mood}:{subject}:{grade_level.strip().lower()}:{slot}"
+    
+    def get(self, mood: str, subject: str, grade_level: str, min_variants: Optional[int] = None) -> Optional[Dict]:
+        """Assemble a worksheet from the pools, or None if any slot's pool is too small"""
+        min_variants = min_variants or self.variants
+        try:
+            pools = {
+                slot: self.backend.get_variants(self.make_key(mood, subject, grade_level, slot))
+                for slot in self.SLOTS
+            }
+        except Exception as e:
+            logger.warning(f"Worksheet cache read failed: {e}")
+            metrics.inc('worksheet_cache_errors_total', operation='get')
+            return None
         
-        mood_text_lower = mood_text.lower()
-        for mood, keywords in mood_keywords.items():
-            if any(keyword in mood_text_lower for keyword in keywords):
-                return {
-                    'detected_emotion': mood,
-                    'learning_mood': mood,
-                    'confidence': 0.8,
-                    'method': 'keyword_matching'
-                }
+        if any(len(pool) < min_variants for pool in pools.values()):
+            metrics.inc('worksheet_cache_misses_total', backend=self.backend.name)
+            return None
         
+        metrics.inc('worksheet_cache_hits_total', backend=self.backend.name)
+        picks = {slot: random.choice(pool) for slot, pool in pools.items()}
         return {
-            'detected_emotion': 'neutral',
-            'learning_mood': 'calm',
-            'confidence': 0.5,
-            'method': 'default'
+            'motivation': picks['motivation'],
+            'questions': {d: picks[d]['question'] for d in DIFFICULTY_LEVELS},
+            'answers': {d: picks[d].get('answer', '') for d in DIFFICULTY_LEVELS},
+            'hints': {d: picks[d].get('hint', '') for d in DIFFICULTY_LEVELS},
         }
+    
+    def store(self, mood: str, subject: str, grade_level: str, worksheet: Dict, skip_slots=()):
+        """Add a freshly generated worksheet to the pools; fallback slots are never cached"""
+        answers = worksheet.get('answers') or {}
+        hints = worksheet.get('hints') or {}
+        values = {'motivation': worksheet['motivation']}
+        for difficulty in DIFFICULTY_LEVELS:
+            values[difficulty] = {
+                'question': worksheet['questions'][difficulty],
+                'answer': answers.get(difficulty, ''),
+                'hint': hints.get(difficulty, ''),
+            }
+        
+        for slot, value in values.items():
+            if slot in skip_slots:
+                continue
+            try:
+                self.backend.add_variant(
+                    self.make_key(mood, subject, grade_level, slot), value, self.variants, self.ttl
+                )
+            except Exception as e:
+                logger.warning(f"Worksheet cache write failed: {e}")
+                metrics.inc('worksheet_cache_errors_total', operation='store')
+                return
+
+_worksheet_cache = None
+_worksheet_cache_lock = threading.Lock()
+
+def get_worksheet_cache() -> Optional[WorksheetCache]:
+    """Process-wide WorksheetCache built from settings.WORKSHEET_CACHE (None when disabled)"""
+    global _worksheet_cache
+    if _worksheet_cache is None:
+        with _worksheet_cache_lock:
+            if _worksheet_cache is None:
+                config = getattr(settings, 'WORKSHEET_CACHE', {})
+                backend = build_cache_backend(config)
+                _worksheet_cache = WorksheetCache(
+                    backend,
+                    variants=config.get('VARIANTS', 5),
+                    ttl=config.get('TTL', 6 * 60 * 60)
+                ) if backend is not None else False
+    return _worksheet_cache or None
 
 class GroqQuestionGenerator:
     """Generates educational questions using Groq AI"""
     
-    def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY) if settings.GROQ_API_KEY else None
+    def __init__(self, cache: Optional[WorksheetCache] = None, rate_limiter: Optional[GroqRateLimiter] = None,
+                 breaker: Optional[CircuitBreaker] = None, hedge: Optional[HedgePolicy] = None):
+        self.cache = cache if cache is not None else get_worksheet_cache()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_groq_rate_limiter()
+        self.breaker = breaker if breaker is not None else get_groq_circuit_breaker()
+        self.hedge = hedge if hedge is not None else get_groq_hedge_policy()
+        self.client = None
+        if settings.GROQ_API_KEY:
+            # Shared per process so every request reuses the same keep-alive connections
+            from .groq_services import get_groq_client
+            self.client = get_groq_client()
+        self.call_timeout = getattr(settings, 'GROQ_CALL_TIMEOUT', 8.0)
+        self.request_deadline = getattr(settings, 'GROQ_REQUEST_DEADLINE', 12.0)
+        # 'parallel' = one call per slot, 'batched' = one JSON call for the whole worksheet
+        self.generation_mode = getattr(settings, 'GROQ_GENERATION_MODE', 'parallel')
         
     def generate_questions(self, mood: str, subject: str, grade_level: str = "5-10") -> Dict:
         """Generate questions based on mood, subject, and grade level"""
+        return self.generate_questions_with_fallbacks(mood, subject, grade_level)[0]
+    
+    def generate_questions_with_fallbacks(self, mood: str, subject: str, grade_level: str = "5-10") -> Tuple[Dict, List[str]]:
+        """generate_questions, also returning the slots that were filled from the fallback worksheet"""
+        
+        if self.cache is not None:
+            cached = self.cache.get(mood, subject, grade_level)
+            if cached is not None:
+                cached['motivationEmoji'] = self.mood_emoji(mood)
+                return cached, []
         
         if not self.client:
             logger.warning("Groq client not initialized, using fallback")
-            return self._fallback_question_generation(mood, subject, grade_level)
+            return self._fallback_question_generation(mood, subject, grade_level), list(WorksheetCache.SLOTS)
+        
+        blocked = self.blocked_reason()
+        if blocked:
+            return self._degraded_worksheet(mood, subject, grade_level, blocked)
         
         try:
-            # Create mood-appropriate motivation
-            motivation_prompt = self._create_motivation_prompt(mood)
-            motivation = self._generate_motivation(motivation_prompt)
-            
-            # Generate questions for each difficulty level
-            questions = {}
-            for difficulty in ['easy', 'medium', 'hard']:
-                question_prompt = self._create_question_prompt(
-                    subject, difficulty, grade_level, mood
-                )
-                questions[difficulty] = self._generate_question(question_prompt)
+            worksheet, fallback_slots = self.generate_live(mood, subject, grade_level)
+        except Exception as e:
+            logger.error(f"Error generating questions with Groq: {e}")
+            return self._fallback_question_generation(mood, subject, grade_level), list(WorksheetCache.SLOTS)
+        
+        if self.cache is not None:
+            self.cache.store(mood, subject, grade_level, worksheet, skip_slots=fallback_slots)
+        return worksheet, fallback_slots
+    
+    def _rate_limit_blocked(self) -> Optional[str]:
+        return self.rate_limiter.blocked_reason() if self.rate_limiter is not None else None
+    
+    def blocked_reason(self) -> Optional[str]:
+        """Why this request must not call Groq right now ('rpm', 'tpm', 'budget' or 'circuit_open'), if at all"""
+        return self._rate_limit_blocked() or self._circuit_blocked()
+    
+    def _circuit_blocked(self) -> Optional[str]:
+        # Checked last: in half-open, allow_request() hands this request the single probe.
+        # It must run in the request's own context (not via to_thread) for the probe to stick.
+        if self.breaker is not None and not self.breaker.allow_request():
+            return 'circuit_open'
+        return None
+    
+    def _degraded_worksheet(self, mood: str, subject: str, grade_level: str, reason: str) -> Tuple[Dict, List[str]]:
+        """
+        Serve without calling Groq while over the rate limit or daily budget, or while
+        the circuit is open: any pooled variant for the key (even below the usual
+        pool size), else the fallback. Returns the worksheet and its fallback slots.
+        """
+        logger.warning(f"Groq unavailable ({reason}), serving cached or fallback worksheet")
+        if self.cache is not None:
+            cached = self.cache.get(mood, subject, grade_level, min_variants=1)
+            if cached is not None:
+                metrics.inc('groq_degraded_total', reason=reason, source='cache')
+                cached['motivationEmoji'] = self.mood_emoji(mood)
+                return cached, []
+        metrics.inc('groq_degraded_total', reason=reason, source='fallback')
+        return self._fallback_question_generation(mood, subject, grade_level), list(WorksheetCache.SLOTS)
+    
+    def generate_live(self, mood: str, subject: str, grade_level: str) -> Tuple[Dict, List[str]]:
+        """
+        Call Groq in the configured mode, bypassing the cache.
+        Returns the worksheet and the slots that were filled from the fallback.
+        """
+        if self.generation_mode == 'batched':
+            worksheet = self._generate_batched(mood, subject, grade_level)
+            if worksheet is not None:
+                return worksheet, []
+            metrics.inc('groq_batched_fallbacks_total')
+        
+        return self._generate_concurrently(mood, subject, grade_level)
+    
+    @property
+    def async_client(self):
+        """Shared AsyncGroq client for the running event loop (async views only)"""
+        if self.client is None:
+            return None
+        from .groq_services import get_async_groq_client
+        return get_async_groq_client()
+    
+    async def agenerate_questions(self, mood: str, subject: str, grade_level: str = "5-10") -> Dict:
+        """Async twin of generate_questions that awaits the LLM calls instead of blocking a thread"""
+        return (await self.agenerate_questions_with_fallbacks(mood, subject, grade_level))[0]
+    
+    async def agenerate_questions_with_fallbacks(self, mood: str, subject: str,
+                                                 grade_level: str = "5-10") -> Tuple[Dict, List[str]]:
+        """Async twin of generate_questions_with_fallbacks"""
+        
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, mood, subject, grade_level)
+            if cached is not None:
+                cached['motivationEmoji'] = self.mood_emoji(mood)
+                return cached, []
+        
+        if not self.client:
+            logger.warning("Groq client not initialized, using fallback")
+            return self._fallback_question_generation(mood, subject, grade_level), list(WorksheetCache.SLOTS)
+        
+        blocked = await asyncio.to_thread(self._rate_limit_blocked) or self._circuit_blocked()
+        if blocked:
+            return await asyncio.to_thread(self._degraded_worksheet, mood, subject, grade_level, blocked)
+        
+        try:
+            worksheet, fallback_slots = await self.agenerate_live(mood, subject, grade_level)
+        except Exception as e:
+            logger.error(f"Error generating questions with Groq: {e}")
+            return self._fallback_question_generation(mood, subject, grade_level), list(WorksheetCache.SLOTS)
+        
+        if self.cache is not None:
+            await asyncio.to_thread(
+                self.cache.store, mood, subject, grade_level, worksheet, skip_slots=fallback_slots
+            )
+        return worksheet, fallback_slots
+    
+    async def agenerate_live(self, mood: str, subject: str, grade_level: str) -> Tuple[Dict, List[str]]:
+        if self.generation_mode == 'batched':
+            worksheet = await self._agenerate_batched(mood, subject, grade_level)
+            if worksheet is not None:
+                return worksheet, []
+            metrics.inc('groq_batched_fallbacks_total')
+        
+        return await self._agenerate_concurrently(mood, subject, grade_level)
+    
+    async def _agenerate_concurrently(self, mood: str, subject: str, grade_level: str) -> Tuple[Dict, List[str]]:
+        start = time.perf_counter()
+        fallback = self._fallback_question_generation(mood, subject, grade_level)
+        
+        tasks = {
+            'motivation': asyncio.ensure_future(self._ahedged(functools.partial(
+                self._achat_completion, self._create_motivation_prompt(mood), temperature=0.7, max_tokens=100
+            ), 'parallel'))
+        }
+        for difficulty in DIFFICULTY_LEVELS:
+            question_prompt = self._create_question_prompt(subject, difficulty, grade_level, mood)
+            tasks[difficulty] = asyncio.ensure_future(self._ahedged(functools.partial(
+                self._achat_completion, question_prompt, temperature=0.8, max_tokens=150
+            ), 'parallel'))
+        
+        await asyncio.wait(tasks.values(), timeout=self.request_deadline)
+        
+        # asyncio tasks expose the same done/exception/result API as thread futures
+        fallback_slots = []
+        motivation = self._slot_result('motivation', tasks['motivation'], fallback['motivation'], fallback_slots)
+        questions = {
+            difficulty: self._slot_result(
+                difficulty, tasks[difficulty], fallback['questions'][difficulty], fallback_slots
+            )
+            for difficulty in DIFFICULTY_LEVELS
+        }
+        
+        metrics.observe('worksheet_generation_seconds', time.perf_counter() - start, mode='parallel')
+        metrics.inc('worksheets_generated_total', mode='parallel')
+        worksheet = {
+            'motivation': motivation,
+            'motivationEmoji': self.mood_emoji(mood),
+            'questions': questions
+        }
+        return worksheet, fallback_slots
+    
+    async def _agenerate_batched(self, mood: str, subject: str, grade_level: str) -> Optional[Dict]:
+        start = time.perf_counter()
+        try:
+            content = await self._ahedged(functools.partial(
+                self._achat_completion,
+                self._create_batched_prompt(subject, grade_level, mood),
+                temperature=0.8,
+                max_tokens=900,
+                mode='batched',
+                response_format={"type": "json_object"}
+            ), 'batched')
+        except Exception as e:
+            logger.error(f"Error generating batched worksheet: {e}")
+            return None
+        
+        worksheet = self._parse_batched_worksheet(content)
+        if worksheet is None:
+            logger.warning("Batched worksheet response failed validation")
+            return None
+        
+        metrics.observe('worksheet_generation_seconds', time.perf_counter() - start, mode='batched')
+        metrics.inc('worksheets_generated_total', mode='batched')
+        worksheet['motivationEmoji'] = self.mood_emoji(mood)
+        return worksheet
+    
+    def iter_generate(self, mood: str, subject: str, grade_level: str,
+                      stream_tokens: bool = False) -> Iterator[Tuple[str, str, str]]:
+        """
+        Yield (slot, kind, text) as each part of the worksheet becomes ready.
+        kind is 'final' for a finished slot, or 'delta' for a streamed token chunk when
+        stream_tokens is set. Slots finish in whatever order Groq answers; failed or
+        late slots are finished from the fallback worksheet.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(mood, subject, grade_level)
+            if cached is not None:
+                yield from self.iter_worksheet(cached)
+                return
+        
+        fallback = self._fallback_question_generation(mood, subject, grade_level)
+        if not self.client:
+            logger.warning("Groq client not initialized, using fallback")
+            yield from self.iter_worksheet(fallback)
+            return
+        
+        blocked = self.blocked_reason()
+        if blocked:
+            yield from self.iter_worksheet(self._degraded_worksheet(mood, subject, grade_level, blocked)[0])
+            return
+        
+        start = time.perf_counter()
+        prompts = {'motivation': (self._create_motivation_prompt(mood), 0.7, 100)}
+        for difficulty in DIFFICULTY_LEVELS:
+            prompts[difficulty] = (self._create_question_prompt(subject, difficulty, grade_level, mood), 0.8, 150)
+        
+        events = queue.Queue()
+        executor = get_llm_executor()
+        for slot, (prompt, temperature, max_tokens) in prompts.items():
+            # Run in a copy of this request's context, like _submit_hedged, so context
+            # state such as the circuit breaker's half-open probe reaches the workers
+            executor.submit(contextvars.copy_context().run, self._produce_slot,
+                            events, slot, prompt, temperature, max_tokens, stream_tokens)
+        
+        deadline = time.monotonic() + self.request_deadline
+        pending = set(prompts)
+        values, fallback_slots = {}, []
+        while pending:
+            try:
+                slot, kind, payload = events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if slot not in pending:
+                continue
+            if kind == 'delta':
+                yield slot, 'delta', payload
+                continue
             
-            return {
-                'motivation': motivation,
-                'motivationEmoji': self._get_mood_emoji(mood),
-                'questions': questions
+            pending.discard(slot)
+            if kind == 'error':
+                logger.error(f"Error generating {slot}: {payload}")
+                metrics.inc('groq_slot_fallbacks_total', slot=slot, reason='error')
+                fallback_slots.append(slot)
+                payload = self._fallback_slot(fallback, slot)
+            values[slot] = payload
+            yield slot, 'final', payload
+        
+        for slot in prompts:
+            if slot in pending:
+                logger.warning(f"Groq {slot} call missed the request deadline, using fallback")
+                metrics.inc('groq_slot_fallbacks_total', slot=slot, reason='timeout')
+                fallback_slots.append(slot)
+                values[slot] = self._fallback_slot(fallback, slot)
+                yield slot, 'final', values[slot]
+        
+        metrics.observe('worksheet_generation_seconds', time.perf_counter() - start, mode='stream')
+        metrics.inc('worksheets_generated_total', mode='stream')
+        if self.cache is not None:
+            worksheet = {
+                'motivation': values['motivation'],
+                'questions': {d: values[d] for d in DIFFICULTY_LEVELS}
             }
+            self.cache.store(mood, subject, grade_level, worksheet, skip_slots=fallback_slots)
+    
+    def _produce_slot(self, events: queue.Queue, slot: str, prompt: str, temperature: float,
+                      max_tokens: int, stream_tokens: bool):
+        """Worker-thread half of iter_generate: report tokens and the result onto events"""
+        try:
+            if stream_tokens:
+                text = self._stream_completion(
+                    prompt, temperature, max_tokens, on_delta=lambda chunk: events.put((slot, 'delta', chunk))
+                )
+            else:
+                text = self._chat_completion(prompt, temperature=temperature, max_tokens=max_tokens, mode='stream')
+        except Exception as e:
+            events.put((slot, 'error', e))
+            return
+        events.put((slot, 'final', text))
+    
+    @staticmethod
+    def iter_worksheet(worksheet: Dict) -> Iterator[Tuple[str, str, str]]:
+        yield 'motivation', 'final', worksheet['motivation']
+        for difficulty in DIFFICULTY_LEVELS:
+            yield difficulty, 'final', worksheet['questions'][difficulty]
+    
+    @staticmethod
+    def _fallback_slot(fallback: Dict, slot: str) -> str:
+        return fallback['motivation'] if slot == 'motivation' else fallback['questions'][slot]
+    
+    def _generate_concurrently(self, mood: str, subject: str, grade_level: str) -> Tuple[Dict, List[str]]:
+        """
+        Issue the motivation and the three question calls at the same time.
+        Any slot that fails or misses the request deadline gets its entry from
+        the fallback worksheet, so wall time is bounded by the slowest call.
+        """
+        start = time.perf_counter()
+        fallback = self._fallback_question_generation(mood, subject, grade_level)
+        
+        # Create mood-appropriate motivation and one question per difficulty level
+        calls = {'motivation': functools.partial(self._generate_motivation, self._create_motivation_prompt(mood))}
+        for difficulty in DIFFICULTY_LEVELS:
+            question_prompt = self._create_question_prompt(subject, difficulty, grade_level, mood)
+            calls[difficulty] = functools.partial(self._generate_question, question_prompt)
+        futures = self._submit_hedged(calls, 'parallel')
+        
+        wait(futures.values(), timeout=max(0.0, self.request_deadline - (time.perf_counter() - start)))
+        
+        fallback_slots = []
+        motivation = self._slot_result('motivation', futures['motivation'], fallback['motivation'], fallback_slots)
+        questions = {
+            difficulty: self._slot_result(
+                difficulty, futures[difficulty], fallback['questions'][difficulty], fallback_slots
+            )
+            for difficulty in DIFFICULTY_LEVELS
+        }
+        
+        metrics.observe('worksheet_generation_seconds', time.perf_counter() - start, mode='parallel')
+        metrics.inc('worksheets_generated_total', mode='parallel')
+        worksheet = {
+            'motivation': motivation,
+            'motivationEmoji': self.mood_emoji(mood),
+            'questions': questions
+        }
+        return worksheet, fallback_slots
+    
+    def _hedge_delay(self, mode: str) -> Optional[float]:
+        """Seconds before a still-running call in `mode` gets a duplicate, or None to not hedge"""
+        if self.hedge is None or (self.breaker is not None and self.breaker.state != CLOSED):
+            return None
+        delay = self.hedge.delay(mode)
+        # A duplicate sent after the call timeout can't answer before the original gives up
+        return delay if delay is not None and delay < self.call_timeout else None
+    
+    def _submit_hedged(self, calls: Dict[str, Callable[[], str]], mode: str) -> Dict[str, Future]:
+        """
+        Run each call on the LLM executor. A call still running after the hedge
+        delay gets a duplicate, and the future returned for its slot takes
+        whichever answer arrives first.
+        """
+        executor = get_llm_executor()
+        # Each call runs in a copy of the request's context so its span reaches the Server-Timing header
+        submit = lambda call: executor.submit(contextvars.copy_context().run, call)
+        attempts = {slot: [submit(call)] for slot, call in calls.items()}
+        
+        delay = self._hedge_delay(mode)
+        if delay is not None:
+            wait([futures[0] for futures in attempts.values()], timeout=delay)
+            for slot, futures in attempts.items():
+                if not futures[0].done() and self.hedge.try_acquire(mode):
+                    futures.append(submit(calls[slot]))
+        return {slot: _first_success(futures, mode) for slot, futures in attempts.items()}
+    
+    def _call_hedged(self, call: Callable[[], str], mode: str) -> str:
+        """call() in this thread, or via _submit_hedged when hedging is on"""
+        if self._hedge_delay(mode) is None:
+            return call()
+        return self._submit_hedged({mode: call}, mode)[mode].result(timeout=self.request_deadline)
+    
+    async def _ahedged(self, call: Callable[[], Awaitable[str]], mode: str) -> str:
+        """Await call(); if it is still running after the hedge delay, race it against a duplicate"""
+        attempts = [asyncio.ensure_future(call())]
+        try:
+            delay = self._hedge_delay(mode)
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done and self.hedge.try_acquire(mode):
+                    attempts.append(asyncio.ensure_future(call()))
             
+            pending, error = set(attempts), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not attempts[0]:
+                            metrics.inc('groq_hedge_wins_total', mode=mode)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in attempts:
+                task.cancel()
+    
+    def _slot_result(self, slot: str, future, fallback_value: str, fallback_slots: List[str]) -> str:
+        if not future.done():
+            future.cancel()
+            logger.warning(f"Groq {slot} call missed the request deadline, using fallback")
+            metrics.inc('groq_slot_fallbacks_total', slot=slot, reason='timeout')
+            fallback_slots.append(slot)
+            return fallback_value
+        
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Error generating {slot}: {error}")
+            metrics.inc('groq_slot_fallbacks_total', slot=slot, reason='error')
+            fallback_slots.append(slot)
+            return fallback_value
+        
+        return future.result()
+    
+    def _generate_batched(self, mood: str, subject: str, grade_level: str) -> Optional[Dict]:
+        """
+        Generate the whole worksheet in one JSON-mode call.
+        Returns None when the call fails or the JSON doesn't validate, so the
+        caller can fall back to the per-question path.
+        """
+        start = time.perf_counter()
+        try:
+            content = self._call_hedged(functools.partial(
+                self._chat_completion,
+                self._create_batched_prompt(subject, grade_level, mood),
+                temperature=0.8,
+                max_tokens=900,
+                mode='batched',
+                response_format={"type": "json_object"}
+            ), 'batched')
         except Exception as e:
-            logger.error(f"Error generating questions with Groq: {e}")
-            return self._fallback_question_generation(mood, subject, grade_level)
+            logger.error(f"Error generating batched worksheet: {e}")
+            return None
+        
+        worksheet = self._parse_batched_worksheet(content)
+        if worksheet is None:
+            logger.warning("Batched worksheet response failed validation")
+            return None
+        
+        metrics.observe('worksheet_generation_seconds', time.perf_counter() - start, mode='batched')
+        metrics.inc('worksheets_generated_total', mode='batched')
+        worksheet['motivationEmoji'] = self.mood_emoji(mood)
+        return worksheet
+    
+    @staticmethod
+    def _parse_batched_worksheet(content: str) -> Optional[Dict]:
+        """Validate the batched JSON and reshape it into the per-question result format"""
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return None
+        
+        if not isinstance(data, dict):
+            return None
+        motivation = data.get('motivation')
+        raw_questions = data.get('questions')
+        if not isinstance(motivation, str) or not motivation.strip() or not isinstance(raw_questions, dict):
+            return None
+        
+        questions, answers, hints = {}, {}, {}
+        for difficulty in DIFFICULTY_LEVELS:
+            entry = raw_questions.get(difficulty)
+            if not isinstance(entry, dict):
+                return None
+            question = entry.get('question')
+            if not isinstance(question, str) or not question.strip():
+                return None
+            questions[difficulty] = question.strip()
+            answers[difficulty] = str(entry.get('answer') or '').strip()
+            hints[difficulty] = str(entry.get('hint') or '').strip()
+        
+        return {
+            'motivation': motivation.strip(),
+            'questions': questions,
+            'answers': answers,
+            'hints': hints
+        }
     
     def _create_motivation_prompt(self, mood: str) -> str:
         return f"""
@@ -176,33 +1196,178 @@ class GroqQuestionGenerator:
         - Science: physics basics, chemistry, biology, earth science, scientific method
         """
     
+    def _create_batched_prompt(self, subject: str, grade_level: str, mood: str) -> str:
+        return f"""
+        Create a short {subject} worksheet for a student in grades {grade_level} who is feeling {mood}.
+        
+        Include:
+        - A warm, supportive 1-2 sentence motivation message that acknowledges how they feel (no emojis)
+        - Exactly one easy, one medium and one hard {subject} question
+        - If they're excited/confident make the questions engaging and challenging,
+          if they're tired/confused make them clear and encouraging,
+          if they're curious make them thought-provoking
+        - A short answer and a one-sentence hint for every question
+        
+        Subject focus areas:
+        - Math: algebra, geometry, arithmetic, word problems, fractions
+        - Science: physics basics, chemistry, biology, earth science, scientific method
+        
+        Respond with JSON only, in exactly this shape:
+        {{"motivation": "...", "questions": {{
+            "easy": {{"question": "...", "answer": "...", "hint": "..."}},
+            "medium": {{"question": "...", "answer": "...", "hint": "..."}},
+            "hard": {{"question": "...", "answer": "...", "hint": "..."}}
+        }}}}
+        """
+    
     def _generate_motivation(self, prompt: str) -> str:
-        try:
-            completion = self.client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="llama3-8b-8192",
-                temperature=0.7,
-                max_tokens=100
-            )
-            return completion.choices[0].message.content.strip()
-        except Exception as e:
-            logger.error(f"Error generating motivation: {e}")
-            return "You're doing great! Every challenge is a chance to grow stronger. Let's learn together!"
+        return self._chat_completion(prompt, temperature=0.7, max_tokens=100)
     
     def _generate_question(self, prompt: str) -> str:
+        return self._chat_completion(prompt, temperature=0.8, max_tokens=150)
+    
+    def _chat_completion(self, prompt: str, temperature: float, max_tokens: int,
+                         mode: str = 'parallel', **kwargs) -> str:
+        """Single Groq round trip; raises on failure so callers choose the fallback"""
+        self._check_circuit()
+        start = time.perf_counter()
+        reserved, used, failed = 0, 0, None
         try:
-            completion = self.client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="llama3-8b-8192",
-                temperature=0.8,
-                max_tokens=150
-            )
-            return completion.choices[0].message.content.strip()
-        except Exception as e:
-            logger.error(f"Error generating question: {e}")
-            return "Generate a practice problem for this topic."
+            reserved = self._reserve_tokens(prompt, max_tokens)
+            start = time.perf_counter()
+            try:
+                with metrics.span('groq_call', mode=mode):
+                    completion = self.client.chat.completions.create(
+                        messages=[{"role": "user", "content": prompt}],
+                        model="llama3-8b-8192",
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=self.call_timeout,
+                        **kwargs
+                    )
+            except Exception:
+                metrics.inc('groq_calls_total', mode=mode, outcome='error')
+                failed = True
+                raise
+            failed = False
+            used = getattr(getattr(completion, 'usage', None), 'total_tokens', None)
+        finally:
+            self._finish_call(start, failed, reserved, used)
+        return self._completion_text(completion, mode)
+    
+    async def _achat_completion(self, prompt: str, temperature: float, max_tokens: int,
+                                mode: str = 'parallel', **kwargs) -> str:
+        self._check_circuit()
+        start = time.perf_counter()
+        reserved, used, failed = 0, 0, None
+        try:
+            if self.rate_limiter is not None:
+                tokens = estimate_tokens(prompt, max_tokens)
+                await self.rate_limiter.aacquire(tokens)
+                reserved = tokens
+            start = time.perf_counter()
+            try:
+                with metrics.span('groq_call', mode=mode):
+                    completion = await self.async_client.chat.completions.create(
+                        messages=[{"role": "user", "content": prompt}],
+                        model="llama3-8b-8192",
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=self.call_timeout,
+                        **kwargs
+                    )
+            except Exception:
+                metrics.inc('groq_calls_total', mode=mode, outcome='error')
+                failed = True
+                raise
+            failed = False
+            used = getattr(getattr(completion, 'usage', None), 'total_tokens', None)
+        finally:
+            # Also runs when the call is cancelled (a losing hedge or a missed deadline)
+            self._finish_call(start, failed, reserved, used)
+        return self._completion_text(completion, mode)
+    
+    def _stream_completion(self, prompt: str, temperature: float, max_tokens: int, on_delta) -> str:
+        """Streamed Groq round trip; on_delta receives each content chunk as it arrives"""
+        self._check_circuit()
+        parts = []
+        start = time.perf_counter()
+        reserved, used, failed = 0, None, None
+        try:
+            reserved = self._reserve_tokens(prompt, max_tokens)
+            start = time.perf_counter()
+            try:
+                with metrics.span('groq_call', mode='stream'):
+                    stream = self.client.chat.completions.create(
+                        messages=[{"role": "user", "content": prompt}],
+                        model="llama3-8b-8192",
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=self.call_timeout,
+                        stream=True
+                    )
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            on_delta(chunk.choices[0].delta.content)
+                        # Groq reports usage on the final chunk under x_groq
+                        usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None)
+                        if usage is not None:
+                            metrics.inc('groq_prompt_tokens_total', usage.prompt_tokens or 0, mode='stream')
+                            metrics.inc('groq_completion_tokens_total', usage.completion_tokens or 0, mode='stream')
+                            used = usage.total_tokens
+            except Exception:
+                metrics.inc('groq_calls_total', mode='stream', outcome='error')
+                failed = True
+                used = used or 0
+                raise
+            failed = False
+        finally:
+            self._finish_call(start, failed, reserved, 0 if failed is None else used)
+        metrics.inc('groq_calls_total', mode='stream', outcome='success')
+        return ''.join(parts).strip()
+    
+    def _reserve_tokens(self, prompt: str, max_tokens: int) -> int:
+        """Wait for rate limiter room for one call (raises RateLimitExceeded); returns the tokens reserved"""
+        if self.rate_limiter is None:
+            return 0
+        reserved = estimate_tokens(prompt, max_tokens)
+        self.rate_limiter.acquire(reserved)
+        return reserved
+    
+    def _check_circuit(self):
+        """Raise CircuitOpen rather than start a call while Groq's circuit is open"""
+        if self.breaker is not None:
+            self.breaker.check()
+    
+    def _finish_call(self, start: float, failed: Optional[bool], reserved: int, used: Optional[int]):
+        """
+        Report a call's outcome to the breaker and settle its token reservation.
+        failed is None when there is no outcome (the rate limiter refused the call,
+        or it was cancelled): the call then gives up any half-open probe it held.
+        """
+        if self.breaker is not None:
+            if failed is None:
+                self.breaker.release_probe()
+            else:
+                self.breaker.record(time.perf_counter() - start, failed)
+        self._settle_tokens(reserved, used)
+    
+    def _settle_tokens(self, reserved: int, used: Optional[int]):
+        if self.rate_limiter is not None and reserved:
+            self.rate_limiter.record_usage(reserved, used)
     
-    def _get_mood_emoji(self, mood: str) -> str:
+    @staticmethod
+    def _completion_text(completion, mode: str) -> str:
+        metrics.inc('groq_calls_total', mode=mode, outcome='success')
+        usage = getattr(completion, 'usage', None)
+        if usage is not None:
+            metrics.inc('groq_prompt_tokens_total', usage.prompt_tokens or 0, mode=mode)
+            metrics.inc('groq_completion_tokens_total', usage.completion_tokens or 0, mode=mode)
+        return completion.choices[0].message.content.strip()
+    
+    @staticmethod
+    def mood_emoji(mood: str) -> str:
         emoji_map = {
             'excited': '🚀',
             'happy': '😊',
@@ -246,16 +1411,37 @@ class GroqQuestionGenerator:
         
         return {
             'motivation': motivation,
-            'motivationEmoji': self._get_mood_emoji(mood),
+            'motivationEmoji': self.mood_emoji(mood),
             'questions': questions
         }
 
+_inference_executor = None
+_inference_executor_lock = threading.Lock()
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Small pool that async callers use to run CPU-bound mood inference off the event loop"""
+    global _inference_executor
+    if _inference_executor is None:
+        with _inference_executor_lock:
+            if _inference_executor is None:
+                _inference_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'INFERENCE_MAX_WORKERS', 2),
+                    thread_name_prefix='mood-inference'
+                )
+    return _inference_executor
+
 class AIWorksheetService:
     """Main service that coordinates mood analysis and question generation"""
     
-    def __init__(self):
+    def __init__(self, question_bank=None):
         self.mood_analyzer = MoodAnalyzer()
         self.question_generator = GroqQuestionGenerator()
+        # Concurrent requests for the same (learning_mood, subject, grade) share one generation
+        self.single_flight = get_worksheet_single_flight()
+        self.vary_shared = getattr(settings, 'WORKSHEET_SINGLE_FLIGHT', {}).get('VARY', True)
+        # Optional object with take(mood, subject, grade_level) -> Optional[Dict],
+        # consulted before any LLM call (see app1.question_bank.QuestionBank)
+        self.question_bank = question_bank
     
     def create_personalized_worksheet(self, mood_input: str, subject: str, grade_level: str = "5-10") -> Dict:
         """
@@ -266,19 +1452,182 @@ class AIWorksheetService:
             mood_analysis = self.mood_analyzer.analyze_mood(mood_input)
             learning_mood = mood_analysis['learning_mood']
             
-            # Generate questions
-            worksheet_content = self.question_generator.generate_questions(
-                learning_mood, subject, grade_level
+            # Serve pre-generated questions when the bank has them, otherwise generate
+            worksheet_content = None
+            if self.question_bank is not None:
+                worksheet_content = self.question_bank.take(learning_mood, subject, grade_level)
+            
+            if worksheet_content is None:
+                worksheet_content = self._coalesced_questions(learning_mood, subject, grade_level)
+            
+            return self._finish_worksheet(worksheet_content, mood_analysis, mood_input, subject, grade_level)
+            
+        except Exception as e:
+            logger.error(f"Error creating personalized worksheet: {e}")
+            raise Exception(f"Failed to create worksheet: {str(e)}")
+    
+    async def acreate_personalized_worksheet(self, mood_input: str, subject: str, grade_level: str = "5-10") -> Dict:
+        """
+        Async version for ASGI views: mood inference runs on the bounded inference
+        executor, bank lookups on Django's sync thread, and the Groq calls are awaited
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            mood_analysis = await loop.run_in_executor(
+                get_inference_executor(), self.mood_analyzer.analyze_mood, mood_input
             )
+            learning_mood = mood_analysis['learning_mood']
+            
+            worksheet_content = None
+            if self.question_bank is not None:
+                worksheet_content = await sync_to_async(self.question_bank.take)(learning_mood, subject, grade_level)
             
-            # Add mood analysis to response
-            worksheet_content['mood_analysis'] = mood_analysis
-            worksheet_content['user_input'] = mood_input
-            worksheet_content['subject'] = subject
-            worksheet_content['grade_level'] = grade_level
+            if worksheet_content is None:
+                worksheet_content = await self._acoalesced_questions(learning_mood, subject, grade_level)
             
-            return worksheet_content
+            return self._finish_worksheet(worksheet_content, mood_analysis, mood_input, subject, grade_level)
             
         except Exception as e:
             logger.error(f"Error creating personalized worksheet: {e}")
-            raise Exception(f"Failed to create worksheet: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to create worksheet: {str(e)}")
+    
+    def stream_personalized_worksheet(self, mood_input: str, subject: str, grade_level: str = "5-10",
+                                      stream_tokens: bool = False) -> Iterator[Tuple[str, Dict]]:
+        """
+        Yield (event, payload) pairs as the worksheet is built: 'mood' first, then
+        'motivation' and one 'question' per difficulty as each is ready ('delta' events
+        carry streamed tokens), and finally 'worksheet' with the complete worksheet.
+        """
+        mood_analysis = self.mood_analyzer.analyze_mood(mood_input)
+        learning_mood = mood_analysis['learning_mood']
+        yield 'mood', {'mood_analysis': mood_analysis}
+        
+        emoji = self.question_generator.mood_emoji(learning_mood)
+        worksheet_content = None
+        if self.question_bank is not None:
+            worksheet_content = self.question_bank.take(learning_mood, subject, grade_level)
+        
+        if worksheet_content is not None:
+            parts = self.question_generator.iter_worksheet(worksheet_content)
+        else:
+            worksheet_content = {'questions': {}}
+            parts = self.question_generator.iter_generate(
+                learning_mood, subject, grade_level, stream_tokens=stream_tokens
+            )
+        
+        for slot, kind, text in parts:
+            if kind == 'delta':
+                yield 'delta', {'slot': slot, 'text': text}
+            elif slot == 'motivation':
+                worksheet_content['motivation'] = text
+                yield 'motivation', {'motivation': text, 'motivationEmoji': emoji}
+            else:
+                worksheet_content['questions'][slot] = text
+                yield 'question', {'difficulty': slot, 'question': text}
+        
+        yield 'worksheet', self._finish_worksheet(worksheet_content, mood_analysis, mood_input, subject, grade_level)
+    
+    def create_worksheet_set(self, requests: List[Dict], max_workers: int = 4) -> List[Dict]:
+        """
+        Worksheets for many {'mood', 'subject', 'grade_level'} requests at once, in order.
+        Each distinct (learning_mood, subject, grade_level) is generated only once, the
+        distinct ones concurrently, and shared by every request that maps to it.
+        """
+        analyses = [self.mood_analyzer.analyze_mood(request['mood']) for request in requests]
+        keys = [
+            (analysis['learning_mood'], request['subject'], request['grade_level'])
+            for analysis, request in zip(analyses, requests)
+        ]
+        
+        contents = {}
+        to_generate = []
+        for key in dict.fromkeys(keys):
+            content = self.question_bank.take(*key) if self.question_bank is not None else None
+            if content is None:
+                to_generate.append(key)
+            else:
+                contents[key] = content
+        
+        if to_generate:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(to_generate)),
+                                    thread_name_prefix='worksheet-set') as pool:
+                generated = pool.map(lambda key: self._coalesced_questions(*key), to_generate)
+                contents.update(zip(to_generate, generated))
+        
+        metrics.inc('worksheet_set_requests_total', len(requests))
+        metrics.inc('worksheet_set_generations_total', len(to_generate))
+        return [
+            self._finish_worksheet(
+                copy.deepcopy(contents[key]), analysis, request['mood'], request['subject'], request['grade_level']
+            )
+            for key, analysis, request in zip(keys, analyses, requests)
+        ]
+    
+    @staticmethod
+    def _flight_key(learning_mood: str, subject: str, grade_level: str) -> str:
+        return f"worksheet:{learning_mood}:{subject}:{grade_level.strip().lower()}"
+    
+    @staticmethod
+    def _fully_generated(result) -> bool:
+        # Only worksheets with no fallback slots are worth handing to other workers
+        return not result[1]
+    
+    def _coalesced_questions(self, learning_mood: str, subject: str, grade_level: str) -> Dict:
+        """generate_questions, joining an identical generation already in flight instead of starting another"""
+        generate = lambda: self.question_generator.generate_questions_with_fallbacks(learning_mood, subject, grade_level)
+        if self.single_flight is None:
+            return generate()[0]
+        try:
+            (worksheet, _), shared = self.single_flight.do(
+                self._flight_key(learning_mood, subject, grade_level), generate, shareable=self._fully_generated
+            )
+        except SingleFlightTimeout:
+            logger.warning("Coalesced worksheet generation timed out, generating separately")
+            return generate()[0]
+        return self._vary_shared_worksheet(worksheet, learning_mood, subject, grade_level) if shared else worksheet
+    
+    async def _acoalesced_questions(self, learning_mood: str, subject: str, grade_level: str) -> Dict:
+        """Async twin of _coalesced_questions"""
+        generate = lambda: self.question_generator.agenerate_questions_with_fallbacks(learning_mood, subject, grade_level)
+        if self.single_flight is None:
+            return (await generate())[0]
+        try:
+            (worksheet, _), shared = await self.single_flight.ado(
+                self._flight_key(learning_mood, subject, grade_level), generate, shareable=self._fully_generated
+            )
+        except SingleFlightTimeout:
+            logger.warning("Coalesced worksheet generation timed out, generating separately")
+            return (await generate())[0]
+        if not shared:
+            return worksheet
+        return await asyncio.to_thread(self._vary_shared_worksheet, worksheet, learning_mood, subject, grade_level)
+    
+    def _vary_shared_worksheet(self, worksheet: Dict, learning_mood: str, subject: str, grade_level: str) -> Dict:
+        """
+        A follower's copy of a shared generation, with each slot re-drawn from the
+        worksheet cache pool (which the leader has just added to) when there is one,
+        so students who asked at the same moment don't all get identical questions.
+        """
+        cache = self.question_generator.cache
+        if not self.vary_shared or cache is None:
+            return worksheet
+        pooled = cache.get(learning_mood, subject, grade_level, min_variants=1)
+        if pooled is None:
+            return worksheet
+        metrics.inc('singleflight_varied_total')
+        pooled['motivationEmoji'] = self.question_generator.mood_emoji(learning_mood)
+        return pooled
+    
+    def _finish_worksheet(self, worksheet_content: Dict, mood_analysis: Dict, mood_input: str,
+                          subject: str, grade_level: str) -> Dict:
+        worksheet_content.setdefault(
+            'motivationEmoji', self.question_generator.mood_emoji(mood_analysis['learning_mood'])
+        )
+        
+        # Add mood analysis to response
+        worksheet_content['mood_analysis'] = mood_analysis
+        worksheet_content['user_input'] = mood_input
+        worksheet_content['subject'] = subject
+        worksheet_content['grade_level'] = grade_level
+        
+        return worksheet_content
\ No newline at end of file
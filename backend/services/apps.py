@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services'
+
+    def ready(self):
+        # Load the emotion model at startup instead of on the first request.
+        # Off by default so migrations and other manage.py commands stay fast.
+        lite_mode = getattr(settings, 'SERVICES_LITE_MODE', False)
+        if getattr(settings, 'EMOTION_MODEL_EAGER_LOAD', False) and not lite_mode:
+            from .ai_services import emotion_model_registry
+            emotion_model_registry.warm_up()
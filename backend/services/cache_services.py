@@ -0,0 +1,288 @@
+# services/cache_services.py
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class BaseCacheBackend:
+    """
+    Minimal key/value interface shared by the service caches.
+    Values must be JSON-serializable so every backend stores the same data.
+    Variant pools are bounded lists under one key, newest last.
+    """
+
+    name = 'base'
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set key only if it is absent (or expired); True if this call set it. Atomic, so usable as a lock"""
+        raise NotImplementedError
+
+    def get_variants(self, key: str) -> List[Any]:
+        return self.get(key) or []
+
+    def add_variant(self, key: str, value: Any, max_variants: int, ttl: Optional[float] = None) -> int:
+        """Append value to the pool at key, keeping the newest max_variants. Returns the pool size."""
+        raise NotImplementedError
+
+    def ping(self) -> bool:
+        return True
+
+
+class LocalMemoryCacheBackend(BaseCacheBackend):
+    """Per-process LRU cache with per-entry TTL"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int = 1000, **kwargs):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_locked(self, key, value, ttl):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._get_locked(key)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set_locked(key, value, ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._get_locked(key) is not None:
+                return False
+            self._set_locked(key, value, ttl)
+            return True
+
+    def add_variant(self, key, value, max_variants, ttl=None):
+        with self._lock:
+            pool = list(self._get_locked(key) or [])
+            pool.append(value)
+            pool = pool[-max_variants:]
+            self._set_locked(key, pool, ttl)
+            return len(pool)
+
+
+class SQLiteCacheBackend(BaseCacheBackend):
+    """
+    File-backed cache that survives restarts and is shared by every worker on one host.
+    Least-recently-used rows (to within touch_interval seconds) are evicted once max_entries is exceeded.
+    """
+
+    name = 'sqlite'
+    # Reads only refresh a row's LRU timestamp once it is this many seconds old, so most gets don't write
+    touch_interval = 60
+
+    def __init__(self, location: str, max_entries: int = 1000, **kwargs):
+        self.location = str(location)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.location, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_row(self, conn, key):
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            return None
+        if now - accessed_at >= self.touch_interval:
+            conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def _put_row(self, conn, key, value, ttl):
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + ttl if ttl else None, now)
+        )
+        conn.execute(
+            "DELETE FROM cache_entries WHERE key IN ("
+            "SELECT key FROM cache_entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def get(self, key):
+        return self._get_row(self._connection(), key)
+
+    def set(self, key, value, ttl=None):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._put_row(conn, key, value, ttl)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def add(self, key, value, ttl=None):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = self._get_row(conn, key) is None
+            if added:
+                self._put_row(conn, key, value, ttl)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def add_variant(self, key, value, max_variants, ttl=None):
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front so concurrent workers can't lose appends
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            pool = list(self._get_row(conn, key) or [])
+            pool.append(value)
+            pool = pool[-max_variants:]
+            self._put_row(conn, key, pool, ttl)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(pool)
+
+    def ping(self):
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+
+class RedisCacheBackend(BaseCacheBackend):
+    """
+    Redis (or any Redis-protocol server) backend shared across workers and hosts.
+    Eviction beyond TTL is left to the server's maxmemory-policy (use allkeys-lru).
+    """
+
+    name = 'redis'
+
+    def __init__(self, location: str, key_prefix: str = 'zappylearn', **kwargs):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis cache backend requires the 'redis' package") from e
+
+        self.client = redis.Redis.from_url(location)
+        self.key_prefix = key_prefix
+
+    def _key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def get(self, key):
+        value = self.client.get(self._key(key))
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self._key(key), json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def add(self, key, value, ttl=None):
+        ttl_ms = int(ttl * 1000) if ttl else None
+        return bool(self.client.set(self._key(key), json.dumps(value), px=ttl_ms, nx=True))
+
+    def get_variants(self, key):
+        return [json.loads(item) for item in self.client.lrange(self._key(key), 0, -1)]
+
+    def add_variant(self, key, value, max_variants, ttl=None):
+        redis_key = self._key(key)
+        pipe = self.client.pipeline()
+        pipe.rpush(redis_key, json.dumps(value))
+        pipe.ltrim(redis_key, -max_variants, -1)
+        if ttl:
+            pipe.expire(redis_key, int(ttl))
+        pipe.llen(redis_key)
+        return pipe.execute()[-1]
+
+    def ping(self):
+        try:
+            return bool(self.client.ping())
+        except Exception:
+            return False
+
+
+CACHE_BACKENDS = {
+    'memory': LocalMemoryCacheBackend,
+    'sqlite': SQLiteCacheBackend,
+    'redis': RedisCacheBackend,
+}
+
+
+def build_cache_backend(config: Dict) -> Optional[BaseCacheBackend]:
+    """
+    Build a backend from a settings dict such as
+    {'BACKEND': 'sqlite', 'LOCATION': '/var/cache/zappy.sqlite3', 'MAX_ENTRIES': 1000}.
+    BACKEND 'none' (or an empty config) disables caching.
+    """
+    backend_name = (config or {}).get('BACKEND', 'none')
+    if backend_name == 'none':
+        return None
+
+    try:
+        backend_class = CACHE_BACKENDS[backend_name]
+    except KeyError:
+        raise ValueError(f"Unknown cache backend '{backend_name}'")
+
+    options = {
+        'location': config.get('LOCATION'),
+        'max_entries': config.get('MAX_ENTRIES', 1000),
+        'key_prefix': config.get('KEY_PREFIX', 'zappylearn'),
+    }
+    return backend_class(**options)
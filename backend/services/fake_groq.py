@@ -0,0 +1,182 @@
+# services/fake_groq.py
+import json
+import time
+import random
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+
+FAKE_MOTIVATION = "You showed up today, and that already counts - let's learn something together!"
+FAKE_QUESTION = "A class has 28 students split evenly into 4 teams. How many students are on each team?"
+
+def fake_reply(prompt: str) -> str:
+    """Canned completion shaped like what the prompt asks for"""
+    if 'Respond with JSON only' in prompt:
+        return json.dumps({
+            'motivation': FAKE_MOTIVATION,
+            'questions': {
+                difficulty: {'question': f"{FAKE_QUESTION} ({difficulty})", 'answer': '7', 'hint': 'Divide 28 by 4.'}
+                for difficulty in ('easy', 'medium', 'hard')
+            }
+        })
+    if 'motivation message' in prompt:
+        return FAKE_MOTIVATION
+    return FAKE_QUESTION
+
+class _FakeGroqHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not self.path.endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': 'Not found', 'type': 'not_found'}})
+
+        fake = self.server.fake
+        with self.server.stats_lock:
+            fake.requests += 1
+        status = fake.next_status()
+        time.sleep(fake.delay())
+
+        if status != 200:
+            headers = {}
+            if status == 429 and fake.retry_after is not None:
+                headers['Retry-After'] = str(fake.retry_after)
+            return self._send_json(status, {'error': {'message': f'Fake error {status}', 'type': 'fake_error'}},
+                                   headers)
+
+        request = json.loads(body or b'{}')
+        prompt = ' '.join(message.get('content', '') for message in request.get('messages', []))
+        content = fake.reply(prompt)
+        usage = {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(content.split())}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        if request.get('stream'):
+            return self._send_stream(request, content, usage)
+        self._send_json(200, {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, request, content, usage):
+        def chunk(delta, finish_reason=None, x_groq=None):
+            payload = {
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+            if x_groq:
+                payload['x_groq'] = x_groq
+            return f"data: {json.dumps(payload)}\n\n"
+
+        words = content.split(' ')
+        events = [chunk({'role': 'assistant', 'content': ''})]
+        events += [chunk({'content': word if i == 0 else f' {word}'}) for i, word in enumerate(words)]
+        events.append(chunk({}, 'stop', {'id': 'req-fake', 'usage': usage}))
+        events.append("data: [DONE]\n\n")
+        data = ''.join(events).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakeGroqServer:
+    """
+    Local stand-in for Groq's chat completions API (including streaming) for tests
+    and benchmarks. Latency, jitter and error rate are configurable, and exact status
+    codes can be scripted with script(). Point GROQ_BASE_URL at base_url to use it.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, retry_after: Optional[float] = None,
+                 seed: Optional[int] = None, host: str = '127.0.0.1', port: int = 0, reply=fake_reply):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.reply = reply
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._scripted = deque()
+        self._script_lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), _FakeGroqHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._server.connections = 0
+        self._server.stats_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connections(self) -> int:
+        """TCP connections accepted so far; fewer than requests means keep-alive worked"""
+        return self._server.connections
+
+    def script(self, statuses: Iterable[int]) -> None:
+        """Answer the next requests with these status codes, in order, before the random error rate applies"""
+        with self._script_lock:
+            self._scripted.extend(statuses)
+
+    def next_status(self) -> int:
+        with self._script_lock:
+            if self._scripted:
+                return self._scripted.popleft()
+            failed = self.error_rate and self._random.random() < self.error_rate
+        return self.error_status if failed else 200
+
+    def delay(self) -> float:
+        with self._script_lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def start(self) -> 'FakeGroqServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-groq', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
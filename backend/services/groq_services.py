@@ -0,0 +1,216 @@
+# services/groq_services.py
+import time
+import random
+import asyncio
+import logging
+import threading
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+from django.conf import settings
+
+from .metrics_services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Transient failures worth another attempt: rate limits, overload and gateway errors
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Wait the server asked for via retry-after-ms or Retry-After (seconds or an HTTP date)"""
+    retry_after_ms = response.headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = response.headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, deferring to the server's Retry-After"""
+
+    def __init__(self, max_retries: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None):
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'GROQ_MAX_RETRIES', 2)
+        self.base_delay = base_delay if base_delay is not None else getattr(settings, 'GROQ_RETRY_BASE_DELAY', 0.5)
+        self.max_delay = max_delay if max_delay is not None else getattr(settings, 'GROQ_RETRY_MAX_DELAY', 8.0)
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> Optional[float]:
+        """Seconds to wait before retry number `attempt` (1-based), or None to give up"""
+        if attempt > self.max_retries:
+            return None
+        if response is not None:
+            requested = retry_after_seconds(response)
+            if requested is not None:
+                # Waiting longer than max_delay would blow the request deadline; let the caller fall back
+                return requested if requested <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+def _record_connection(opened: bool) -> None:
+    metrics.inc('groq_http_requests_total')
+    metrics.inc('groq_http_connections_opened_total' if opened else 'groq_http_connections_reused_total')
+
+def _transport_kwargs() -> dict:
+    return {
+        'limits': httpx.Limits(
+            max_connections=getattr(settings, 'GROQ_MAX_CONNECTIONS', 20),
+            max_keepalive_connections=getattr(settings, 'GROQ_MAX_KEEPALIVE_CONNECTIONS', 10),
+            keepalive_expiry=getattr(settings, 'GROQ_KEEPALIVE_EXPIRY', 30.0),
+        ),
+    }
+
+class RetryingTransport(httpx.BaseTransport):
+    """Pooled keep-alive transport that retries transient Groq failures and counts connection reuse"""
+
+    def __init__(self, policy: Optional[RetryPolicy] = None, **transport_kwargs):
+        self.policy = policy or RetryPolicy()
+        self._transport = httpx.HTTPTransport(**transport_kwargs)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            opened = []
+
+            # httpcore reports a TCP connect only when no pooled connection could be reused
+            def trace(name, info):
+                if name == 'connection.connect_tcp.complete':
+                    opened.append(name)
+
+            request.extensions['trace'] = trace
+            try:
+                response = self._transport.handle_request(request)
+            except RETRY_EXCEPTIONS as e:
+                _record_connection(bool(opened))
+                attempt += 1
+                delay = self.policy.delay(attempt)
+                if delay is None:
+                    raise
+                metrics.inc('groq_http_retries_total', reason=type(e).__name__)
+                time.sleep(delay)
+                continue
+
+            _record_connection(bool(opened))
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            attempt += 1
+            delay = self.policy.delay(attempt, response)
+            if delay is None:
+                return response
+            # Drain the (small) error body so the connection goes back to the pool
+            response.read()
+            response.close()
+            metrics.inc('groq_http_retries_total', reason=str(response.status_code))
+            logger.warning(f"Groq returned {response.status_code}; retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def close(self) -> None:
+        self._transport.close()
+
+class AsyncRetryingTransport(httpx.AsyncBaseTransport):
+    """Async twin of RetryingTransport for AsyncGroq"""
+
+    def __init__(self, policy: Optional[RetryPolicy] = None, **transport_kwargs):
+        self.policy = policy or RetryPolicy()
+        self._transport = httpx.AsyncHTTPTransport(**transport_kwargs)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            opened = []
+
+            async def trace(name, info):
+                if name == 'connection.connect_tcp.complete':
+                    opened.append(name)
+
+            request.extensions['trace'] = trace
+            try:
+                response = await self._transport.handle_async_request(request)
+            except RETRY_EXCEPTIONS as e:
+                _record_connection(bool(opened))
+                attempt += 1
+                delay = self.policy.delay(attempt)
+                if delay is None:
+                    raise
+                metrics.inc('groq_http_retries_total', reason=type(e).__name__)
+                await asyncio.sleep(delay)
+                continue
+
+            _record_connection(bool(opened))
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            attempt += 1
+            delay = self.policy.delay(attempt, response)
+            if delay is None:
+                return response
+            await response.aread()
+            await response.aclose()
+            metrics.inc('groq_http_retries_total', reason=str(response.status_code))
+            logger.warning(f"Groq returned {response.status_code}; retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+def _client_options() -> dict:
+    return {
+        'api_key': settings.GROQ_API_KEY,
+        'base_url': getattr(settings, 'GROQ_BASE_URL', None) or None,
+        # Retries happen in the transport, where Retry-After and jitter are handled
+        'max_retries': 0,
+    }
+
+_groq_client = None
+_groq_client_lock = threading.Lock()
+_async_groq_clients = weakref.WeakKeyDictionary()
+
+def get_groq_client():
+    """Process-wide Groq client sharing one keep-alive connection pool, or None without an API key"""
+    global _groq_client
+    if _groq_client is None and settings.GROQ_API_KEY:
+        with _groq_client_lock:
+            if _groq_client is None:
+                from groq import Groq
+                http_client = httpx.Client(transport=RetryingTransport(**_transport_kwargs()))
+                _groq_client = Groq(http_client=http_client, **_client_options())
+    return _groq_client
+
+def get_async_groq_client():
+    """
+    AsyncGroq client for the running event loop. Pooled connections belong to
+    the loop that opened them, so there is one client per loop (in practice one
+    per ASGI worker).
+    """
+    if not settings.GROQ_API_KEY:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_groq_clients.get(loop)
+    if client is None:
+        from groq import AsyncGroq
+        http_client = httpx.AsyncClient(transport=AsyncRetryingTransport(**_transport_kwargs()))
+        client = _async_groq_clients[loop] = AsyncGroq(http_client=http_client, **_client_options())
+    return client
+
+def reset_groq_clients() -> None:
+    """Close the shared sync client so the next call rebuilds it (after settings change, in tests)"""
+    global _groq_client
+    with _groq_client_lock:
+        if _groq_client is not None:
+            _groq_client.close()
+        _groq_client = None
+    _async_groq_clients.clear()
@@ -0,0 +1,22 @@
+# Shared inputs for the services benchmark commands
+SAMPLE_MOODS = [
+    "tired", "happy", "i'm bored", "super excited for today!", "kind of confused about fractions",
+    "I didn't sleep well and I feel drained", "curious", "nervous about the test tomorrow",
+    "calm and ready", "frustrated because my homework was hard", "great", "meh",
+    "I love science class", "scared I'll fail", "so annoyed right now", "proud of myself",
+    "not sure what to do", "sad because my friend moved away", "focused and determined", "whatever",
+]
+
+SAMPLE_WORKSHEET = {
+    'worksheet_id': '3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f',
+    'mood': 'tired',
+    'subject': 'math',
+    'motivation': "Even small steps count today - let's take them together!",
+    'motivationEmoji': '😴',
+    'questions': {
+        'easy': "What is 7 x 8?",
+        'medium': "A bag holds 3 red and 5 blue marbles. What fraction of the marbles are red?",
+        'hard': "Solve for x: 3x + 7 = 2x - 5, then check your answer by substitution.",
+    },
+    'timestamp': '2025-01-01 09:00:00',
+}
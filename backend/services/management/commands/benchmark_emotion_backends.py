@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.ai_services import EmotionModelRegistry
+from services.metrics_services import current_rss_bytes, percentile
+from ._benchmark_data import SAMPLE_MOODS
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the PyTorch and int8 ONNX emotion backends: load memory, single-text latency, "
+        "batched throughput and top-label agreement"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', default=['onnx', 'pytorch'],
+                            help="Loaded in this order; RSS deltas include anything a backend imports first")
+        parser.add_argument('--rounds', type=int, default=10, help="Passes over the sample texts")
+        parser.add_argument('--batch-size', type=int, default=16)
+
+    def handle(self, *args, **options):
+        texts = SAMPLE_MOODS
+        report = {'samples': len(texts), 'backends': {}}
+        labels = {}
+
+        for backend in options['backends']:
+            rss_before = current_rss_bytes()
+            start = time.perf_counter()
+            classifier = EmotionModelRegistry.build_classifier(backend, settings.EMOTION_MODEL_NAME)
+            load_seconds = time.perf_counter() - start
+            rss_after = current_rss_bytes()
+
+            classifier(texts[0])  # warm-up
+            latencies = []
+            for _ in range(options['rounds']):
+                for text in texts:
+                    call_start = time.perf_counter()
+                    classifier(text)
+                    latencies.append(time.perf_counter() - call_start)
+
+            batched = texts * options['rounds']
+            start = time.perf_counter()
+            for offset in range(0, len(batched), options['batch_size']):
+                classifier(batched[offset:offset + options['batch_size']], batch_size=options['batch_size'])
+            throughput = len(batched) / (time.perf_counter() - start)
+
+            labels[backend] = [result['label'].lower() for result in classifier(list(texts))]
+            report['backends'][backend] = {
+                'load_seconds': round(load_seconds, 3),
+                'rss_delta_mb': round((rss_after - rss_before) / 2 ** 20, 1)
+                if rss_before is not None and rss_after is not None else None,
+                'latency_p50_ms': round(percentile(latencies, 50) * 1000, 2),
+                'latency_p95_ms': round(percentile(latencies, 95) * 1000, 2),
+                'batched_throughput_per_second': round(throughput, 1),
+            }
+
+        if 'onnx' in labels and 'pytorch' in labels:
+            agreeing = sum(a == b for a, b in zip(labels['onnx'], labels['pytorch']))
+            report['label_agreement'] = round(agreeing / len(texts), 3)
+
+        self.stdout.write(json.dumps(report, indent=2))
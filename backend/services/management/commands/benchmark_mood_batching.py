@@ -0,0 +1,57 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.ai_services import MoodInferenceBatcher, emotion_model_registry
+from services.metrics_services import percentile
+from ._benchmark_data import SAMPLE_MOODS
+
+
+class Command(BaseCommand):
+    help = "Measure mood inference throughput and latency for several micro-batch sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=512, help="Texts classified per batch size")
+        parser.add_argument('--concurrency', type=int, default=64, help="Concurrent callers")
+        parser.add_argument('--max-wait-ms', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        if not emotion_model_registry.warm_up():
+            raise CommandError("Emotion model could not be loaded")
+
+        texts = [SAMPLE_MOODS[i % len(SAMPLE_MOODS)] for i in range(options['requests'])]
+        results = []
+        for size in options['sizes']:
+            batcher = MoodInferenceBatcher(max_batch_size=size, max_wait_ms=options['max_wait_ms'])
+            results.append(self.run(batcher, texts, options['concurrency'], size))
+            batcher.stop()
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    @staticmethod
+    def run(batcher, texts, concurrency, size):
+        def timed(text):
+            start = time.perf_counter()
+            batcher.classify(text)
+            return time.perf_counter() - start
+
+        # Warm the worker thread before timing
+        batcher.classify(texts[0])
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, texts))
+        elapsed = time.perf_counter() - start
+
+        return {
+            'batch_size': size,
+            'requests': len(texts),
+            'concurrency': concurrency,
+            'throughput_per_second': round(len(texts) / elapsed, 2),
+            'latency_p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'latency_p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'latency_p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        }
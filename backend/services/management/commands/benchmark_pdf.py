@@ -0,0 +1,59 @@
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from services.pdf_services import PDFGenerator, PDFTemplate, get_pdf_template
+from ._benchmark_data import SAMPLE_WORKSHEET
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare PDF rendering with the shared per-process template against rebuilding "
+        "styles and static flowables on every call (the old behaviour)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200, help="PDFs rendered per mode")
+
+    def handle(self, *args, **options):
+        # Pay reportlab's import and font cache cost before timing either mode
+        PDFGenerator(template=get_pdf_template()).generate_worksheet_pdf(SAMPLE_WORKSHEET)
+
+        results = [
+            self.run('per_call_template', lambda: PDFGenerator(template=PDFTemplate()), options['count']),
+            self.run('shared_template', PDFGenerator, options['count']),
+        ]
+        if results[0]['pdfs_per_second']:
+            results[1]['speedup'] = round(results[1]['pdfs_per_second'] / results[0]['pdfs_per_second'], 2)
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+    @staticmethod
+    def run(name, make_generator, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            make_generator().generate_worksheet_pdf(SAMPLE_WORKSHEET)
+        elapsed = time.perf_counter() - start
+
+        # Allocations are measured in a separate pass; tracing skews the timings
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        peak = 0
+        for _ in range(min(count, 20)):
+            tracemalloc.reset_peak()
+            make_generator().generate_worksheet_pdf(SAMPLE_WORKSHEET)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocations = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+
+        return {
+            'mode': name,
+            'pdfs': count,
+            'pdfs_per_second': round(count / elapsed, 2),
+            'ms_per_pdf': round(elapsed / count * 1000, 2),
+            'peak_kib_per_pdf': round(peak / 1024, 1),
+            'retained_blocks': allocations,
+        }
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.onnx_services import export_quantized_model
+
+
+class Command(BaseCommand):
+    help = "Export the emotion model to ONNX and quantize it to int8 for EMOTION_MODEL_BACKEND=onnx"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', default=settings.EMOTION_MODEL_NAME)
+        parser.add_argument('--output', default=settings.EMOTION_ONNX_MODEL_DIR)
+        parser.add_argument('--opset', type=int, default=17)
+
+    def handle(self, *args, **options):
+        path = export_quantized_model(options['model'], options['output'], opset=options['opset'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
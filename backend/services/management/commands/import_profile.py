@@ -0,0 +1,81 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the given modules in a fresh interpreter with `python -X importtime` and "
+        "summarize where startup time goes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*',
+                            default=['app1.views', 'app1.urls', 'services.ai_services', 'services.pdf_services'])
+        parser.add_argument('--top', type=int, default=20, help="Slowest imports to list")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        imports = '; '.join(f'import {module}' for module in options['modules'])
+        code = f'import django; django.setup(); {imports}'
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True, env=os.environ.copy()
+        )
+        if completed.returncode != 0:
+            raise CommandError(completed.stderr.strip().splitlines()[-1])
+
+        entries = []
+        for line in completed.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                entries.append({
+                    'module': name,
+                    'self_ms': int(self_us) / 1000,
+                    'cumulative_ms': int(cumulative_us) / 1000,
+                    'depth': len(indent) // 2,
+                })
+
+        top_level = [entry for entry in entries if entry['depth'] == 0]
+        packages = {}
+        for entry in entries:
+            root = entry['module'].split('.')[0]
+            packages[root] = packages.get(root, 0) + entry['self_ms']
+
+        report = {
+            'modules': options['modules'],
+            'total_ms': round(sum(entry['cumulative_ms'] for entry in top_level), 1),
+            'imported_modules': len(entries),
+            'heavy_packages_loaded': sorted(
+                package for package in ('torch', 'transformers', 'groq', 'reportlab', 'onnxruntime')
+                if package in packages
+            ),
+            'by_package_ms': dict(sorted(
+                ((package, round(ms, 1)) for package, ms in packages.items()),
+                key=lambda item: item[1], reverse=True
+            )[:options['top']]),
+            'slowest_imports': [
+                {'module': entry['module'], 'cumulative_ms': round(entry['cumulative_ms'], 1)}
+                for entry in sorted(entries, key=lambda e: e['cumulative_ms'], reverse=True)[:options['top']]
+            ],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Imported {report['imported_modules']} modules in {report['total_ms']} ms")
+        self.stdout.write(f"Heavy packages loaded: {', '.join(report['heavy_packages_loaded']) or 'none'}")
+        self.stdout.write("\nSelf time by package:")
+        for package, ms in report['by_package_ms'].items():
+            self.stdout.write(f"  {ms:>9.1f} ms  {package}")
+        self.stdout.write("\nSlowest imports (cumulative):")
+        for entry in report['slowest_imports']:
+            self.stdout.write(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
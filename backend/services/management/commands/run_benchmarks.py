@@ -0,0 +1,294 @@
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from services.ai_services import AIWorksheetService, emotion_model_registry
+from services.fake_groq import FakeGroqServer
+from services.metrics_services import metrics, percentile
+from services.pdf_services import PDFGenerator
+from ._benchmark_data import SAMPLE_MOODS, SAMPLE_WORKSHEET
+
+BENCHMARKS = ['service', 'pdf', 'http']
+SUBJECTS = ['math', 'science']
+# Labels the stub classifier answers with; keyword-confident moods never reach it
+STUB_LABELS = ['joy', 'sadness', 'neutral', 'nervousness', 'optimism', 'annoyance', 'surprise']
+
+
+class StubEmotionClassifier:
+    """Stands in for the transformers pipeline: a fixed per-call cost and a deterministic label per text"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def _classify(self, text):
+        label = STUB_LABELS[zlib.crc32(text.encode('utf-8')) % len(STUB_LABELS)]
+        return {'label': label, 'score': 0.87}
+
+    def __call__(self, inputs, **kwargs):
+        # One forward pass per call, batched or not
+        time.sleep(self.latency)
+        if isinstance(inputs, str):
+            return [self._classify(inputs)]
+        return [self._classify(text) for text in inputs]
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline end-to-end benchmarks: AIWorksheetService.create_personalized_worksheet, "
+        "PDFGenerator.generate_worksheet_pdf and the HTTP endpoints under concurrent load, against "
+        "a local fake Groq server and a throwaway test database. Prints JSON (and writes it with "
+        "--output); --compare reports the change against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+        parser.add_argument('--requests', type=int, default=200, help="Timed calls per benchmark")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--warmup', type=int, default=10, help="Untimed calls before each benchmark")
+        parser.add_argument('--groq-latency', type=float, default=0.15, help="Fake Groq seconds per call")
+        parser.add_argument('--groq-jitter', type=float, default=0.05)
+        parser.add_argument('--groq-error-rate', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=1234)
+        parser.add_argument('--model', choices=['stub', 'real'], default='stub',
+                            help="Stub emotion classifier, or load the configured model")
+        parser.add_argument('--model-latency-ms', type=float, default=15.0, help="Stub classifier cost per call")
+        parser.add_argument('--worksheet-cache', action='store_true',
+                            help="Keep the worksheet cache on (off by default so every call reaches Groq)")
+        parser.add_argument('--output', help="Write the JSON results to this file")
+        parser.add_argument('--compare', help="Earlier results file to compare against")
+        parser.add_argument('--fail-on-regression', type=float,
+                            help="Exit non-zero if any p95 is this fraction slower than --compare (e.g. 0.2)")
+
+    def handle(self, *args, **options):
+        if options['fail_on_regression'] is not None and not options['compare']:
+            raise CommandError("--fail-on-regression needs --compare")
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError("run_benchmarks requires the 'httpx' package")
+
+        # Per-request client logging would dominate the output and the timings
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+
+        if options['model'] == 'real':
+            if not emotion_model_registry.warm_up():
+                raise CommandError("Emotion model could not be loaded")
+        else:
+            emotion_model_registry.use_classifier(StubEmotionClassifier(options['model_latency_ms'] / 1000))
+
+        server = FakeGroqServer(
+            latency=options['groq_latency'], jitter=options['groq_jitter'],
+            error_rate=options['groq_error_rate'], seed=options['seed']
+        ).start()
+        # The settings are in place before any service singleton is first built
+        overrides = override_settings(
+            DEBUG=False,
+            GROQ_API_KEY='benchmark-key',
+            GROQ_BASE_URL=server.base_url,
+            GROQ_RATE_LIMIT={'BACKEND': 'none'},
+            WORKSHEET_CACHE={**settings.WORKSHEET_CACHE, 'BACKEND': 'memory'} if options['worksheet_cache']
+            else {'BACKEND': 'none'},
+            QUESTION_BANK_ENABLED=False,
+            PDF_CACHE_DIR=tempfile.mkdtemp(prefix='zappy-bench-pdf-'),
+        )
+        overrides.enable()
+
+        # A file-backed test database so server threads share it; never the real one
+        database_dir = tempfile.mkdtemp(prefix='zappy-bench-db-')
+        if connections['default'].vendor == 'sqlite':
+            connections['default'].settings_dict['TEST']['NAME'] = os.path.join(database_dir, 'bench.sqlite3')
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+
+        try:
+            results = {}
+            if 'service' in options['benchmarks']:
+                results['create_personalized_worksheet'] = self.bench_service(options)
+            if 'pdf' in options['benchmarks']:
+                results['generate_worksheet_pdf'] = self.bench_pdf(options)
+            if 'http' in options['benchmarks']:
+                results.update(self.bench_http(httpx, options))
+        finally:
+            runner.teardown_databases(old_config)
+            overrides.disable()
+            server.stop()
+
+        report = {'meta': self.meta(options, server), 'results': results}
+        if options['compare']:
+            report['comparison'] = self.compare(options['compare'], results)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+        if options['fail_on_regression'] is not None:
+            regressions = [
+                name for name, change in report['comparison'].items()
+                if change.get('p95_change') is not None and change['p95_change'] > options['fail_on_regression']
+            ]
+            if regressions:
+                raise CommandError(f"p95 regressed beyond {options['fail_on_regression']:.0%}: {', '.join(regressions)}")
+
+    def bench_service(self, options):
+        def call(i):
+            AIWorksheetService().create_personalized_worksheet(
+                SAMPLE_MOODS[i % len(SAMPLE_MOODS)], SUBJECTS[i % len(SUBJECTS)]
+            )
+
+        return self.measure(call, options)
+
+    def bench_pdf(self, options):
+        def call(i):
+            PDFGenerator().generate_worksheet_pdf(SAMPLE_WORKSHEET)
+
+        return self.measure(call, options)
+
+    def bench_http(self, httpx, options):
+        from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+        from django.core.wsgi import get_wsgi_application
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        httpd = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=True)
+        httpd.set_app(get_wsgi_application())
+        thread = threading.Thread(target=httpd.serve_forever, name='benchmark-wsgi', daemon=True)
+        thread.start()
+        base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+        limits = httpx.Limits(max_connections=options['concurrency'])
+        client = httpx.Client(base_url=base_url, timeout=60.0, limits=limits)
+        try:
+            created = client.post('/generate-worksheet/', json={'mood': 'tired', 'subject': 'math'})
+            created.raise_for_status()
+            worksheet_id = created.json()['worksheet_id']
+
+            def post_worksheet(i):
+                client.post('/generate-worksheet/', json={
+                    'mood': SAMPLE_MOODS[i % len(SAMPLE_MOODS)], 'subject': SUBJECTS[i % len(SUBJECTS)]
+                }).raise_for_status()
+
+            def post_pdf(i):
+                client.post('/generate-pdf/', json=SAMPLE_WORKSHEET).raise_for_status()
+
+            def get_detail(i):
+                client.get(f'/worksheet/{worksheet_id}/').raise_for_status()
+
+            def get_ready(i):
+                # 200 or 503 are both answers; only transport errors count as failures
+                client.get('/health/ready/')
+
+            return {
+                'http_generate_worksheet': self.measure(post_worksheet, options),
+                'http_generate_pdf': self.measure(post_pdf, options),
+                'http_worksheet_detail': self.measure(get_detail, options),
+                'http_readiness': self.measure(get_ready, options),
+            }
+        finally:
+            client.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+    @staticmethod
+    def measure(call, options):
+        """Run call(i) `requests` times across `concurrency` threads after an untimed warm-up"""
+        for i in range(options['warmup']):
+            try:
+                call(i)
+            except Exception:
+                pass
+
+        def timed(i):
+            start = time.perf_counter()
+            try:
+                call(i)
+            except Exception:
+                return None
+            return time.perf_counter() - start
+
+        groq_before = metrics.counter_sum('groq_calls_total')
+        fallbacks_before = metrics.counter_sum('groq_slot_fallbacks_total')
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            outcomes = list(pool.map(timed, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        latencies = [latency for latency in outcomes if latency is not None]
+
+        def ms(q):
+            value = percentile(latencies, q)
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'errors': len(outcomes) - len(latencies),
+            'throughput_per_second': round(len(latencies) / elapsed, 2),
+            'latency_p50_ms': ms(50),
+            'latency_p95_ms': ms(95),
+            'latency_p99_ms': ms(99),
+            'groq_calls': int(metrics.counter_sum('groq_calls_total') - groq_before),
+            'fallback_slots': int(metrics.counter_sum('groq_slot_fallbacks_total') - fallbacks_before),
+        }
+
+    @staticmethod
+    def meta(options, server):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+
+        return {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'fake_groq': {
+                'latency': options['groq_latency'],
+                'jitter': options['groq_jitter'],
+                'error_rate': options['groq_error_rate'],
+                'seed': options['seed'],
+                'requests_served': server.requests,
+            },
+            'model': options['model'],
+            'worksheet_cache': options['worksheet_cache'],
+        }
+
+    @staticmethod
+    def compare(path, results):
+        """Relative change of p95 and throughput per benchmark; positive p95_change is slower"""
+        with open(path) as f:
+            baseline = json.load(f).get('results', {})
+
+        def change(new, old):
+            return round((new - old) / old, 3) if new is not None and old else None
+
+        return {
+            name: {
+                'p95_change': change(result['latency_p95_ms'], baseline[name].get('latency_p95_ms')),
+                'throughput_change': change(result['throughput_per_second'],
+                                            baseline[name].get('throughput_per_second')),
+            }
+            for name, result in results.items()
+            if name in baseline
+        }
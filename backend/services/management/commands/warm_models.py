@@ -0,0 +1,19 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.ai_services import emotion_model_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Load and warm up the emotion classifier, then report load time and memory. "
+        "Run it at deploy time to pre-download the model into the HuggingFace cache."
+    )
+
+    def handle(self, *args, **options):
+        if not emotion_model_registry.warm_up():
+            raise CommandError(f"Could not load emotion model {emotion_model_registry.model_name}")
+
+        self.stdout.write(json.dumps(emotion_model_registry.stats(), indent=2))
+        self.stdout.write(self.style.SUCCESS("Emotion model is loaded and warm"))
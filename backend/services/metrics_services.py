@@ -0,0 +1,252 @@
+# services/metrics_services.py
+import os
+import re
+import time
+import bisect
+import threading
+import contextvars
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the histogram buckets kept for every *_seconds timing
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Spans finished while handling the current request, for the Server-Timing header.
+# None outside a request (or when Server-Timing is off), so spans then cost nothing extra.
+_request_spans = contextvars.ContextVar('request_spans', default=None)
+
+def start_request_spans() -> List[Tuple[str, float]]:
+    """Begin collecting (name, seconds) for spans finished in this context"""
+    spans = []
+    _request_spans.set(spans)
+    return spans
+
+def stop_request_spans():
+    _request_spans.set(None)
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0-100) of values, or None if there are none"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None when the platform can't tell us"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        # ru_maxrss is a peak value in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+class MetricsRegistry:
+    """Thread-safe, in-process counters, gauges and timing summaries"""
+
+    # Recent observations kept per timing for percentiles
+    SAMPLE_WINDOW = 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._timings = {}
+        self._samples = {}
+        self._buckets = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record one timing/size observation. Count, sum and max cover every
+        observation; percentiles cover the most recent SAMPLE_WINDOW.
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._timings.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['max'] = max(summary['max'], value)
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.SAMPLE_WINDOW)
+            samples.append(value)
+            if name.endswith('_seconds'):
+                buckets = self._buckets.get(key)
+                if buckets is None:
+                    buckets = self._buckets[key] = [0] * (len(LATENCY_BUCKETS) + 1)
+                buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+
+    def span(self, name: str, **labels) -> 'Span':
+        """Time a block into the `<name>_seconds` histogram (and the Server-Timing header, if on)"""
+        return Span(self, name, labels)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def counter_sum(self, name: str, **labels) -> float:
+        """Sum of the counter over every label set that includes `labels` (e.g. all modes)"""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(
+                value for (counter, counter_labels), value in self._counters.items()
+                if counter == name and wanted <= set(counter_labels)
+            )
+
+    def recent_samples(self, name: str, **labels) -> List[float]:
+        """The recent observations of a timing across every label set that includes `labels`"""
+        wanted = set(labels.items())
+        with self._lock:
+            return [
+                value for (timing, timing_labels), samples in self._samples.items()
+                if timing == name and wanted <= set(timing_labels) for value in samples
+            ]
+
+    def ratio(self, numerator: str, denominator_names: Sequence[str], **labels) -> Optional[float]:
+        """numerator / sum(denominator_names) over counters, e.g. a cache hit ratio; None before any counts"""
+        with self._lock:
+            total = sum(self._counters.get(self._key(name, labels), 0) for name in denominator_names)
+            if not total:
+                return None
+            return self._counters.get(self._key(numerator, labels), 0) / total
+
+    def snapshot(self) -> Dict:
+        """Plain-dict copy of every metric, suitable for JSON responses and logs"""
+        def flatten(key):
+            name, labels = key
+            if not labels:
+                return name
+            label_text = ','.join(f'{k}={v}' for k, v in labels)
+            return f'{name}{{{label_text}}}'
+
+        with self._lock:
+            samples = {k: list(v) for k, v in self._samples.items()}
+            snapshot = {
+                'counters': {flatten(k): v for k, v in self._counters.items()},
+                'gauges': {flatten(k): v for k, v in self._gauges.items()},
+                'timings': {flatten(k): dict(v) for k, v in self._timings.items()},
+            }
+
+        # Sorting happens outside the lock so request threads recording metrics never wait on it
+        for key, values in samples.items():
+            summary = snapshot['timings'][flatten(key)]
+            for q in (50, 95, 99):
+                summary[f'p{q}'] = percentile(values, q)
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+            self._samples.clear()
+            self._buckets.clear()
+
+    def render_prometheus(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format. *_seconds timings
+        are histograms (aggregatable across workers); other timings are summaries
+        with quantiles over the recent sample window.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {k: dict(v) for k, v in self._timings.items()}
+            samples = {k: list(v) for k, v in self._samples.items()}
+            buckets = {k: list(v) for k, v in self._buckets.items()}
+
+        families = defaultdict(list)
+        for (name, labels), value in counters.items():
+            families[(name, 'counter')].append(_sample_line(name, labels, value))
+        for (name, labels), value in gauges.items():
+            if value is not None:
+                families[(name, 'gauge')].append(_sample_line(name, labels, value))
+        for key, summary in timings.items():
+            name, labels = key
+            lines = families[(name, 'histogram' if key in buckets else 'summary')]
+            if key in buckets:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), buckets[key]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(_sample_line(f'{name}_bucket', labels + (('le', le),), cumulative))
+            else:
+                for q in (50, 95, 99):
+                    value = percentile(samples.get(key, ()), q)
+                    if value is not None:
+                        lines.append(_sample_line(name, labels + (('quantile', str(q / 100)),), value))
+            lines.append(_sample_line(f'{name}_sum', labels, summary['sum']))
+            lines.append(_sample_line(f'{name}_count', labels, summary['count']))
+
+        output = []
+        for (name, kind), lines in sorted(families.items()):
+            output.append(f'# TYPE {_metric_name(name)} {kind}')
+            output.extend(lines)
+        return '\n'.join(output) + '\n'
+
+
+class Span:
+    """Context manager behind MetricsRegistry.span; cheap enough to leave on everywhere"""
+
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry: MetricsRegistry, name: str, labels: Dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.registry.observe(f'{self.name}_seconds', elapsed, **self.labels)
+        if exc_type is not None:
+            self.registry.inc(f'{self.name}_errors_total', **self.labels)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((self.name, elapsed))
+        return False
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+
+
+def _label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample_line(name: str, labels: tuple, value: float) -> str:
+    value = float(value)
+    value_text = '+Inf' if value == float('inf') else repr(value)
+    if not labels:
+        return f'{_metric_name(name)} {value_text}'
+    label_text = ','.join(f'{_metric_name(k)}="{_label_value(v)}"' for k, v in labels)
+    return f'{_metric_name(name)}{{{label_text}}} {value_text}'
+
+
+# Process-wide registry shared by every service
+metrics = MetricsRegistry()
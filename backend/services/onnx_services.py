@@ -0,0 +1,104 @@
+# services/onnx_services.py
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Union
+
+logger = logging.getLogger(__name__)
+
+QUANTIZED_MODEL_FILENAME = 'model.int8.onnx'
+
+
+class OnnxEmotionClassifier:
+    """
+    Drop-in replacement for the transformers text-classification pipeline,
+    backed by a dynamically int8-quantized ONNX Runtime session.
+    Called with a string it returns [top_result]; called with a list it
+    returns one top_result per text, exactly like the pipeline.
+    """
+
+    def __init__(self, model_dir: Union[str, Path], intra_op_threads: int = 0):
+        try:
+            import numpy as np
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The ONNX emotion backend requires the 'onnxruntime' package") from e
+        from transformers import AutoConfig, AutoTokenizer
+
+        model_dir = Path(model_dir)
+        self._np = np
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.id2label = AutoConfig.from_pretrained(model_dir).id2label
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            str(model_dir / QUANTIZED_MODEL_FILENAME), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def __call__(self, inputs: Union[str, List[str]], **kwargs) -> List[Dict]:
+        np = self._np
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+
+        # Pad to the longest text in the call, like the pipeline's collate step
+        encoded = self.tokenizer(texts, padding=True, truncation=True, return_tensors='np')
+        feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+        logits = self.session.run(None, feeds)[0]
+
+        shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probabilities = shifted / shifted.sum(axis=-1, keepdims=True)
+        top = probabilities.argmax(axis=-1)
+        return [
+            {'label': self.id2label[int(index)], 'score': float(row[index])}
+            for row, index in zip(probabilities, top)
+        ]
+
+
+def export_quantized_model(model_name: str, output_dir: Union[str, Path], opset: int = 17) -> Path:
+    """
+    Export model_name to ONNX and quantize its weights to int8.
+    Writes the quantized model, tokenizer and config into output_dir and
+    returns the path of the quantized model.
+    """
+    try:
+        import torch
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        raise ImportError("Exporting requires 'torch', 'onnx' and 'onnxruntime'") from e
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    float_path = output_dir / 'model.onnx'
+    sample = tokenizer(["I feel ready to learn today"], return_tensors='pt')
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample['input_ids'], sample['attention_mask']),
+            str(float_path),
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'},
+            },
+            opset_version=opset,
+        )
+
+    quantized_path = output_dir / QUANTIZED_MODEL_FILENAME
+    quantize_dynamic(str(float_path), str(quantized_path), weight_type=QuantType.QInt8)
+    os.remove(float_path)
+
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    logger.info(f"Quantized ONNX emotion model written to {quantized_path}")
+    return quantized_path
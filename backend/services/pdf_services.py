@@ -1,40 +1,188 @@
-# app1/utils/pdf_generator.py
+# services/pdf_services.py
 import io
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.colors import HexColor
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+import os
+import re
+import copy
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
 
-class PDFGenerator:
-    """Generate PDF worksheets"""
+from django.conf import settings
+
+from .metrics_services import metrics
+
+# reportlab is imported inside the methods so importing this module (e.g. from
+# app1.views at startup) stays cheap; the cost is paid on the first PDF only.
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the PDF layout changes so previously cached files stop matching
+PDF_TEMPLATE_VERSION = 2
+
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
+def get_pdf_executor() -> ThreadPoolExecutor:
+    """Bounded pool that async views use to render PDFs off the event loop"""
+    global _pdf_executor
+    if _pdf_executor is None:
+        with _pdf_executor_lock:
+            if _pdf_executor is None:
+                _pdf_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PDF_MAX_WORKERS', 2),
+                    thread_name_prefix='pdf'
+                )
+    return _pdf_executor
+
+class PDFFileCache:
+    """
+    Rendered PDFs stored on disk under a hash of everything that goes into
+    them, so a given worksheet is rendered at most once per template version.
+    Hits refresh a file's mtime; after each render, files unused for `max_age`
+    seconds and then the least recently used beyond `max_bytes` are deleted.
+    """
     
-    def __init__(self):
-        self.pagesize = letter
-        self.margin = 0.75 * inch
+    def __init__(self, directory=None, max_bytes: Optional[int] = None, max_age: Optional[float] = None):
+        self.directory = Path(directory or getattr(
+            settings, 'PDF_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'worksheets'
+        ))
+        self.max_bytes = max_bytes if max_bytes is not None else getattr(settings, 'PDF_CACHE_MAX_BYTES', 0)
+        self.max_age = max_age if max_age is not None else getattr(settings, 'PDF_CACHE_MAX_AGE', 0)
+    
+    @staticmethod
+    def content_hash(worksheet_data: Dict) -> str:
+        payload = json.dumps(
+            {
+                'template': PDF_TEMPLATE_VERSION,
+                'emoji_font': find_emoji_font(),
+                'worksheet': worksheet_data,
+            },
+            sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+    
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path(key)
+        return path if path.is_file() else None
+    
+    def get_or_render(self, key: str, worksheet_data: Dict, render: Callable[[Dict], io.BytesIO]) -> Path:
+        """Path of the cached PDF under key (see content_hash), rendering it first on a miss"""
+        cached = self.get(key)
+        if cached is not None:
+            metrics.inc('pdf_cache_hits_total')
+            try:
+                os.utime(cached)
+            except OSError:
+                pass
+            return cached
         
-    def generate_worksheet_pdf(self, worksheet_data):
-        """Generate a PDF worksheet from data"""
+        metrics.inc('pdf_cache_misses_total')
+        pdf_buffer = render(worksheet_data)
+        path = self.path(key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename so readers never see a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(pdf_buffer.getvalue())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Cached worksheet PDF {path.name}")
+        self.evict(keep=path)
+        return path
+    
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """Delete expired PDFs, then the least recently used until under max_bytes; returns how many"""
+        if not self.max_bytes and not self.max_age:
+            return 0
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith('.pdf') and entry.path != str(keep):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return 0
         
-        buffer = io.BytesIO()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        if keep is not None and keep.is_file():
+            total += keep.stat().st_size
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            expired = self.max_age and now - mtime > self.max_age
+            if not expired and not (self.max_bytes and total > self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            metrics.inc('pdf_cache_evictions_total', removed)
+            logger.info(f"Evicted {removed} cached worksheet PDFs")
+        return removed
+
+# Emoji and the variation selector / zero-width joiner that glue them together
+EMOJI_PATTERN = re.compile(
+    '([\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]+)'
+)
+EMOJI_FONT_NAME = 'ZappyEmoji'
+
+# Monochrome TrueType emoji fonts installed by common distro packages (Noto Emoji, fonts-symbola).
+# Colour emoji fonts (NotoColorEmoji, Apple Color Emoji) are bitmap fonts ReportLab can't draw.
+EMOJI_FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/noto/NotoEmoji-Regular.ttf',
+    '/usr/share/fonts/noto/NotoEmoji-Regular.ttf',
+    '/usr/share/fonts/google-noto-emoji/NotoEmoji-Regular.ttf',
+    '/usr/share/fonts/truetype/ancient-scripts/Symbola_hint.ttf',
+    '/usr/share/fonts/TTF/Symbola.ttf',
+    '/usr/share/fonts/gdouros-symbola/Symbola.ttf',
+)
+
+def find_emoji_font() -> Optional[str]:
+    """settings.PDF_EMOJI_FONT if set ('none' leaves emoji out), else the first installed candidate"""
+    configured = getattr(settings, 'PDF_EMOJI_FONT', None)
+    if configured:
+        return None if str(configured).lower() == 'none' else str(configured)
+    return next((path for path in EMOJI_FONT_CANDIDATES if os.path.isfile(path)), None)
+
+class PDFTemplate:
+    """
+    Styles, fonts and static page furniture shared by every worksheet PDF.
+    Built once per process; each render only adds the worksheet's own paragraphs.
+    """
+    
+    def __init__(self):
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.colors import HexColor
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.platypus import Paragraph
         
-        # Create PDF document
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=self.pagesize,
-            rightMargin=self.margin,
-            leftMargin=self.margin,
-            topMargin=self.margin,
-            bottomMargin=self.margin
-        )
+        self.emoji_font = self._register_emoji_font(find_emoji_font())
         
-        # Build content
-        story = []
         styles = getSampleStyleSheet()
+        self.normal_style = styles['Normal']
         
         # Custom styles
-        title_style = ParagraphStyle(
+        self.title_style = ParagraphStyle(
             'CustomTitle',
             parent=styles['Heading1'],
             fontSize=24,
@@ -43,7 +191,7 @@ class PDFGenerator:
             spaceAfter=30,
         )
         
-        subtitle_style = ParagraphStyle(
+        self.subtitle_style = ParagraphStyle(
             'CustomSubtitle',
             parent=styles['Heading2'],
             fontSize=16,
@@ -52,7 +200,7 @@ class PDFGenerator:
             spaceAfter=20,
         )
         
-        motivation_style = ParagraphStyle(
+        self.motivation_style = ParagraphStyle(
             'MotivationStyle',
             parent=styles['Normal'],
             fontSize=14,
@@ -65,7 +213,7 @@ class PDFGenerator:
             backColor=HexColor('#F8FFF8')
         )
         
-        question_header_style = ParagraphStyle(
+        self.question_header_style = ParagraphStyle(
             'QuestionHeader',
             parent=styles['Heading3'],
             fontSize=14,
@@ -73,7 +221,7 @@ class PDFGenerator:
             spaceAfter=10,
         )
         
-        question_style = ParagraphStyle(
+        self.question_style = ParagraphStyle(
             'QuestionStyle',
             parent=styles['Normal'],
             fontSize=12,
@@ -81,67 +229,173 @@ class PDFGenerator:
             leftIndent=20,
         )
         
-        # Add content
+        self.footer_style = ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=HexColor('#666666'),
+            alignment=TA_CENTER,
+        )
+        
+        # Static flowables: parsed once, shallow-copied into each story
+        self.title = [
+            Paragraph("ZappyLearn", self.title_style),
+            Paragraph("Personalized Learning Worksheet", self.subtitle_style),
+        ]
+        self.motivation_header = Paragraph("Your Personal Motivation", self.question_header_style)
+        self.questions_header = Paragraph("Practice Questions", self.question_header_style)
+        self.answer_label = Paragraph("Answer:", self.normal_style)
+        self.difficulty_headers = {
+            difficulty: Paragraph(f"<b>{self.markup(label)}</b>", self.question_header_style)
+            for difficulty, label in {
+                'easy': '🟢 EASY',
+                'medium': '🟡 MEDIUM',
+                'hard': '🔴 HARD'
+            }.items()
+        }
+        self.footer_message = Paragraph(self.markup("Keep learning and growing! 🌟"), self.footer_style)
+    
+    @staticmethod
+    def _register_emoji_font(font_path) -> Optional[str]:
+        """Register a TrueType emoji font with ReportLab, returning its name if it is usable"""
+        if not font_path:
+            return None
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        
+        try:
+            pdfmetrics.registerFont(TTFont(EMOJI_FONT_NAME, str(font_path)))
+        except Exception as e:
+            logger.warning(f"Could not register emoji font {font_path}: {e}")
+            return None
+        return EMOJI_FONT_NAME
+    
+    def markup(self, text) -> str:
+        """
+        Escape text for a Paragraph and render its emoji with the emoji font,
+        or drop them when no emoji font is configured (the base fonts have no
+        glyphs for them and would print black boxes)
+        """
+        from xml.sax.saxutils import escape
+        
+        text = escape(str(text))
+        if self.emoji_font:
+            return EMOJI_PATTERN.sub(rf'<font name="{self.emoji_font}">\1</font>', text)
+        return ' '.join(EMOJI_PATTERN.sub('', text).split())
+    
+    @staticmethod
+    def copy(flowable):
+        # A shallow copy shares the parsed text but gets its own layout state
+        return copy.copy(flowable)
+
+_pdf_template = None
+_pdf_template_lock = threading.Lock()
+
+def get_pdf_template() -> PDFTemplate:
+    global _pdf_template
+    if _pdf_template is None:
+        with _pdf_template_lock:
+            if _pdf_template is None:
+                _pdf_template = PDFTemplate()
+    return _pdf_template
+
+class PDFGenerator:
+    """Generate PDF worksheets"""
+    
+    def __init__(self, template: Optional[PDFTemplate] = None):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.units import inch
+        
+        self.pagesize = letter
+        self.margin = 0.75 * inch
+        self.template = template or get_pdf_template()
+        
+    def generate_worksheet_pdf(self, worksheet_data):
+        """Generate a PDF worksheet from data"""
+        with metrics.span('pdf_render', kind='worksheet'):
+            return self._build(self._worksheet_story(worksheet_data))
+    
+    def generate_pack_pdf(self, worksheets):
+        """Render several worksheets (e.g. a class set) into one PDF, one section per worksheet"""
+        from reportlab.platypus import PageBreak
+        
+        with metrics.span('pdf_render', kind='pack'):
+            story = []
+            for index, worksheet_data in enumerate(worksheets):
+                if index:
+                    story.append(PageBreak())
+                story.extend(self._worksheet_story(worksheet_data))
+            return self._build(story)
+    
+    def _build(self, story):
+        from reportlab.platypus import SimpleDocTemplate
+        
+        buffer = io.BytesIO()
+        
+        # Create PDF document
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=self.pagesize,
+            rightMargin=self.margin,
+            leftMargin=self.margin,
+            topMargin=self.margin,
+            bottomMargin=self.margin
+        )
+        
+        # Build PDF
+        doc.build(story)
+        buffer.seek(0)
+        
+        return buffer
+    
+    def _worksheet_story(self, worksheet_data):
+        from reportlab.platypus import Paragraph, Spacer
+        
+        template = self.template
+        markup = template.markup
+        copy_of = template.copy
+        
+        # Build content
+        story = []
+        
         # Title
-        story.append(Paragraph("ZappyLearn", title_style))
-        story.append(Paragraph("Personalized Learning Worksheet", subtitle_style))
+        story.extend(copy_of(flowable) for flowable in template.title)
         story.append(Spacer(1, 20))
         
         # Worksheet info
         subject_title = worksheet_data.get('subject', '').title()
         mood_emoji = worksheet_data.get('motivationEmoji', '🌟')
         
-        story.append(Paragraph(f"Subject: {subject_title} {mood_emoji}", subtitle_style))
-        story.append(Paragraph(f"Generated on: {worksheet_data.get('timestamp', '')}", styles['Normal']))
+        story.append(Paragraph(markup(f"Subject: {subject_title} {mood_emoji}"), template.subtitle_style))
+        if worksheet_data.get('student'):
+            story.append(Paragraph(markup(f"Student: {worksheet_data['student']}"), template.normal_style))
+        story.append(Paragraph(markup(f"Generated on: {worksheet_data.get('timestamp', '')}"), template.normal_style))
         story.append(Spacer(1, 20))
         
         # Motivation section
-        motivation_text = f"{mood_emoji} {worksheet_data.get('motivation', '')}"
-        story.append(Paragraph("Your Personal Motivation", question_header_style))
-        story.append(Paragraph(motivation_text, motivation_style))
+        story.append(copy_of(template.motivation_header))
+        story.append(Paragraph(markup(f"{mood_emoji} {worksheet_data.get('motivation', '')}"), template.motivation_style))
         story.append(Spacer(1, 20))
         
         # Questions section
-        story.append(Paragraph("Practice Questions", question_header_style))
+        story.append(copy_of(template.questions_header))
         story.append(Spacer(1, 10))
         
         questions = worksheet_data.get('questions', {})
-        difficulty_icons = {
-            'easy': '🟢 EASY',
-            'medium': '🟡 MEDIUM',
-            'hard': '🔴 HARD'
-        }
-        
         for difficulty in ['easy', 'medium', 'hard']:
             if difficulty in questions and questions[difficulty]:
-                # Difficulty header
-                difficulty_text = difficulty_icons.get(difficulty, difficulty.upper())
-                story.append(Paragraph(f"<b>{difficulty_text}</b>", question_header_style))
-                
-                # Question text
-                question_text = questions[difficulty]
-                story.append(Paragraph(question_text, question_style))
+                story.append(copy_of(template.difficulty_headers[difficulty]))
+                story.append(Paragraph(markup(questions[difficulty]), template.question_style))
                 
                 # Add space for answer
-                story.append(Paragraph("Answer:", styles['Normal']))
+                story.append(copy_of(template.answer_label))
                 story.append(Spacer(1, 40))  # Space for student to write
                 
                 story.append(Spacer(1, 20))
         
         # Footer
         story.append(Spacer(1, 40))
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=HexColor('#666666'),
-            alignment=TA_CENTER,
-        )
-        story.append(Paragraph("Keep learning and growing! 🌟", footer_style))
-        story.append(Paragraph(f"Worksheet ID: {worksheet_data.get('worksheet_id', '')}", footer_style))
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
+        story.append(copy_of(template.footer_message))
+        story.append(Paragraph(markup(f"Worksheet ID: {worksheet_data.get('worksheet_id', '')}"), template.footer_style))
         
-        return buffer
\ No newline at end of file
+        return story
@@ -0,0 +1,447 @@
+# services/rate_limit_services.py
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .metrics_services import metrics
+
+logger = logging.getLogger(__name__)
+
+# (key, capacity, refill per second, amount to take)
+Bucket = Tuple[str, float, float, float]
+
+def _refill(tokens: float, updated_at: float, capacity: float, rate: float, now: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+def _bucket_wait(tokens: float, amount: float, rate: float) -> float:
+    """Seconds until a bucket holding `tokens` can supply `amount`"""
+    if tokens >= amount:
+        return 0.0
+    return (amount - tokens) / rate if rate > 0 else float('inf')
+
+class BaseRateLimitBackend:
+    """
+    Token buckets and usage counters shared by every GroqRateLimiter using the backend.
+    Bucket state is (tokens, updated_at) on the wall clock so workers on one host
+    (sqlite) or many hosts (redis) agree on refills.
+    """
+
+    name = 'base'
+
+    def take(self, buckets: List[Bucket], now: float, dry_run: bool = False) -> Tuple[float, Optional[str]]:
+        """
+        Take `amount` from every bucket, or from none of them.
+        Returns (0, None) on success, otherwise the wait until all buckets could
+        supply their amount and the key of the bucket that is furthest behind.
+        dry_run reports the same answer without taking anything.
+        """
+        raise NotImplementedError
+
+    def refund(self, key: str, capacity: float, amount: float):
+        """Return unused tokens to a bucket, never beyond its capacity"""
+        raise NotImplementedError
+
+    def add_usage(self, key: str, amount: float, ttl: float) -> float:
+        """Add to a usage counter that expires after ttl seconds; returns the new total"""
+        raise NotImplementedError
+
+    def get_usage(self, key: str) -> float:
+        raise NotImplementedError
+
+    def ping(self) -> bool:
+        return True
+
+    @staticmethod
+    def _plan(states: Dict[str, Tuple[float, float]], buckets: List[Bucket], now: float):
+        """Refilled levels for each bucket plus the longest wait among them"""
+        levels, wait, limiting = {}, 0.0, None
+        for key, capacity, rate, amount in buckets:
+            tokens, updated_at = states.get(key) or (capacity, now)
+            level = _refill(tokens, updated_at, capacity, rate, now)
+            levels[key] = level - min(amount, capacity)
+            bucket_wait = _bucket_wait(level, min(amount, capacity), rate)
+            if bucket_wait > wait:
+                wait, limiting = bucket_wait, key
+        return levels, wait, limiting
+
+class LocalRateLimitBackend(BaseRateLimitBackend):
+    """Per-process buckets; limits apply to each worker separately"""
+
+    name = 'memory'
+
+    def __init__(self, **kwargs):
+        self._buckets = {}
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets, now, dry_run=False):
+        with self._lock:
+            levels, wait, limiting = self._plan(self._buckets, buckets, now)
+            if wait == 0 and not dry_run:
+                for key, level in levels.items():
+                    self._buckets[key] = (level, now)
+        return wait, limiting
+
+    def refund(self, key, capacity, amount):
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated_at = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + amount), updated_at)
+
+    def add_usage(self, key, amount, ttl):
+        with self._lock:
+            now = time.time()
+            total, expires_at = self._usage.get(key, (0.0, now + ttl))
+            if expires_at <= now:
+                total, expires_at = 0.0, now + ttl
+            total += amount
+            self._usage[key] = (total, expires_at)
+            return total
+
+    def get_usage(self, key):
+        with self._lock:
+            total, expires_at = self._usage.get(key, (0.0, None))
+            return total if expires_at is None or expires_at > time.time() else 0.0
+
+class SQLiteRateLimitBackend(BaseRateLimitBackend):
+    """File-backed buckets shared by every worker on one host"""
+
+    name = 'sqlite'
+
+    def __init__(self, location: str, **kwargs):
+        self.location = str(location)
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_usage ("
+                "key TEXT PRIMARY KEY, amount REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.location, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, operation):
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front so two workers can't spend the same tokens
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = operation(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def take(self, buckets, now, dry_run=False):
+        def operation(conn):
+            keys = [bucket[0] for bucket in buckets]
+            rows = conn.execute(
+                f"SELECT key, tokens, updated_at FROM rate_limit_buckets WHERE key IN ({','.join('?' * len(keys))})",
+                keys
+            ).fetchall()
+            levels, wait, limiting = self._plan({key: (tokens, at) for key, tokens, at in rows}, buckets, now)
+            if wait == 0 and not dry_run:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    [(key, level, now) for key, level in levels.items()]
+                )
+            return wait, limiting
+
+        return self._write(operation)
+
+    def refund(self, key, capacity, amount):
+        self._connection().execute(
+            "UPDATE rate_limit_buckets SET tokens = MIN(?, tokens + ?) WHERE key = ?", (capacity, amount, key)
+        )
+
+    def add_usage(self, key, amount, ttl):
+        def operation(conn):
+            now = time.time()
+            conn.execute("DELETE FROM rate_limit_usage WHERE key = ? AND expires_at <= ?", (key, now))
+            conn.execute(
+                "INSERT INTO rate_limit_usage (key, amount, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET amount = amount + excluded.amount",
+                (key, amount, now + ttl)
+            )
+            return conn.execute("SELECT amount FROM rate_limit_usage WHERE key = ?", (key,)).fetchone()[0]
+
+        return self._write(operation)
+
+    def get_usage(self, key):
+        row = self._connection().execute(
+            "SELECT amount FROM rate_limit_usage WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0.0
+
+    def ping(self):
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+# KEYS = bucket keys; ARGV = now, dry_run, then capacity/rate/amount per bucket.
+# Runs atomically on the server, so every worker on every host shares the same buckets.
+_REDIS_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local dry_run = ARGV[2] == '1'
+local levels = {}
+local wait, limiting = 0, ''
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 3])
+    local rate = tonumber(ARGV[i * 3 + 1])
+    local amount = math.min(tonumber(ARGV[i * 3 + 2]), capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'updated_at')
+    local tokens = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    local level = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+    levels[i] = level - amount
+    if level < amount then
+        local bucket_wait = rate > 0 and (amount - level) / rate or 1e9
+        if bucket_wait > wait then
+            wait, limiting = bucket_wait, key
+        end
+    end
+end
+if wait == 0 and not dry_run then
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[i * 3])
+        local rate = tonumber(ARGV[i * 3 + 1])
+        redis.call('HSET', key, 'tokens', levels[i], 'updated_at', now)
+        redis.call('EXPIRE', key, math.ceil(capacity / math.max(rate, 1e-9)) + 60)
+    end
+end
+return {tostring(wait), limiting}
+"""
+
+class RedisRateLimitBackend(BaseRateLimitBackend):
+    """Redis (or any Redis-protocol server) buckets shared across workers and hosts"""
+
+    name = 'redis'
+
+    def __init__(self, location: str, key_prefix: str = 'zappylearn', **kwargs):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis rate limit backend requires the 'redis' package") from e
+
+        self.client = redis.Redis.from_url(location)
+        self.key_prefix = key_prefix
+        self._take_script = self.client.register_script(_REDIS_TAKE_SCRIPT)
+
+    def _key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def take(self, buckets, now, dry_run=False):
+        args = [now, '1' if dry_run else '0']
+        for _, capacity, rate, amount in buckets:
+            args.extend([capacity, rate, amount])
+        wait, limiting = self._take_script(keys=[self._key(bucket[0]) for bucket in buckets], args=args)
+        limiting = limiting.decode() if isinstance(limiting, bytes) else limiting
+        return float(wait), limiting[len(self.key_prefix) + 1:] if limiting else None
+
+    def refund(self, key, capacity, amount):
+        redis_key = self._key(key)
+        tokens = float(self.client.hincrbyfloat(redis_key, 'tokens', amount))
+        if tokens > capacity:
+            self.client.hset(redis_key, 'tokens', capacity)
+
+    def add_usage(self, key, amount, ttl):
+        redis_key = self._key(key)
+        pipe = self.client.pipeline()
+        pipe.incrbyfloat(redis_key, amount)
+        pipe.expire(redis_key, int(ttl), nx=True)
+        return float(pipe.execute()[0])
+
+    def get_usage(self, key):
+        value = self.client.get(self._key(key))
+        return float(value) if value is not None else 0.0
+
+    def ping(self):
+        try:
+            return bool(self.client.ping())
+        except Exception:
+            return False
+
+RATE_LIMIT_BACKENDS = {
+    'memory': LocalRateLimitBackend,
+    'sqlite': SQLiteRateLimitBackend,
+    'redis': RedisRateLimitBackend,
+}
+
+def build_rate_limit_backend(config: Dict) -> Optional[BaseRateLimitBackend]:
+    """Build a backend from settings.GROQ_RATE_LIMIT; BACKEND 'none' disables limiting"""
+    backend_name = (config or {}).get('BACKEND', 'none')
+    if backend_name == 'none':
+        return None
+
+    try:
+        backend_class = RATE_LIMIT_BACKENDS[backend_name]
+    except KeyError:
+        raise ValueError(f"Unknown rate limit backend '{backend_name}'")
+
+    return backend_class(location=config.get('LOCATION'), key_prefix=config.get('KEY_PREFIX', 'zappylearn'))
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Worst-case tokens for one call: ~4 characters per prompt token plus the full completion allowance"""
+    return len(prompt) // 4 + max_tokens
+
+class RateLimitExceeded(Exception):
+    """A Groq call could not start within the limiter's max wait, or the daily budget is spent"""
+
+    def __init__(self, reason: str, retry_after: Optional[float] = None):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Groq rate limit reached ({reason})")
+
+class GroqRateLimiter:
+    """
+    Client-side requests/minute and tokens/minute buckets plus a daily token budget,
+    so bursts queue briefly here instead of turning into 429s from Groq.
+    Tokens are reserved from an estimate up front and the unused part is refunded
+    once the completion reports its real usage. A limit of 0 disables that dimension.
+    """
+
+    def __init__(self, backend: BaseRateLimitBackend, requests_per_minute: int = 30,
+                 tokens_per_minute: int = 6000, daily_token_budget: int = 0, max_wait: float = 2.0):
+        self.backend = backend
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.daily_token_budget = daily_token_budget
+        self.max_wait = max_wait
+
+    def _buckets(self, requests: int, tokens: int) -> List[Bucket]:
+        buckets = []
+        if self.requests_per_minute:
+            buckets.append(('groq:rpm', self.requests_per_minute, self.requests_per_minute / 60, requests))
+        if self.tokens_per_minute:
+            buckets.append(('groq:tpm', self.tokens_per_minute, self.tokens_per_minute / 60, tokens))
+        return buckets
+
+    @staticmethod
+    def _budget_key() -> str:
+        return f"groq:tokens:{datetime.now(timezone.utc).date().isoformat()}"
+
+    @staticmethod
+    def _reason(limiting: Optional[str]) -> str:
+        return (limiting or 'groq:rpm').rsplit(':', 1)[-1]
+
+    def budget_exhausted(self) -> bool:
+        return bool(self.daily_token_budget) and self.backend.get_usage(self._budget_key()) >= self.daily_token_budget
+
+    def _try_acquire(self, tokens: int, waited: float) -> float:
+        """Take one request and `tokens`, returning 0, or the seconds to sleep before trying again"""
+        if self.budget_exhausted():
+            metrics.inc('groq_rate_limited_total', reason='budget')
+            raise RateLimitExceeded('budget')
+
+        buckets = self._buckets(1, tokens)
+        if not buckets:
+            return 0.0
+        wait, limiting = self.backend.take(buckets, time.time())
+        if wait and waited + wait > self.max_wait:
+            reason = self._reason(limiting)
+            metrics.inc('groq_rate_limited_total', reason=reason)
+            raise RateLimitExceeded(reason, retry_after=wait)
+        return wait
+
+    def acquire(self, tokens: int):
+        """Block (up to max_wait) until a call of `tokens` may start; raises RateLimitExceeded otherwise"""
+        start = time.monotonic()
+        while True:
+            wait = self._try_acquire(tokens, time.monotonic() - start)
+            if not wait:
+                break
+            time.sleep(wait)
+        self._record_wait(time.monotonic() - start)
+
+    async def aacquire(self, tokens: int):
+        start = time.monotonic()
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire, tokens, time.monotonic() - start)
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        self._record_wait(time.monotonic() - start)
+
+    @staticmethod
+    def _record_wait(waited: float):
+        if waited > 0.001:
+            metrics.inc('groq_rate_limit_waits_total')
+            metrics.observe('groq_rate_limit_wait_seconds', waited)
+
+    def record_usage(self, reserved: int, used: Optional[int]):
+        """Refund the unused reservation and charge the daily budget with what the call really used"""
+        used = reserved if used is None else used
+        try:
+            if self.tokens_per_minute and reserved > used:
+                self.backend.refund('groq:tpm', self.tokens_per_minute, reserved - used)
+            if self.daily_token_budget:
+                total = self.backend.add_usage(self._budget_key(), used, ttl=2 * 24 * 60 * 60)
+                metrics.set_gauge('groq_daily_tokens_used', total)
+        except Exception as e:
+            logger.warning(f"Recording Groq token usage failed: {e}")
+
+    def blocked_reason(self) -> Optional[str]:
+        """
+        Why a new worksheet shouldn't call Groq right now ('budget', 'rpm' or 'tpm'),
+        or None. Takes nothing; individual calls still acquire for themselves.
+        """
+        try:
+            if self.budget_exhausted():
+                return 'budget'
+            buckets = self._buckets(1, 1)
+            if not buckets:
+                return None
+            wait, limiting = self.backend.take(buckets, time.time(), dry_run=True)
+        except Exception as e:
+            # A broken limiter backend must not take generation down with it
+            logger.warning(f"Rate limiter check failed: {e}")
+            return None
+        return self._reason(limiting) if wait > self.max_wait else None
+
+    def stats(self) -> Dict:
+        used = self.backend.get_usage(self._budget_key()) if self.daily_token_budget else None
+        return {
+            'backend': self.backend.name,
+            'requests_per_minute': self.requests_per_minute,
+            'tokens_per_minute': self.tokens_per_minute,
+            'daily_token_budget': self.daily_token_budget,
+            'daily_tokens_used': used,
+            'max_wait': self.max_wait,
+        }
+
+_groq_rate_limiter = None
+_groq_rate_limiter_lock = threading.Lock()
+
+def get_groq_rate_limiter() -> Optional[GroqRateLimiter]:
+    """Process-wide limiter built from settings.GROQ_RATE_LIMIT (None when disabled)"""
+    global _groq_rate_limiter
+    if _groq_rate_limiter is None:
+        with _groq_rate_limiter_lock:
+            if _groq_rate_limiter is None:
+                config = getattr(settings, 'GROQ_RATE_LIMIT', {})
+                backend = build_rate_limit_backend(config)
+                _groq_rate_limiter = GroqRateLimiter(
+                    backend,
+                    requests_per_minute=config.get('REQUESTS_PER_MINUTE', 30),
+                    tokens_per_minute=config.get('TOKENS_PER_MINUTE', 6000),
+                    daily_token_budget=config.get('DAILY_TOKEN_BUDGET', 0),
+                    max_wait=config.get('MAX_WAIT', 2.0)
+                ) if backend is not None else False
+    return _groq_rate_limiter or None
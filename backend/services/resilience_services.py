@@ -0,0 +1,262 @@
+# services/resilience_services.py
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from .metrics_services import metrics, percentile
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+# Gauge values for dashboards; higher is worse
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker over a rolling window of call outcomes.
+
+    Closed: every call goes through and its outcome is recorded. Once the last
+    `window` seconds hold at least `min_calls` calls and either the error rate
+    reaches `error_threshold` or the share of calls slower than
+    `slow_call_seconds` reaches `slow_call_threshold`, the circuit opens.
+    Open: callers are turned away for `open_seconds`.
+    Half-open: one probe request at a time is let through; its first call
+    outcome closes the circuit again or re-opens it. The probe is tracked in a
+    context variable, so only calls made on behalf of that request (including
+    the executor threads it fans out to with copy_context) get through.
+    State is per process, like the rest of the in-memory metrics.
+    """
+
+    def __init__(self, name: str, window: float = 60.0, min_calls: int = 10, error_threshold: float = 0.5,
+                 slow_call_seconds: float = 5.0, slow_call_threshold: float = 0.5, open_seconds: float = 30.0):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_threshold = slow_call_threshold
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        # (monotonic time, failed, slow) per call while closed
+        self._outcomes = deque()
+        self._state = CLOSED
+        self._opened_at = None
+        self._probe_started = None
+        self._probe_id = None
+        # Which probe (if any) the current request holds
+        self._probe_owner = contextvars.ContextVar(f'circuit_probe_{name}', default=None)
+        metrics.set_gauge('circuit_breaker_state', STATE_CODES[CLOSED], breaker=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str):
+        if state == self._state:
+            return
+        logger.warning(f"Circuit '{self.name}' {self._state} -> {state}")
+        self._state = state
+        self._probe_started = None
+        self._probe_id = None
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == CLOSED:
+            self._outcomes.clear()
+        metrics.inc('circuit_breaker_transitions_total', breaker=self.name, to=state)
+        metrics.set_gauge('circuit_breaker_state', STATE_CODES[state], breaker=self.name)
+
+    def allow_request(self) -> bool:
+        """Whether a new request may use the dependency; in half-open this takes the probe slot"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= self.open_seconds
+            ):
+                # A probe that never reported back (e.g. its worker thread died) expires
+                self._probe_started = now
+                self._probe_id = object()
+                self._probe_owner.set(self._probe_id)
+                return True
+        metrics.inc('circuit_breaker_rejections_total', breaker=self.name)
+        return False
+
+    def _is_probe(self) -> bool:
+        return self._probe_id is not None and self._probe_owner.get() is self._probe_id
+
+    def check(self):
+        """Raise CircuitOpen unless closed, or half-open and called on behalf of the probe request"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == CLOSED or (state == HALF_OPEN and self._is_probe()):
+                return
+            if state == OPEN:
+                retry_after = self.open_seconds - (now - self._opened_at)
+            else:
+                retry_after = max(0.0, self.open_seconds - (now - (self._probe_started or now)))
+        metrics.inc('circuit_breaker_rejections_total', breaker=self.name)
+        raise CircuitOpen(self.name, retry_after)
+
+    def release_probe(self):
+        """Give up the half-open probe without an outcome (the call was cancelled or never started)"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._is_probe():
+                self._probe_started = None
+                self._probe_id = None
+
+    def record(self, duration: float, failed: bool):
+        """Report one call's outcome"""
+        slow = duration >= self.slow_call_seconds
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == HALF_OPEN:
+                # Only the probe decides; stragglers from before the circuit opened don't count
+                if self._is_probe():
+                    self._transition(OPEN if failed or slow else CLOSED)
+                return
+            if state == OPEN:
+                # Calls started before the circuit opened are still finishing
+                return
+
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, _, s in self._outcomes if s)
+            if failures / calls >= self.error_threshold or slow_calls / calls >= self.slow_call_threshold:
+                self._transition(OPEN)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            calls = len(self._outcomes)
+            stats = {
+                'state': state,
+                'window_calls': calls,
+                'error_rate': sum(1 for _, f, _ in self._outcomes if f) / calls if calls else None,
+                'slow_call_rate': sum(1 for _, _, s in self._outcomes if s) / calls if calls else None,
+            }
+            if state == OPEN:
+                stats['retry_after_seconds'] = round(self.open_seconds - (now - self._opened_at), 1)
+        return stats
+
+class HedgePolicy:
+    """
+    When to send a duplicate ("hedged") copy of a slow call: after `delay`
+    seconds if set, otherwise after the recent `percentile` latency of calls in
+    the same mode (once `min_samples` are recorded, and never below `min_delay`).
+    Hedges in each mode are capped at `max_ratio` of that mode's calls so a slow
+    spell can't double the load on an already struggling dependency.
+    """
+
+    # Seconds a computed delay is reused before the percentile is recomputed
+    REFRESH_INTERVAL = 1.0
+
+    def __init__(self, timing: str, calls_counter: str, delay: Optional[float] = None, percentile: float = 95,
+                 min_samples: int = 20, min_delay: float = 0.1, max_ratio: float = 0.1):
+        self.timing = timing
+        self.calls_counter = calls_counter
+        self.fixed_delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self._lock = threading.Lock()
+        self._delays = {}
+
+    def delay(self, mode: str) -> Optional[float]:
+        """Seconds to wait before hedging a call in `mode`, or None to not hedge yet"""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        now = time.monotonic()
+        with self._lock:
+            cached = self._delays.get(mode)
+            if cached is not None and now - cached[0] < self.REFRESH_INTERVAL:
+                return cached[1]
+
+        samples = metrics.recent_samples(self.timing, mode=mode)
+        delay = None
+        if len(samples) >= self.min_samples:
+            delay = max(percentile(samples, self.percentile), self.min_delay)
+        with self._lock:
+            self._delays[mode] = (now, delay)
+        return delay
+
+    def try_acquire(self, mode: str) -> bool:
+        """Take one hedge from the mode's budget; counted in groq_hedges_total"""
+        hedges = metrics.counter_sum('groq_hedges_total', mode=mode)
+        # The call being hedged hasn't been counted yet
+        calls = metrics.counter_sum(self.calls_counter, mode=mode) + 1
+        if hedges >= self.max_ratio * calls:
+            metrics.inc('groq_hedges_skipped_total', mode=mode)
+            return False
+        metrics.inc('groq_hedges_total', mode=mode)
+        return True
+
+_groq_circuit_breaker = None
+_groq_circuit_breaker_lock = threading.Lock()
+
+def get_groq_circuit_breaker() -> Optional[CircuitBreaker]:
+    """Process-wide breaker for Groq calls from settings.GROQ_CIRCUIT_BREAKER (None when disabled)"""
+    global _groq_circuit_breaker
+    if _groq_circuit_breaker is None:
+        with _groq_circuit_breaker_lock:
+            if _groq_circuit_breaker is None:
+                config = getattr(settings, 'GROQ_CIRCUIT_BREAKER', {})
+                _groq_circuit_breaker = CircuitBreaker(
+                    'groq',
+                    window=config.get('WINDOW', 60.0),
+                    min_calls=config.get('MIN_CALLS', 10),
+                    error_threshold=config.get('ERROR_THRESHOLD', 0.5),
+                    slow_call_seconds=config.get('SLOW_CALL_SECONDS', 5.0),
+                    slow_call_threshold=config.get('SLOW_CALL_THRESHOLD', 0.5),
+                    open_seconds=config.get('OPEN_SECONDS', 30.0)
+                ) if config.get('ENABLED', True) else False
+    return _groq_circuit_breaker or None
+
+_groq_hedge_policy = None
+_groq_hedge_policy_lock = threading.Lock()
+
+def get_groq_hedge_policy() -> Optional[HedgePolicy]:
+    """Process-wide HedgePolicy for Groq calls from settings.GROQ_HEDGE (None when disabled)"""
+    global _groq_hedge_policy
+    if _groq_hedge_policy is None:
+        with _groq_hedge_policy_lock:
+            if _groq_hedge_policy is None:
+                config = getattr(settings, 'GROQ_HEDGE', {})
+                _groq_hedge_policy = HedgePolicy(
+                    'groq_call_seconds', 'groq_calls_total',
+                    delay=config.get('DELAY'),
+                    percentile=config.get('PERCENTILE', 95),
+                    min_samples=config.get('MIN_SAMPLES', 20),
+                    min_delay=config.get('MIN_DELAY', 0.1),
+                    max_ratio=config.get('MAX_RATIO', 0.1)
+                ) if config.get('ENABLED', True) else False
+    return _groq_hedge_policy or None
@@ -0,0 +1,236 @@
+# services/singleflight_services.py
+import copy
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from django.conf import settings
+
+from .cache_services import BaseCacheBackend, build_cache_backend
+from .metrics_services import metrics
+
+logger = logging.getLogger(__name__)
+
+class SingleFlightTimeout(Exception):
+    """The in-flight call this request joined didn't finish within the wait timeout"""
+
+class _Flight:
+    """One in-flight call: its outcome plus the threads and event loops waiting for it"""
+
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._async_waiters = []
+
+    def finish(self, result, error):
+        with self._lock:
+            self.result, self.error = result, error
+            self._done.set()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def wait(self, timeout: float) -> bool:
+        return self._done.wait(timeout)
+
+    async def await_done(self, timeout: float) -> bool:
+        # Waiting on the threading.Event from a worker thread could exhaust the default
+        # executor the leader itself needs, so async waiters get a future on their own loop
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._done.is_set():
+                return True
+            self._async_waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution whose
+    result every caller receives (the Go singleflight pattern).
+
+    Within a process the first caller (the leader) runs the function and the
+    others wait for it. With a shared backend (sqlite or redis cache backend)
+    leaders in different workers also coordinate: one takes a short-lived lock
+    and publishes its JSON result; the others poll for it. If that lock holder
+    dies or fails, a waiting worker takes over rather than erroring.
+    Callers get their own deep copy of a shared result.
+
+    Only results passing `shareable` are published, and only for `result_ttl`
+    seconds (a few poll intervals): enough for the workers already waiting to
+    read it, without turning coalescing into a result cache.
+    """
+
+    def __init__(self, backend: Optional[BaseCacheBackend] = None, timeout: float = 15.0,
+                 lock_ttl: float = 30.0, result_ttl: float = 1.0, poll_interval: float = 0.05):
+        self.backend = backend
+        self.timeout = timeout
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _land(self, key: str, flight: _Flight, result, error):
+        with self._lock:
+            self._flights.pop(key, None)
+        # Followers copy from a private copy, never the object the leader goes on to mutate
+        flight.finish(copy.deepcopy(result) if error is None else None, error)
+
+    def _shared_result(self, key: str, flight: _Flight, arrived: bool):
+        if not arrived:
+            metrics.inc('singleflight_timeouts_total')
+            raise SingleFlightTimeout(key)
+        if flight.error is not None:
+            raise flight.error
+        metrics.inc('singleflight_shared_total', scope='thread')
+        return copy.deepcopy(flight.result)
+
+    def do(self, key: str, fn: Callable[[], Any],
+           shareable: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+        """
+        Run fn() or join the identical call already in flight; returns (result, shared).
+        Results for which shareable(result) is false still go to this worker's
+        waiters but are not published to other workers.
+        """
+        flight, leader = self._join(key)
+        if not leader:
+            return self._shared_result(key, flight, flight.wait(self.timeout)), True
+
+        result, error, shared = None, None, False
+        try:
+            token, remote = self._claim(key) if self.backend is not None else (None, None)
+            if remote is not None:
+                result, shared = remote, True
+            else:
+                try:
+                    result = fn()
+                finally:
+                    if token is not None:
+                        self._release(key, token, self._publishable(result, shareable))
+                metrics.inc('singleflight_leaders_total')
+            return result, shared
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._land(key, flight, result, error)
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]],
+                  shareable: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, bool]:
+        """Async twin of do(); fn is a coroutine function"""
+        flight, leader = self._join(key)
+        if not leader:
+            return self._shared_result(key, flight, await flight.await_done(self.timeout)), True
+
+        result, error, shared = None, None, False
+        try:
+            token, remote = await asyncio.to_thread(self._claim, key) if self.backend is not None else (None, None)
+            if remote is not None:
+                result, shared = remote, True
+            else:
+                try:
+                    result = await fn()
+                finally:
+                    if token is not None:
+                        await asyncio.to_thread(self._release, key, token, self._publishable(result, shareable))
+                metrics.inc('singleflight_leaders_total')
+            return result, shared
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._land(key, flight, result, error)
+
+    @staticmethod
+    def _publishable(result, shareable):
+        if result is None or (shareable is not None and not shareable(result)):
+            return None
+        return result
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"singleflight:lock:{key}"
+
+    @staticmethod
+    def _result_key(key: str) -> str:
+        return f"singleflight:result:{key}"
+
+    def _claim(self, key: str) -> Tuple[Optional[str], Any]:
+        """
+        Take the cross-worker lock for key, or wait for the worker holding it.
+        Returns (token, None) when this worker should run the call, (None, result)
+        when another worker published one, or (None, None) to run uncoordinated
+        (backend trouble, or the holder outlived our timeout).
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.timeout
+        try:
+            while time.monotonic() < deadline:
+                result = self.backend.get(self._result_key(key))
+                if result is None and self.backend.add(self._lock_key(key), token, self.lock_ttl):
+                    # The previous holder may have published and unlocked between those two
+                    # calls; results are written before the unlock, so look once more
+                    result = self.backend.get(self._result_key(key))
+                    if result is None:
+                        return token, None
+                    self._release(key, token, None)
+                if result is not None:
+                    metrics.inc('singleflight_shared_total', scope='worker')
+                    return None, result
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            logger.warning(f"Single-flight backend unavailable, generating without coordination: {e}")
+            return None, None
+        metrics.inc('singleflight_timeouts_total')
+        return None, None
+
+    def _release(self, key: str, token: str, result):
+        """Publish result (unless None) for the waiting workers and drop the lock"""
+        try:
+            if result is not None:
+                self.backend.set(self._result_key(key), result, self.result_ttl)
+            # Only drop the lock if it is still ours (it may have expired and been retaken)
+            if self.backend.get(self._lock_key(key)) == token:
+                self.backend.delete(self._lock_key(key))
+        except Exception as e:
+            logger.warning(f"Single-flight backend release failed: {e}")
+
+_worksheet_single_flight = None
+_worksheet_single_flight_lock = threading.Lock()
+
+def get_worksheet_single_flight() -> Optional[SingleFlight]:
+    """Process-wide SingleFlight for worksheet generation from settings.WORKSHEET_SINGLE_FLIGHT (None when disabled)"""
+    global _worksheet_single_flight
+    if _worksheet_single_flight is None:
+        with _worksheet_single_flight_lock:
+            if _worksheet_single_flight is None:
+                config = getattr(settings, 'WORKSHEET_SINGLE_FLIGHT', {})
+                _worksheet_single_flight = SingleFlight(
+                    backend=build_cache_backend(config),
+                    timeout=config.get('TIMEOUT', 15.0),
+                    lock_ttl=config.get('LOCK_TTL', 30.0),
+                    result_ttl=config.get('RESULT_TTL', 1.0)
+                ) if config.get('ENABLED', True) else False
+    return _worksheet_single_flight or None
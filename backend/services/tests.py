@@ -1,3 +1,935 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import functools
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from .ai_services import (
+    GroqQuestionGenerator, MoodAnalyzer, MoodInferenceBatcher, MoodResultCache, WorksheetCache, keyword_mood_classifier,
+    normalize_mood_text
+)
+from .cache_services import LocalMemoryCacheBackend, RedisCacheBackend, SQLiteCacheBackend
+from .fake_groq import FAKE_MOTIVATION, FAKE_QUESTION, FakeGroqServer
+from .groq_services import RetryPolicy, get_async_groq_client, get_groq_client, reset_groq_clients
+from .metrics_services import MetricsRegistry, metrics
+from .pdf_services import PDFFileCache, PDFGenerator, PDFTemplate, find_emoji_font
+from .rate_limit_services import (
+    GroqRateLimiter, LocalRateLimitBackend, RateLimitExceeded, SQLiteRateLimitBackend
+)
+from .resilience_services import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, HedgePolicy
+from .singleflight_services import SingleFlight
+
+
+def _response(status=429, **headers):
+    return httpx.Response(status, headers=headers)
+
+
+class RetryPolicyTests(SimpleTestCase):
+
+    def test_backoff_is_jittered_exponential_and_capped(self):
+        policy = RetryPolicy(max_retries=5, base_delay=1.0, max_delay=4.0)
+        with mock.patch('services.groq_services.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual([policy.delay(attempt) for attempt in range(1, 5)], [1.0, 2.0, 4.0, 4.0])
+        self.assertIsNone(policy.delay(6))
+
+    def test_retry_after_is_honoured(self):
+        policy = RetryPolicy(max_retries=2, base_delay=1.0, max_delay=10.0)
+        self.assertEqual(policy.delay(1, _response(**{'Retry-After': '3'})), 3.0)
+        self.assertEqual(policy.delay(1, _response(**{'retry-after-ms': '250'})), 0.25)
+
+    def test_retry_after_beyond_max_delay_gives_up(self):
+        policy = RetryPolicy(max_retries=2, base_delay=1.0, max_delay=5.0)
+        self.assertIsNone(policy.delay(1, _response(**{'Retry-After': '60'})))
+
+
+class KeywordMoodClassifierTests(SimpleTestCase):
+
+    def mood(self, text):
+        return keyword_mood_classifier.classify(text)['learning_mood']
+
+    def test_negator_right_before_keyword_flips_the_mood(self):
+        self.assertEqual(self.mood("not happy"), 'sad')
+        self.assertEqual(self.mood("I'm not really happy today"), 'sad')
+        self.assertEqual(self.mood("I'm not tired at all"), 'calm')
+        self.assertEqual(self.mood("I cannot focus"), 'confused')
+
+    def test_distant_or_idiomatic_negators_are_ignored(self):
+        self.assertEqual(self.mood("never been more excited"), 'excited')
+        self.assertEqual(self.mood("no way, I'm so excited"), 'excited')
+        self.assertEqual(self.mood("not feeling happy"), 'happy')  # only degree words may sit in between
+
+    def analyzer(self, threshold):
+        registry = mock.Mock()
+        registry.get_classifier.return_value = mock.Mock(return_value=[{'label': 'surprise', 'score': 0.7}])
+        with override_settings(MOOD_KEYWORD_THRESHOLD=threshold, MOOD_BATCHING_ENABLED=False):
+            return MoodAnalyzer(registry=registry, cache=MoodResultCache(LocalMemoryCacheBackend()))
+
+    def test_confident_keyword_match_skips_the_model(self):
+        analyzer = self.analyzer(0.9)
+        analysis = analyzer.analyze_mood("I'm so excited!")
+        self.assertEqual(analysis['method'], 'keyword_matching')
+        analyzer.emotion_classifier.assert_not_called()
+
+        # Negated and mixed matches score below the threshold, so the model decides
+        self.assertEqual(analyzer.analyze_mood("not happy")['learning_mood'], 'curious')
+        analyzer.emotion_classifier.assert_called_once_with("not happy")
+
+    def test_threshold_above_one_always_asks_the_model(self):
+        analyzer = self.analyzer(1.1)
+        self.assertEqual(analyzer.analyze_mood("I'm so excited!")['learning_mood'], 'curious')
+        analyzer.emotion_classifier.assert_called_once()
+
+
+class MoodInferenceBatcherTests(SimpleTestCase):
+
+    def batcher(self, classifier, **kwargs):
+        registry = mock.Mock()
+        registry.get_classifier.return_value = classifier
+        batcher = MoodInferenceBatcher(registry=registry, **kwargs)
+        self.addCleanup(batcher.stop)
+        return batcher
+
+    def classify_concurrently(self, batcher, texts):
+        results = {}
+
+        def classify(text):
+            try:
+                results[text] = batcher.classify(text, timeout=5)
+            except Exception as e:
+                results[text] = e
+
+        threads = [threading.Thread(target=classify, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_texts_share_calls_up_to_the_batch_size(self):
+        batches = []
+
+        def classifier(texts, **kwargs):
+            batches.append(list(texts))
+            return [{'label': text.upper(), 'score': 0.9} for text in texts]
+
+        batcher = self.batcher(classifier, max_batch_size=3, max_wait_ms=300)
+        texts = [f'text {n}' for n in range(5)]
+
+        results = self.classify_concurrently(batcher, texts)
+
+        self.assertEqual(sorted(len(batch) for batch in batches), [2, 3])
+        self.assertEqual(sorted(text for batch in batches for text in batch), texts)
+        # Each caller gets the result for its own text, in the single-call shape
+        for text in texts:
+            self.assertEqual(results[text], [{'label': text.upper(), 'score': 0.9}])
+
+    def test_lone_text_waits_out_the_window_but_a_full_batch_does_not(self):
+        classifier = mock.Mock(side_effect=lambda texts, **kwargs: [{'label': 'joy', 'score': 0.9}] * len(texts))
+
+        start = time.perf_counter()
+        self.batcher(classifier, max_batch_size=4, max_wait_ms=200).classify('hello', timeout=5)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.2)
+
+        start = time.perf_counter()
+        self.batcher(classifier, max_batch_size=1, max_wait_ms=5000).classify('hello', timeout=5)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_classifier_error_reaches_every_waiting_caller(self):
+        classifier = mock.Mock(side_effect=RuntimeError('CUDA out of memory'))
+        batcher = self.batcher(classifier, max_batch_size=8, max_wait_ms=300)
+
+        results = self.classify_concurrently(batcher, ['a', 'b', 'c'])
+
+        classifier.assert_called_once()
+        for text in 'abc':
+            self.assertIsInstance(results[text], RuntimeError)
+        # The worker survives and serves the next batch
+        classifier.side_effect = lambda texts, **kwargs: [{'label': 'joy', 'score': 0.9}] * len(texts)
+        self.assertEqual(batcher.classify('d', timeout=5), [{'label': 'joy', 'score': 0.9}])
+
+
+class MoodResultCacheTests(SimpleTestCase):
+
+    def test_normalize_folds_case_quotes_contractions_and_punctuation(self):
+        self.assertEqual(normalize_mood_text("  I\u2019m SO   tired!!! "), 'i am so tired')
+        self.assertEqual(normalize_mood_text("I can't focus, it's late"), 'i cannot focus it is late')
+        self.assertEqual(normalize_mood_text("Don't know..."), 'do not know')
+        self.assertEqual(MoodResultCache.make_key("I'm tired."), MoodResultCache.make_key('i am   TIRED'))
+        self.assertNotEqual(MoodResultCache.make_key('tired'), MoodResultCache.make_key('not tired'))
+
+    def test_model_result_is_cached_under_the_normalized_text(self):
+        registry = mock.Mock()
+        registry.get_classifier.return_value = mock.Mock(return_value=[{'label': 'neutral', 'score': 0.61234567}])
+        cache = MoodResultCache(LocalMemoryCacheBackend())
+        with override_settings(MOOD_BATCHING_ENABLED=False):
+            analyzer = MoodAnalyzer(registry=registry, cache=cache)
+
+        first = analyzer.analyze_mood('Meh, whatever.')
+        second = analyzer.analyze_mood('  meh WHATEVER ')
+
+        analyzer.emotion_classifier.assert_called_once_with('Meh, whatever.')
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(second['learning_mood'], first['learning_mood'])
+        self.assertEqual(second['confidence'], 0.6123)
+        self.assertEqual(second['raw_results'], [{'label': 'neutral', 'score': 0.6123}])
+
+
+class SharedGroqClientTests(SimpleTestCase):
+    """The shared client against a local fake Groq server"""
+
+    def setUp(self):
+        self.server = FakeGroqServer().start()
+        self.addCleanup(self.server.stop)
+        overrides = override_settings(
+            GROQ_API_KEY='test-key', GROQ_BASE_URL=self.server.base_url,
+            GROQ_MAX_RETRIES=2, GROQ_RETRY_BASE_DELAY=0.01, GROQ_RETRY_MAX_DELAY=1.0
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_groq_clients()
+        self.addCleanup(reset_groq_clients)
+
+    def complete(self, client=None):
+        completion = (client or get_groq_client()).chat.completions.create(
+            messages=[{'role': 'user', 'content': 'Write a math question'}], model='llama3-8b-8192'
+        )
+        return completion.choices[0].message.content
+
+    def test_generators_share_one_client_and_reuse_connections(self):
+        self.assertIs(GroqQuestionGenerator(cache=mock.Mock()).client, GroqQuestionGenerator(cache=mock.Mock()).client)
+        reused_before = metrics.counter_value('groq_http_connections_reused_total')
+
+        for _ in range(5):
+            self.assertEqual(self.complete(), FAKE_QUESTION)
+
+        self.assertEqual(self.server.requests, 5)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(metrics.counter_value('groq_http_connections_reused_total') - reused_before, 4)
+
+    def test_retries_server_errors_then_succeeds(self):
+        self.server.script([503, 502])
+        retries_before = metrics.counter_value('groq_http_retries_total', reason='503')
+
+        self.assertEqual(self.complete(), FAKE_QUESTION)
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(metrics.counter_value('groq_http_retries_total', reason='503') - retries_before, 1)
+
+    def test_rate_limit_waits_for_retry_after(self):
+        self.server.retry_after = 0.2
+        self.server.script([429])
+
+        with mock.patch('services.groq_services.time.sleep') as sleep:
+            self.assertEqual(self.complete(), FAKE_QUESTION)
+
+        # The fake server's own (zero) latency sleeps go through the same patched function
+        self.assertIn(mock.call(0.2), sleep.call_args_list)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_gives_up_after_max_retries(self):
+        from groq import InternalServerError
+
+        self.server.script([500, 500, 500])
+        with self.assertRaises(InternalServerError):
+            self.complete()
+        self.assertEqual(self.server.requests, 3)
+
+    def test_async_client_retries_and_reuses_connections(self):
+        self.server.script([503])
+
+        async def run():
+            client = get_async_groq_client()
+            replies = []
+            for _ in range(3):
+                completion = await client.chat.completions.create(
+                    messages=[{'role': 'user', 'content': 'Write a math question'}], model='llama3-8b-8192'
+                )
+                replies.append(completion.choices[0].message.content)
+            await client.close()
+            return replies
+
+        self.assertEqual(asyncio.run(run()), [FAKE_QUESTION] * 3)
+        self.assertEqual(self.server.requests, 4)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_generator_builds_worksheet_through_fake_server(self):
+        generator = GroqQuestionGenerator(cache=mock.Mock())
+        worksheet, fallback_slots = generator.generate_live('tired', 'math', '5-10')
+
+        self.assertEqual(fallback_slots, [])
+        self.assertEqual(worksheet['motivation'], FAKE_MOTIVATION)
+        self.assertEqual(set(worksheet['questions']), {'easy', 'medium', 'hard'})
+
+
+class ParallelGenerationTests(SimpleTestCase):
+    """Each slot is its own Groq call; a failed or late slot falls back alone"""
+
+    def test_failed_and_late_slots_fall_back_independently(self):
+        generator = GroqQuestionGenerator(cache=mock.Mock(), rate_limiter=mock.Mock(), breaker=CircuitBreaker('test'))
+        generator.hedge = None
+        generator.request_deadline = 0.2
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def question(prompt):
+            if 'ONE medium level' in prompt:
+                raise RuntimeError('Groq returned 500')
+            if 'ONE hard level' in prompt:
+                release.wait(5)
+            return 'What is 2 + 2?'
+
+        fallback = generator._fallback_question_generation('calm', 'math', '5-10')
+        timeouts_before = metrics.counter_value('groq_slot_fallbacks_total', slot='hard', reason='timeout')
+        with mock.patch.object(generator, '_generate_motivation', return_value='You can do it!'), \
+                mock.patch.object(generator, '_generate_question', side_effect=question):
+            start = time.perf_counter()
+            worksheet, fallback_slots = generator._generate_concurrently('calm', 'math', '5-10')
+
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(sorted(fallback_slots), ['hard', 'medium'])
+        self.assertEqual(worksheet['motivation'], 'You can do it!')
+        self.assertEqual(worksheet['questions']['easy'], 'What is 2 + 2?')
+        self.assertEqual(worksheet['questions']['medium'], fallback['questions']['medium'])
+        self.assertEqual(worksheet['questions']['hard'], fallback['questions']['hard'])
+        self.assertEqual(
+            metrics.counter_value('groq_slot_fallbacks_total', slot='hard', reason='timeout') - timeouts_before, 1
+        )
+
+
+class BatchedWorksheetParsingTests(SimpleTestCase):
+    """Anything short of a complete worksheet is rejected so generate_live falls back to parallel calls"""
+
+    valid = {
+        'motivation': ' You can do it! ',
+        'questions': {
+            'easy': {'question': 'What is 2 + 2?', 'answer': 4, 'hint': 'Count up'},
+            'medium': {'question': 'What is 12 x 3?'},
+            'hard': {'question': 'Solve 3x = 12.', 'answer': 'x = 4', 'hint': None},
+        },
+    }
+
+    def test_complete_worksheet_is_reshaped(self):
+        worksheet = GroqQuestionGenerator._parse_batched_worksheet(json.dumps(self.valid))
+
+        self.assertEqual(worksheet['motivation'], 'You can do it!')
+        self.assertEqual(worksheet['questions']['medium'], 'What is 12 x 3?')
+        self.assertEqual(worksheet['answers'], {'easy': '4', 'medium': '', 'hard': 'x = 4'})
+        self.assertEqual(worksheet['hints'], {'easy': 'Count up', 'medium': '', 'hard': ''})
+
+    def test_malformed_or_partial_json_is_rejected(self):
+        missing_hard = json.loads(json.dumps(self.valid))
+        del missing_hard['questions']['hard']
+        blank_question = json.loads(json.dumps(self.valid))
+        blank_question['questions']['easy']['question'] = '  '
+
+        for content in [
+            None,
+            '',
+            json.dumps(self.valid)[:-20],  # truncated at max_tokens
+            '[]',
+            json.dumps({'questions': self.valid['questions']}),
+            json.dumps({'motivation': 'Go!', 'questions': ['What is 2 + 2?']}),
+            json.dumps({'motivation': 'Go!', 'questions': {**self.valid['questions'], 'easy': 'What is 2 + 2?'}}),
+            json.dumps(missing_hard),
+            json.dumps(blank_question),
+        ]:
+            with self.subTest(content=content):
+                self.assertIsNone(GroqQuestionGenerator._parse_batched_worksheet(content))
+
+    def test_invalid_batched_reply_falls_back_to_parallel_calls(self):
+        generator = GroqQuestionGenerator(cache=mock.Mock(), rate_limiter=mock.Mock(), breaker=CircuitBreaker('test'))
+        generator.generation_mode = 'batched'
+        parallel = ({'motivation': 'Go!'}, [])
+
+        with mock.patch.object(generator, '_call_hedged', return_value='{"motivation": "Go!"'), \
+                mock.patch.object(generator, '_generate_concurrently', return_value=parallel) as concurrently:
+            self.assertEqual(generator.generate_live('calm', 'math', '5-10'), parallel)
+        concurrently.assert_called_once_with('calm', 'math', '5-10')
+
+
+class WorksheetCacheTests(SimpleTestCase):
+
+    def worksheet(self, n):
+        return {
+            'motivation': f'Motivation {n}',
+            'questions': {d: f'{d} question {n}' for d in ('easy', 'medium', 'hard')},
+            'answers': {d: f'{d} answer {n}' for d in ('easy', 'medium', 'hard')},
+        }
+
+    def backends(self):
+        """Every backend this machine can run; redis only when REDIS_URL points at a live server"""
+        directory = tempfile.TemporaryDirectory(prefix='zappy-cache-test-')
+        self.addCleanup(directory.cleanup)
+        backends = [LocalMemoryCacheBackend(), SQLiteCacheBackend(os.path.join(directory.name, 'cache.sqlite3'))]
+        if os.environ.get('REDIS_URL'):
+            try:
+                redis_backend = RedisCacheBackend(os.environ['REDIS_URL'], key_prefix=f'zappy-test-{time.time_ns()}')
+            except ImportError:
+                redis_backend = None
+            if redis_backend is not None and redis_backend.ping():
+                backends.append(redis_backend)
+        return backends
+
+    def test_pool_is_served_only_once_it_holds_enough_variants(self):
+        for backend in self.backends():
+            with self.subTest(backend=backend.name):
+                cache = WorksheetCache(backend, variants=3)
+                for n in range(2):
+                    cache.store('calm', 'math', '5-10', self.worksheet(n))
+                self.assertIsNone(cache.get('calm', 'math', '5-10'))
+                # Degraded serving accepts a smaller pool
+                self.assertIsNotNone(cache.get('calm', 'math', '5-10', min_variants=1))
+
+                cache.store('calm', 'math', '5-10', self.worksheet(2))
+                worksheet = cache.get('calm', 'math', '5-10')
+                self.assertIn(worksheet['motivation'], {f'Motivation {n}' for n in range(3)})
+                self.assertIn(worksheet['questions']['hard'], {f'hard question {n}' for n in range(3)})
+                self.assertEqual(worksheet['hints'], {'easy': '', 'medium': '', 'hard': ''})
+
+    def test_pools_keep_the_newest_variants_and_skip_fallback_slots(self):
+        for backend in self.backends():
+            with self.subTest(backend=backend.name):
+                cache = WorksheetCache(backend, variants=2)
+                for n in range(3):
+                    cache.store('tired', 'science', '5-10', self.worksheet(n))
+                cache.store('tired', 'science', '5-10', self.worksheet(3), skip_slots=['motivation'])
+
+                pool = backend.get_variants(WorksheetCache.make_key('tired', 'science', '5-10', 'motivation'))
+                self.assertEqual(pool, ['Motivation 1', 'Motivation 2'])
+                pool = backend.get_variants(WorksheetCache.make_key('tired', 'science', '5-10', 'easy'))
+                self.assertEqual([entry['question'] for entry in pool], ['easy question 2', 'easy question 3'])
+
+
+class SQLiteCacheBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory(prefix='zappy-cache-test-')
+        self.addCleanup(directory.cleanup)
+        self.backend = SQLiteCacheBackend(os.path.join(directory.name, 'cache.sqlite3'), max_entries=2)
+        self.now = 1_000_000.0
+        clock = mock.patch('services.cache_services.time', time=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def accessed_at(self, key):
+        return self.backend._connection().execute(
+            "SELECT accessed_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()[0]
+
+    def test_reads_refresh_the_lru_timestamp_only_once_it_is_stale(self):
+        self.backend.set('a', 1)
+        self.backend.set('b', 2)
+        connection = self.backend._connection()
+
+        self.now += SQLiteCacheBackend.touch_interval - 1
+        writes = connection.total_changes
+        self.assertEqual(self.backend.get('a'), 1)
+        self.assertEqual(connection.total_changes, writes)
+        self.assertEqual(self.accessed_at('a'), 1_000_000.0)
+
+        self.now += 1
+        self.assertEqual(self.backend.get('a'), 1)
+        self.assertEqual(self.accessed_at('a'), self.now)
+
+        # 'b' was never read again, so it is the one evicted
+        self.backend.set('c', 3)
+        self.assertIsNone(self.backend.get('b'))
+        self.assertEqual(self.backend.get('a'), 1)
+
+
+class GroqRateLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        clock = mock.patch('services.rate_limit_services.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def limiter(self, backend=None, **kwargs):
+        options = {'requests_per_minute': 2, 'tokens_per_minute': 600, 'max_wait': 0}
+        options.update(kwargs)
+        return GroqRateLimiter(backend or LocalRateLimitBackend(), **options)
+
+    def test_requests_per_minute_bucket_refills_over_time(self):
+        limiter = self.limiter()
+        limiter.acquire(10)
+        limiter.acquire(10)
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.acquire(10)
+        self.assertEqual(raised.exception.reason, 'rpm')
+        self.assertAlmostEqual(raised.exception.retry_after, 30.0)
+
+        self.now += 30
+        limiter.acquire(10)
+
+    def test_unused_token_reservation_is_refunded(self):
+        limiter = self.limiter(requests_per_minute=0)
+        limiter.acquire(500)
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.acquire(500)
+        self.assertEqual(raised.exception.reason, 'tpm')
+
+        limiter.record_usage(500, 100)
+        limiter.acquire(500)
+
+    def test_short_waits_are_queued(self):
+        limiter = self.limiter(max_wait=60)
+        limiter.acquire(10)
+        limiter.acquire(10)
+
+        def sleep(seconds):
+            self.now += seconds
+
+        with mock.patch('services.rate_limit_services.time.sleep', side_effect=sleep) as slept:
+            limiter.acquire(10)
+        slept.assert_called_once_with(30.0)
+
+    def test_sqlite_backend_shares_buckets_between_workers(self):
+        location = os.path.join(tempfile.mkdtemp(), 'limits.sqlite3')
+        first = self.limiter(SQLiteRateLimitBackend(location))
+        second = self.limiter(SQLiteRateLimitBackend(location))
+
+        first.acquire(10)
+        second.acquire(10)
+        self.assertEqual(first.blocked_reason(), 'rpm')
+        with self.assertRaises(RateLimitExceeded):
+            second.acquire(10)
+
+    def test_spent_daily_budget_serves_cached_variant_without_calling_groq(self):
+        limiter = self.limiter(daily_token_budget=100)
+        limiter.acquire(120)
+        limiter.record_usage(120, 110)
+        self.assertEqual(limiter.blocked_reason(), 'budget')
+
+        cache = WorksheetCache(LocalMemoryCacheBackend(), variants=5)
+        cache.store('tired', 'math', '5-10', {
+            'motivation': 'Small steps!',
+            'questions': {'easy': 'What is 1 + 1?', 'medium': 'What is 6 x 7?', 'hard': 'Solve 2x = 8.'},
+        })
+        generator = GroqQuestionGenerator(cache=cache, rate_limiter=limiter)
+        generator.client = mock.Mock()
+
+        worksheet = generator.generate_questions('tired', 'math', '5-10')
+
+        self.assertEqual(worksheet['motivation'], 'Small steps!')
+        generator.client.chat.completions.create.assert_not_called()
+        with self.assertRaises(RateLimitExceeded) as raised:
+            limiter.acquire(10)
+        self.assertEqual(raised.exception.reason, 'budget')
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def slow_call(self, result, delay=0.2):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            time.sleep(delay)
+            return result
+
+        return fn, calls
+
+    def run_threads(self, count, target):
+        results = [None] * count
+
+        def run(i):
+            try:
+                results[i] = target()
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        flight = SingleFlight()
+        fn, calls = self.slow_call({'motivation': 'Go!'})
+
+        results = self.run_threads(8, lambda: flight.do('tired:math:5-10', fn))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], [{'motivation': 'Go!'}] * 8)
+        self.assertEqual(sum(shared for _, shared in results), 7)
+        # Every caller gets its own copy
+        self.assertEqual(len({id(result) for result, _ in results}), 8)
+
+    def test_leader_error_reaches_followers_and_next_call_retries(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('groq down')
+
+        results = self.run_threads(3, lambda: flight.do('key', fail))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.do('key', lambda: 'ok'), ('ok', False))
+
+    def test_workers_coordinate_through_a_shared_backend(self):
+        location = os.path.join(tempfile.mkdtemp(), 'flights.sqlite3')
+        workers = [SingleFlight(SQLiteCacheBackend(location), poll_interval=0.01) for _ in range(2)]
+        fn, calls = self.slow_call({'motivation': 'Go!'})
+
+        first, second = workers
+        leader = threading.Thread(target=first.do, args=('key', fn))
+        leader.start()
+        time.sleep(0.05)
+        self.assertEqual(second.do('key', fn), ({'motivation': 'Go!'}, True))
+        leader.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_fallback_results_are_not_shared_between_workers(self):
+        location = os.path.join(tempfile.mkdtemp(), 'flights.sqlite3')
+        first, second = (SingleFlight(SQLiteCacheBackend(location), poll_interval=0.01) for _ in range(2))
+        fn, calls = self.slow_call([{'motivation': 'Keep going!'}, ['motivation']])
+        fully_generated = lambda result: not result[1]
+
+        leader = threading.Thread(target=first.do, args=('key', fn), kwargs={'shareable': fully_generated})
+        leader.start()
+        time.sleep(0.05)
+        # Waits for the leader's lock, finds nothing published, then generates itself
+        result, shared = second.do('key', fn, shareable=fully_generated)
+        leader.join()
+
+        self.assertFalse(shared)
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(first.backend.get('singleflight:result:key'))
+
+    def test_async_callers_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'motivation': 'Go!'}
+
+        async def main():
+            return await asyncio.gather(*(flight.ado('key', fn) for _ in range(5)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 1_000.0
+        # Patch the module's `time`, not time.monotonic itself, which asyncio's event loop also reads
+        clock = mock.patch('services.resilience_services.time', monotonic=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_opens_on_errors_and_a_successful_probe_closes_it(self):
+        breaker = CircuitBreaker('test', min_calls=4, error_threshold=0.5, open_seconds=30)
+        for failed in (False, True, False):
+            breaker.record(0.1, failed)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(0.1, True)
+
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+        with self.assertRaises(CircuitOpen):
+            breaker.check()
+
+        self.now += 30
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # one probe at a time
+        breaker.record(0.1, False)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_slow_calls_open_it_and_a_slow_probe_reopens_it(self):
+        breaker = CircuitBreaker('test', min_calls=2, slow_call_seconds=5, slow_call_threshold=0.5, open_seconds=10)
+        breaker.record(6.0, False)
+        breaker.record(0.2, False)
+        self.assertEqual(breaker.state, OPEN)
+
+        self.now += 10
+        self.assertTrue(breaker.allow_request())
+        breaker.record(7.0, False)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.stats()['retry_after_seconds'], 10.0)
+
+    def test_half_open_only_lets_the_probe_request_call(self):
+        breaker = CircuitBreaker('test', min_calls=1, open_seconds=30)
+        breaker.record(0.1, True)
+        self.now += 30
+
+        probe = contextvars.copy_context()
+        self.assertTrue(probe.run(breaker.allow_request))
+        probe.run(breaker.check)
+        # Threads the probe request fans out to inherit its context
+        probe.copy().run(breaker.check)
+        # Another request that skipped allow_request() (e.g. a direct generate_live) is turned away
+        with self.assertRaises(CircuitOpen):
+            contextvars.copy_context().run(breaker.check)
+        # A straggler finishing outside the probe doesn't decide the outcome
+        contextvars.copy_context().run(breaker.record, 0.1, False)
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+        probe.run(breaker.record, 0.1, False)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_cancelled_probe_call_frees_the_probe_and_its_tokens(self):
+        breaker = CircuitBreaker('test', min_calls=1, open_seconds=30)
+        breaker.record(0.1, True)
+        self.now += 30
+        limiter = GroqRateLimiter(LocalRateLimitBackend(), requests_per_minute=0, tokens_per_minute=300, max_wait=0)
+        generator = GroqQuestionGenerator(cache=mock.Mock(), rate_limiter=limiter, breaker=breaker, hedge=mock.Mock())
+        generator.client = mock.Mock()
+        async_client = mock.Mock()
+        async_client.chat.completions.create.side_effect = lambda **kwargs: asyncio.sleep(10)
+
+        async def probe_then_cancel():
+            self.assertTrue(breaker.allow_request())
+            call = asyncio.ensure_future(generator._achat_completion('Write a question', 0.8, 150))
+            await asyncio.sleep(0.05)
+            call.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await call
+
+        with mock.patch.object(GroqQuestionGenerator, 'async_client', new_callable=mock.PropertyMock) as client:
+            client.return_value = async_client
+            asyncio.run(probe_then_cancel())
+
+        # No outcome was recorded, but another request may now probe
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(contextvars.copy_context().run(breaker.allow_request))
+        # The reservation was refunded, so a call of the same size fits the minute again
+        limiter.acquire(150)
+
+    def test_rate_limited_probe_call_frees_the_probe(self):
+        breaker = CircuitBreaker('test', min_calls=1, open_seconds=30)
+        breaker.record(0.1, True)
+        self.now += 30
+        limiter = mock.Mock()
+        limiter.acquire.side_effect = RateLimitExceeded('tpm', 5.0)
+        generator = GroqQuestionGenerator(cache=mock.Mock(), rate_limiter=limiter, breaker=breaker, hedge=mock.Mock())
+        generator.client = mock.Mock()
+
+        def probe():
+            self.assertTrue(breaker.allow_request())
+            with self.assertRaises(RateLimitExceeded):
+                generator._chat_completion('Write a question', 0.8, 150)
+
+        contextvars.copy_context().run(probe)
+
+        generator.client.chat.completions.create.assert_not_called()
+        limiter.record_usage.assert_not_called()
+        self.assertTrue(contextvars.copy_context().run(breaker.allow_request))
+
+    def test_open_circuit_serves_cached_worksheet_without_calling_groq(self):
+        breaker = CircuitBreaker('test', min_calls=1)
+        breaker.record(0.1, True)
+
+        cache = WorksheetCache(LocalMemoryCacheBackend(), variants=5)
+        cache.store('tired', 'math', '5-10', {
+            'motivation': 'Small steps!',
+            'questions': {'easy': 'What is 1 + 1?', 'medium': 'What is 6 x 7?', 'hard': 'Solve 2x = 8.'},
+        })
+        generator = GroqQuestionGenerator(cache=cache, breaker=breaker)
+        generator.client = mock.Mock()
+        degraded_before = metrics.counter_value('groq_degraded_total', reason='circuit_open', source='cache')
+
+        worksheet = generator.generate_questions('tired', 'math', '5-10')
+
+        self.assertEqual(worksheet['motivation'], 'Small steps!')
+        generator.client.chat.completions.create.assert_not_called()
+        self.assertEqual(
+            metrics.counter_value('groq_degraded_total', reason='circuit_open', source='cache') - degraded_before, 1
+        )
+
+
+class HedgedCallTests(SimpleTestCase):
+    """A call still running after the hedge delay is raced against a duplicate"""
+
+    def setUp(self):
+        self.calls = 0
+        self.generator = GroqQuestionGenerator(
+            cache=mock.Mock(),
+            rate_limiter=GroqRateLimiter(LocalRateLimitBackend(), requests_per_minute=0, tokens_per_minute=0),
+            breaker=CircuitBreaker('test'),
+            hedge=HedgePolicy('groq_call_seconds', 'groq_calls_total', delay=0.05, max_ratio=1.0)
+        )
+
+    def completion(self):
+        self.calls += 1
+        # Only the first attempt hits the slow tail
+        delay = 1.0 if self.calls == 1 else 0.0
+        reply = mock.Mock(choices=[mock.Mock(message=mock.Mock(content=f'Question {self.calls}'))], usage=None)
+        return delay, reply
+
+    def test_sync_call_takes_the_faster_duplicate(self):
+        def create(**kwargs):
+            delay, reply = self.completion()
+            time.sleep(delay)
+            return reply
+
+        self.generator.client = mock.Mock()
+        self.generator.client.chat.completions.create.side_effect = create
+        wins_before = metrics.counter_value('groq_hedge_wins_total', mode='batched')
+
+        start = time.perf_counter()
+        content = self.generator._call_hedged(
+            functools.partial(self.generator._chat_completion, 'Write a question', 0.8, 150, mode='batched'), 'batched'
+        )
+
+        self.assertEqual(content, 'Question 2')
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(metrics.counter_value('groq_hedge_wins_total', mode='batched') - wins_before, 1)
+
+    def test_async_call_takes_the_faster_duplicate_and_cancels_the_slow_one(self):
+        async def create(**kwargs):
+            delay, reply = self.completion()
+            await asyncio.sleep(delay)
+            return reply
+
+        async_client = mock.Mock()
+        async_client.chat.completions.create.side_effect = create
+        self.generator.client = mock.Mock()
+
+        with mock.patch.object(GroqQuestionGenerator, 'async_client', new_callable=mock.PropertyMock) as client:
+            client.return_value = async_client
+            start = time.perf_counter()
+            content = asyncio.run(self.generator._ahedged(
+                functools.partial(self.generator._achat_completion, 'Write a question', 0.8, 150), 'parallel'
+            ))
+
+        self.assertEqual(content, 'Question 2')
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_hedge_budget_is_per_mode(self):
+        policy = HedgePolicy('budget_test_seconds', 'budget_test_calls_total', delay=0.05, max_ratio=0.5)
+        for _ in range(9):
+            metrics.inc('budget_test_calls_total', mode='budget-busy', outcome='success')
+
+        # Hedges spent in one mode don't use up another mode's budget
+        self.assertTrue(policy.try_acquire('budget-busy'))
+        self.assertTrue(policy.try_acquire('budget-quiet'))
+        self.assertFalse(policy.try_acquire('budget-quiet'))
+        self.assertTrue(policy.try_acquire('budget-busy'))
+
+
+class PDFFileCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory(prefix='zappy-pdf-test-')
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def render(self, data):
+        return io.BytesIO(b'x' * data['size'])
+
+    def test_evicts_expired_then_least_recently_used_pdfs(self):
+        cache = PDFFileCache(self.directory, max_bytes=250, max_age=3600)
+        stale = cache.get_or_render('stale', {'size': 10}, self.render)
+        old = cache.get_or_render('old', {'size': 100}, self.render)
+        recent = cache.get_or_render('recent', {'size': 100}, self.render)
+        now = time.time()
+        os.utime(stale, (now - 7200, now - 7200))
+        os.utime(old, (now - 60, now - 60))
+        os.utime(recent, (now - 30, now - 30))
+        cache.get_or_render('recent', {'size': 100}, self.render)  # a hit counts as a use
+
+        newest = cache.get_or_render('newest', {'size': 100}, self.render)
+
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.directory)), ['newest.pdf', 'recent.pdf']
+        )
+        self.assertTrue(newest.is_file())
+
+    def test_never_evicts_the_pdf_just_rendered(self):
+        cache = PDFFileCache(self.directory, max_bytes=10, max_age=0)
+        path = cache.get_or_render('big', {'size': 100}, self.render)
+        self.assertTrue(path.is_file())
+
+
+class PDFTemplateReuseTests(SimpleTestCase):
+
+    worksheet = {
+        'worksheet_id': '3f1c2d4e-5a6b-4c7d-8e9f-0a1b2c3d4e5f',
+        'subject': 'math',
+        'motivation': 'You can do this!',
+        'motivationEmoji': '🎯',
+        'questions': {'easy': 'What is 2 + 2?', 'medium': 'What is 12 x 3?', 'hard': 'Solve 3x = 12.'},
+        'timestamp': '2026-01-01 09:00:00',
+    }
+
+    @staticmethod
+    def template_state(template):
+        flowables = [*template.title, template.motivation_header, template.questions_header, template.answer_label,
+                     template.footer_message, *template.difficulty_headers.values()]
+        styles = [template.title_style, template.subtitle_style, template.motivation_style,
+                  template.question_header_style, template.question_style, template.footer_style, template.normal_style]
+        return [dict(vars(flowable)) for flowable in flowables], [dict(vars(style)) for style in styles]
+
+    def test_renders_from_the_shared_template_are_identical_and_leave_it_untouched(self):
+        from reportlab import rl_config
+
+        template = PDFTemplate()
+        before = self.template_state(template)
+        # invariant drops the creation date and random document ID so equal content gives equal bytes
+        with mock.patch.object(rl_config, 'invariant', 1):
+            first = PDFGenerator(template).generate_worksheet_pdf(self.worksheet).getvalue()
+            second = PDFGenerator(template).generate_worksheet_pdf(dict(self.worksheet, subject='science'))
+            third = PDFGenerator(template).generate_worksheet_pdf(self.worksheet).getvalue()
+
+        self.assertTrue(first.startswith(b'%PDF'))
+        self.assertNotEqual(second.getvalue(), first)
+        self.assertEqual(third, first)
+        self.assertEqual(self.template_state(template), before)
+
+    @override_settings(PDF_EMOJI_FONT=None)
+    def test_emoji_font_is_found_among_installed_fonts(self):
+        with mock.patch('services.pdf_services.os.path.isfile', side_effect=lambda path: 'Symbola' in path):
+            self.assertEqual(find_emoji_font(), '/usr/share/fonts/truetype/ancient-scripts/Symbola_hint.ttf')
+        with override_settings(PDF_EMOJI_FONT='none'):
+            self.assertIsNone(find_emoji_font())
+
+
+class PrometheusExpositionTests(SimpleTestCase):
+
+    def test_renders_counters_gauges_histograms_and_summaries(self):
+        registry = MetricsRegistry()
+        registry.inc('groq_calls_total', mode='parallel', outcome='success')
+        registry.set_gauge('emotion_model_loaded', 1)
+        registry.observe('groq_call_seconds', 0.2, mode='parallel')
+        registry.observe('groq_call_seconds', 3.0, mode='parallel')
+        registry.observe('mood_batch_size', 4)
+
+        text = registry.render_prometheus()
+
+        self.assertIn('# TYPE groq_calls_total counter\ngroq_calls_total{mode="parallel",outcome="success"} 1.0', text)
+        self.assertIn('emotion_model_loaded 1.0', text)
+        self.assertIn('# TYPE groq_call_seconds histogram', text)
+        self.assertIn('groq_call_seconds_bucket{mode="parallel",le="0.25"} 1', text)
+        self.assertIn('groq_call_seconds_bucket{mode="parallel",le="+Inf"} 2', text)
+        self.assertIn('groq_call_seconds_count{mode="parallel"} 2', text)
+        self.assertIn('# TYPE mood_batch_size summary\nmood_batch_size{quantile="0.5"} 4.0', text)
+
+    def test_span_records_duration_and_errors(self):
+        registry = MetricsRegistry()
+        with registry.span('db_save'):
+            pass
+        with self.assertRaises(ValueError):
+            with registry.span('db_save'):
+                raise ValueError('disk full')
+
+        self.assertEqual(registry.snapshot()['timings']['db_save_seconds']['count'], 2)
+        self.assertEqual(registry.counter_value('db_save_errors_total'), 1)